@@ -0,0 +1,75 @@
+"""Per-capability cost of a backend on one pdf.
+
+python benchmarks/capability.py tests/1.pdf --provider docling --pages 1 5
+"""
+
+import argparse
+import tempfile
+from time import perf_counter
+from typing import get_args
+
+from docparser.parser import load_parser
+from docparser.types import DefaultCapbility, ParseOpt
+
+PROFILES: dict[str, list[DefaultCapbility]] = {
+    "text": ["text"],
+    "text+table": ["text", "table"],
+    "text+image": ["text", "image"],
+    "text+page": ["text", "page"],
+    "all": list(get_args(DefaultCapbility)),
+}
+
+
+def bench(
+    path: str,
+    provider: str,
+    capbility: list[DefaultCapbility],
+    page_range: tuple[int, int] | None,
+    do_ocr: bool,
+    repeat: int,
+) -> tuple[float, float]:
+    with tempfile.TemporaryDirectory() as save_dir:
+        opt = ParseOpt(
+            source="local",
+            address=[path],
+            input_format="pdf",
+            output_format="markdown",
+            save_dir=save_dir,
+            capbility=capbility,
+            do_ocr=do_ocr,
+            page_range=page_range,
+        )
+        parser = load_parser(provider)(opt)
+        start = perf_counter()
+        parser.warm()
+        warm = perf_counter() - start
+        # the first conversion still pays for lazy allocations, drop it
+        run = parser.run_sp if provider == "docling" else parser.run
+        _ = list(run())
+        start = perf_counter()
+        for _ in range(repeat):
+            for out in run():
+                assert out.ok, out.error
+        return (warm, (perf_counter() - start) / repeat)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    _ = ap.add_argument("pdf")
+    _ = ap.add_argument("--provider", default="docling", choices=["docling", "marker"])
+    _ = ap.add_argument("--pages", nargs=2, type=int, metavar=("FIRST", "LAST"))
+    _ = ap.add_argument("--no-ocr", action="store_true")
+    _ = ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    page_range = tuple(args.pages) if args.pages else None
+    print(f"{'profile':<12} {'warm s':>8} {'per doc s':>10}")
+    for name, caps in PROFILES.items():
+        warm, per_doc = bench(
+            args.pdf, args.provider, caps, page_range, not args.no_ocr, args.repeat
+        )
+        print(f"{name:<12} {warm:>8.2f} {per_doc:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
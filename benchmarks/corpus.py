@@ -0,0 +1,101 @@
+"""Deterministic synthetic pdfs covering the page kinds the backends treat
+differently: plain text, ruled tables, embedded figures and scans without a
+text layer."""
+
+import random
+from collections.abc import Callable
+from pathlib import Path
+
+import pymupdf
+
+WORDS = (
+    "document conversion layout model table structure recognition page text "
+    "figure caption section header paragraph token reading order pipeline "
+    "throughput latency benchmark corpus synthetic"
+).split()
+
+
+def _sentence(rng: random.Random, n: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def _text_page(doc: pymupdf.Document, rng: random.Random) -> None:
+    page = doc.new_page()
+    _ = page.insert_text((72, 80), _sentence(rng, 5).title(), fontsize=18)
+    body = " ".join(_sentence(rng) for _ in range(24))
+    _ = page.insert_textbox(pymupdf.Rect(72, 110, 540, 740), body, fontsize=11)
+
+
+def _table_page(doc: pymupdf.Document, rng: random.Random) -> None:
+    page = doc.new_page()
+    _ = page.insert_text((72, 80), "Table " + _sentence(rng, 4), fontsize=14)
+    rows, cols, width, height = 12, 5, 90, 22
+    for r in range(rows + 1):
+        page.draw_line((72, 100 + r * height), (72 + cols * width, 100 + r * height))
+    for c in range(cols + 1):
+        page.draw_line((72 + c * width, 100), (72 + c * width, 100 + rows * height))
+    for r in range(rows):
+        for c in range(cols):
+            cell = rng.choice(WORDS) if r == 0 else f"{rng.uniform(0, 1000):.2f}"
+            _ = page.insert_text((76 + c * width, 115 + r * height), cell, fontsize=9)
+
+
+def _figure(rng: random.Random, width: int, height: int) -> pymupdf.Pixmap:
+    pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, width, height), False)
+    pix.clear_with(rng.randrange(64, 224))
+    for _ in range(12):
+        x, y = rng.randrange(width - 8), rng.randrange(height - 8)
+        pix.set_rect(
+            pymupdf.IRect(x, y, min(width, x + 40), min(height, y + 30)),
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+        )
+    return pix
+
+
+def _figure_page(doc: pymupdf.Document, rng: random.Random) -> None:
+    page = doc.new_page()
+    _ = page.insert_textbox(
+        pymupdf.Rect(72, 72, 540, 200), " ".join(_sentence(rng) for _ in range(6))
+    )
+    page.insert_image(pymupdf.Rect(72, 220, 540, 520), pixmap=_figure(rng, 468, 300))
+    _ = page.insert_text((72, 540), "Figure: " + _sentence(rng, 6), fontsize=9)
+
+
+def _scanned_page(doc: pymupdf.Document, rng: random.Random) -> None:
+    # render a text page and embed only the raster, like a scanner would
+    src = pymupdf.open()
+    _text_page(src, rng)
+    pix = src[0].get_pixmap(dpi=150)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=pix)
+
+
+KINDS: dict[str, Callable[[pymupdf.Document, random.Random], None]] = {
+    "text": _text_page,
+    "tables": _table_page,
+    "figures": _figure_page,
+    "scanned": _scanned_page,
+}
+
+# name -> (kind, pages)
+CORPUS: dict[str, tuple[str, int]] = {
+    "text-10p": ("text", 10),
+    "tables-4p": ("tables", 4),
+    "figures-4p": ("figures", 4),
+    "scanned-3p": ("scanned", 3),
+}
+
+
+def build(root: Path, seed: int = 0) -> list[Path]:
+    root.mkdir(parents=True, exist_ok=True)
+    paths: list[Path] = list()
+    for name, (kind, pages) in CORPUS.items():
+        path = root / f"{name}.pdf"
+        if not path.exists():
+            rng = random.Random(f"{seed}-{name}")
+            doc = pymupdf.open()
+            for _ in range(pages):
+                KINDS[kind](doc, rng)
+            doc.save(path, garbage=3, deflate=True)
+        paths.append(path)
+    return paths
@@ -0,0 +1,214 @@
+"""Benchmark providers x output formats x OCR modes over the synthetic corpus.
+
+    python benchmarks/suite.py --out bench.json
+    python benchmarks/suite.py --providers pymupdf --baseline bench.json
+
+Every configuration runs in a fresh interpreter so model-load time and peak
+RSS belong to that configuration alone.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from importlib.metadata import version
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import pymupdf
+
+from corpus import CORPUS, build
+
+FORMATS = ["markdown", "json", "html"]
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {"p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99), "max": ordered[-1]}
+
+
+def run_one(config: dict[str, Any]) -> dict[str, Any]:
+    from docparser import metrics
+    from docparser.parser import import_timings, load_parser
+    from docparser.types import ParseOpt
+
+    metrics.enable()
+
+    paths = [str(p) for p in build(Path(config["corpus"]))]
+    provider = config["provider"]
+    with tempfile.TemporaryDirectory() as save_dir:
+        opt = ParseOpt(
+            source="local",
+            address=paths,
+            input_format="pdf",
+            output_format=config["format"],
+            save_dir=save_dir,
+            do_ocr=config["do_ocr"],
+        )
+        parser = load_parser(provider)(opt).warm()
+        # marker only writes files, the others are measured in memory
+        run = parser.run if provider == "marker" else parser.run_sp
+        latencies: list[float] = list()
+        failures = 0
+        start = perf_counter()
+        for _ in range(config["repeat"]):
+            last = perf_counter()
+            for out in run():
+                now = perf_counter()
+                latencies.append(now - last)
+                last = now
+                failures += not out.ok
+        seconds = perf_counter() - start
+    pages = config["repeat"] * sum(pymupdf.open(p).page_count for p in paths)
+    return {
+        **{k: config[k] for k in ("provider", "format", "do_ocr")},
+        "documents": len(latencies),
+        "pages": pages,
+        "failures": failures,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds if seconds else 0.0,
+        "stages": {
+            "import": import_timings.get(provider, 0.0)
+            + parser.timings.get("import", 0.0),
+            "model_load": parser.timings.get("warm", 0.0),
+            "first_call": parser.timings.get("first_call", 0.0),
+            "document": percentiles(latencies),
+            # backend stages (layout, ocr, table_structure, export, ...) over
+            # all pages and documents, estimated from the stage histograms
+            **{
+                labels["stage"]: {
+                    "count": hist.count,
+                    "p50": hist.quantile(0.5),
+                    "p90": hist.quantile(0.9),
+                    "p99": hist.quantile(0.99),
+                }
+                for (name, key), hist in metrics.registry.histograms.items()
+                if name == metrics.STAGE_SECONDS
+                and (labels := dict(key)).get("provider") == provider
+                and labels["stage"] not in ("import", "model_load", "first_call")
+            },
+        },
+        # ru_maxrss is in KiB on linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def spawn(config: dict[str, Any]) -> dict[str, Any]:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--single", json.dumps(config)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+        return {
+            **{k: config[k] for k in ("provider", "format", "do_ocr")},
+            "error": tail[0],
+        }
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def regressions(
+    results: list[dict[str, Any]], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    def key(r: dict[str, Any]) -> tuple[str, str, bool]:
+        return (r["provider"], r["format"], r["do_ocr"])
+
+    before = {key(r): r for r in baseline["results"] if "error" not in r}
+    found: list[str] = list()
+    for r in results:
+        old = before.get(key(r))
+        if old is None or "error" in r:
+            continue
+        if r["pages_per_sec"] < old["pages_per_sec"] * (1 - tolerance):
+            before_pps, after_pps = old["pages_per_sec"], r["pages_per_sec"]
+            found.append(f"{key(r)}: {before_pps:.2f} -> {after_pps:.2f} pages/s")
+    return found
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = ap.add_argument(
+        "--providers",
+        nargs="+",
+        default=["docling", "marker"],
+        choices=["docling", "marker", "pymupdf"],
+    )
+    _ = ap.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    _ = ap.add_argument(
+        "--ocr", nargs="+", default=["on", "off"], choices=["on", "off"]
+    )
+    _ = ap.add_argument(
+        "--corpus", default=str(Path(tempfile.gettempdir()) / "docparser-corpus")
+    )
+    _ = ap.add_argument("--repeat", type=int, default=1)
+    _ = ap.add_argument("--out", help="write the results as json here")
+    _ = ap.add_argument("--baseline", help="results of an earlier run to compare with")
+    _ = ap.add_argument("--tolerance", type=float, default=0.2)
+    _ = ap.add_argument("--single", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.single:
+        print(json.dumps(run_one(json.loads(args.single))))
+        return
+
+    _ = build(Path(args.corpus))
+    results: list[dict[str, Any]] = list()
+    print(
+        f"{'provider':<8} {'format':<8} {'ocr':<4} {'pages/s':>8} {'load s':>7} "
+        f"{'p50 s':>7} {'p90 s':>7} {'rss MB':>7}"
+    )
+    for provider in args.providers:
+        for fmt in args.formats:
+            for ocr in args.ocr:
+                config = {
+                    "provider": provider,
+                    "format": fmt,
+                    "do_ocr": ocr == "on",
+                    "corpus": args.corpus,
+                    "repeat": args.repeat,
+                }
+                r = spawn(config)
+                results.append(r)
+                if "error" in r:
+                    print(f"{provider:<8} {fmt:<8} {ocr:<4} error: {r['error']}")
+                    continue
+                doc = r["stages"]["document"]
+                print(
+                    f"{provider:<8} {fmt:<8} {ocr:<4} {r['pages_per_sec']:>8.2f} "
+                    f"{r['stages']['model_load']:>7.2f} {doc['p50']:>7.3f} "
+                    f"{doc['p90']:>7.3f} {r['peak_rss_mb']:>7.0f}"
+                )
+
+    report = {
+        "docparser": version("docparser"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {name: pages for name, (_, pages) in CORPUS.items()},
+        "results": results,
+    }
+    if args.out:
+        _ = Path(args.out).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"regression {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
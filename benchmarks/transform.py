@@ -0,0 +1,142 @@
+"""Post-processing cost of a converted docling document, without the models.
+
+Builds a synthetic DoclingDocument (text, tables and figures on every page) and
+times docling.Parser._transform against the multi-pass extraction it replaced:
+a body walk with eager figure crops, one serializer per table and a separate
+export. Only docling-core is needed.
+
+python benchmarks/transform.py --pages 50 200 --format markdown
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Any
+
+from docling_core.types.doc.base import BoundingBox, ImageRefMode, Size
+from docling_core.types.doc.document import (
+    DoclingDocument,
+    ImageRef,
+    PictureItem,
+    ProvenanceItem,
+    TableCell,
+    TableData,
+    TextItem,
+)
+from docling_core.types.doc.labels import DocItemLabel
+from PIL import Image
+
+from docparser.docling import Parser
+from docparser.types import ParseOpt
+
+PAGE = Size(width=612, height=792)
+
+
+def build(pages: int, paragraphs: int = 20, rows: int = 12) -> DoclingDocument:
+    doc = DoclingDocument(name="synthetic")
+    raster = Image.new("RGB", (int(PAGE.width), int(PAGE.height)), "white")
+    for pno in range(1, pages + 1):
+        _ = doc.add_page(
+            page_no=pno, size=PAGE, image=ImageRef.from_pil(raster, dpi=72)
+        )
+
+        def prov(top: float, height: float = 20) -> ProvenanceItem:
+            bbox = BoundingBox(l=50, t=top, r=560, b=top + height)
+            return ProvenanceItem(page_no=pno, bbox=bbox, charspan=(0, 0))
+
+        _ = doc.add_heading(f"Section {pno}", prov=prov(20))
+        for i in range(paragraphs):
+            _ = doc.add_text(
+                DocItemLabel.TEXT,
+                f"Paragraph {i} of page {pno}, " + "lorem ipsum dolor " * 12,
+                prov=prov(50 + i * 10, 10),
+            )
+        cells = [
+            TableCell(
+                text=f"r{r}c{c}",
+                start_row_offset_idx=r,
+                end_row_offset_idx=r + 1,
+                start_col_offset_idx=c,
+                end_col_offset_idx=c + 1,
+                column_header=r == 0,
+            )
+            for r in range(rows)
+            for c in range(4)
+        ]
+        caption = doc.add_text(DocItemLabel.CAPTION, f"Table {pno}", prov=prov(300))
+        _ = doc.add_table(
+            TableData(num_rows=rows, num_cols=4, table_cells=cells),
+            caption=caption,
+            prov=prov(320, 200),
+        )
+        _ = doc.add_picture(prov=prov(540, 200))
+    return doc
+
+
+def legacy(parser: Parser, doc: DoclingDocument) -> Any:
+    # the extraction _transform did before the single traversal
+    texts, figures, tables = [], [], []
+    for item, _ in doc.iterate_items():
+        if isinstance(item, PictureItem) and (image := item.get_image(doc)):
+            figures.append((parser._to_metadata(item), image))
+        if isinstance(item, TextItem):
+            texts.append((item.prov[0].page_no, item.text))
+    for table in doc.tables:
+        if parser.opt.output_format == "html":
+            tables.append((parser._to_metadata(table), table.export_to_html(doc)))
+        else:
+            tables.append((parser._to_metadata(table), table.export_to_markdown(doc)))
+    match parser.opt.output_format:
+        case "html":
+            body = doc.export_to_html(image_mode=ImageRefMode.REFERENCED)
+        case "json":
+            body = doc.export_to_dict()
+        case _:
+            body = doc.export_to_markdown(image_mode=ImageRefMode.REFERENCED)
+    return (texts, tables, figures, body)
+
+
+def timed(fn: Any, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        _ = fn()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    _ = ap.add_argument("--pages", nargs="+", type=int, default=[10, 50, 200])
+    _ = ap.add_argument(
+        "--format", default="markdown", choices=["markdown", "html", "json"]
+    )
+    _ = ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    opt = ParseOpt(
+        source="local",
+        address=["synthetic.pdf"],
+        input_format="pdf",
+        output_format=args.format,
+        save_dir=tempfile.mkdtemp(),
+        capbility=["text", "table", "image"],
+    )
+    parser = Parser(opt, validate=False)
+    print(f"{'pages':>6} {'items':>7} {'multi-pass s':>13} {'one pass s':>11} {'x':>6}")
+    for pages in args.pages:
+        doc = build(pages)
+        conv_res = SimpleNamespace(document=doc, input=SimpleNamespace(file=Path("x")))
+        before = timed(lambda: legacy(parser, doc), args.repeat)
+        after = timed(lambda: parser._transform(conv_res, {}), args.repeat)
+        items = sum(1 for _ in doc.iterate_items())
+        print(
+            f"{pages:>6} {items:>7} {before:>13.3f} {after:>11.3f} "
+            f"{before / after:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
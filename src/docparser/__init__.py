@@ -1,2 +1,3 @@
-def main() -> None:
-    print("Hello from docparser!")
+from docparser.cli import main
+
+__all__ = ["main"]
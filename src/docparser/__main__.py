@@ -0,0 +1,3 @@
+from docparser.cli import main
+
+main()
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal, Self, TypeVar, final
+
+from loguru import logger
+
+from docparser.base_parser import BaseParser
+from docparser.download import Download, Downloader
+from docparser.parser import load_parser
+from docparser.source import PdfInput
+from docparser.types import CommonParseOutput, ParseOpt, ParseOutput
+from docparser.utils import get_time_async
+
+R = TypeVar("R")
+
+
+@final
+class AsyncParser:
+    def __init__(
+        self,
+        opt: ParseOpt,
+        provider: Literal["pymupdf", "docling", "marker"] = "docling",
+        concurrency: int = 8,
+        max_workers: int = 1,
+        timeout: float = 60.0,
+    ) -> None:
+        self.opt = opt
+        self.provider = provider
+        self.timeout = timeout
+        self._parser_cls = load_parser(provider)
+        # unreachable urls surface as failed outputs from the fetch itself,
+        # no separate pre-flight round trip
+        self._parser = self._parser_cls(opt, validate=False)
+        self._sem = asyncio.Semaphore(concurrency)
+        self._downloader = Downloader(pool_size=concurrency, timeout=timeout)
+        self._fetch_pool = ThreadPoolExecutor(concurrency, "docparser-fetch")
+        self._convert_pool = ThreadPoolExecutor(max_workers, "docparser-convert")
+        self._local = threading.local()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        self._fetch_pool.shutdown(wait=False, cancel_futures=True)
+        await asyncio.to_thread(self._convert_pool.shutdown, True, cancel_futures=True)
+        self._downloader.close()
+
+    def _worker_parser(self) -> BaseParser:
+        # converters are not safe to share between threads, every conversion
+        # thread gets its own parser (and models) on first use
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = self._parser_cls(self.opt, validate=False)
+        return parser
+
+    def _fetch(self, addr: str) -> Download | None:
+        return None if self.opt.source == "local" else self._downloader.fetch(addr)
+
+    async def _process(
+        self, addr: str, convert: Callable[[BaseParser, PdfInput], R]
+    ) -> R:
+        loop = asyncio.get_running_loop()
+        # the semaphore spans fetch and conversion, so at most `concurrency`
+        # downloads sit on disk waiting for a converter at once
+        async with self._sem:
+            download = await loop.run_in_executor(self._fetch_pool, self._fetch, addr)
+            try:
+                path = Path(addr) if download is None else download.path
+                return await loop.run_in_executor(
+                    self._convert_pool, self._convert, convert, path
+                )
+            finally:
+                if download is not None:
+                    download.close()
+
+    def _convert(self, convert: Callable[[BaseParser, PdfInput], R], path: Path) -> R:
+        # mapped on the conversion thread, the event loop never touches the file
+        with PdfInput(path) as src:
+            return convert(self._worker_parser(), src)
+
+    @get_time_async
+    async def _parse(self, addr: str) -> ParseOutput:
+        try:
+            return await self._process(addr, BaseParser.parse_file)
+        except Exception as e:
+            logger.error(e)
+            return self._parser._failed_parse(addr, str(e))
+
+    @get_time_async
+    async def _save(self, addr: str) -> CommonParseOutput:
+        try:
+            return await self._process(addr, BaseParser.save_file)
+        except Exception as e:
+            logger.error(e)
+            return self._parser._failed_save(addr, str(e))
+
+    async def _gather(
+        self, func: Callable[[str], Awaitable[R]]
+    ) -> AsyncGenerator[R, None]:
+        tasks = [asyncio.ensure_future(func(addr)) for addr in self.opt.address]
+        try:
+            if self.opt.ordered:
+                for task in tasks:
+                    yield await task
+            else:
+                for fut in asyncio.as_completed(tasks):
+                    yield await fut
+        finally:
+            for task in tasks:
+                _ = task.cancel()
+
+    def run_sp(self) -> AsyncGenerator[ParseOutput, None]:
+        return self._gather(self._parse)
+
+    def run(self) -> AsyncGenerator[CommonParseOutput, None]:
+        return self._gather(self._save)
@@ -1,11 +1,324 @@
-from collections.abc import Generator
-from docparser.types import CommonParseOutput, ParseOpt
+import json
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from itertools import groupby
+from pathlib import Path
+from time import perf_counter
+from typing import ClassVar, Self, TypeVar
+
+from loguru import logger
+
+from docparser import metrics
+from docparser.cache import ParseCache, cache_key, fingerprint
+from docparser.download import Downloader, default_downloader, url_file_name
+from docparser.images import ImageSink
+from docparser.registry import Lease, converters
+from docparser.shard import parse_sharded, sharded_parts, shards
+from docparser.source import PdfInput
+from docparser.types import (
+    CommonParseOutput,
+    OutputFormat,
+    ParseOpt,
+    ParseOutput,
+    SavePath,
+)
+from docparser.writers import StreamWriter
+
+T = TypeVar("T")
+
+# pages per streamed part when no page_window is set
+_STREAM_PAGES = 8
 
 
 class BaseParser:
-    def __init__(self, opt: ParseOpt) -> None:
-        if not opt.ok:
+    provider: ClassVar[str] = ""
+
+    def __init__(self, opt: ParseOpt, validate: bool = True) -> None:
+        # seconds spent on "import", "warm" (model load) and the "first_call"
+        self.timings: dict[str, float] = dict()
+        self._leases: list[Lease[object]] = list()
+        if validate and not opt.ok:
             return
         self.opt: ParseOpt = opt
+        self.cache: ParseCache | None = (
+            ParseCache.open(opt.cache_dir, opt.cache_max_bytes)
+            if opt.cache_dir
+            else None
+        )
+        self.downloader: Downloader = default_downloader()
+        if opt.incremental and self.cache is None:
+            logger.warning("incremental parsing needs cache_dir, it is ignored")
 
     def run(self) -> Generator[CommonParseOutput, None, None]: ...
+
+    def run_sp(self) -> Generator[ParseOutput, None, None]: ...
+
+    def warm(self) -> Self:
+        start = perf_counter()
+        self._warm()
+        self._record("warm", perf_counter() - start)
+        return self
+
+    def _warm(self) -> None: ...
+
+    def close(self) -> None:
+        # hands the shared models back, they stay warm for the next parser
+        # until the registry evicts them
+        for lease in self._leases:
+            lease.release()
+        self._leases.clear()
+
+    def _shared(
+        self,
+        key: str,
+        build: Callable[[], T],
+        close: Callable[[T], None] | None = None,
+    ) -> Lease[T]:
+        # models built from the same options are loaded once per process;
+        # this parser holds them until close() or until it is collected
+        lease = converters.acquire(f"{self.provider}:{key}", build, close)
+        self._leases.append(lease)
+        return lease
+
+    def _record(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = seconds
+        logger.info(f"{self.provider} {stage} took {seconds:.3f}s")
+        stage = "model_load" if stage == "warm" else stage
+        metrics.observe_stage(stage, seconds, provider=self.provider)
+
+    def _record_ocr(self, name: str, ocr: dict[int, bool]) -> None:
+        # page number -> whether OCR ran on it
+        if not ocr:
+            return
+        ran = sum(ocr.values())
+        logger.info(f"{name}: OCR ran on {ran} of {len(ocr)} pages")
+        metrics.inc("docparser_ocr_pages_total", ran, provider=self.provider)
+        metrics.inc(
+            "docparser_ocr_skipped_pages_total", len(ocr) - ran, provider=self.provider
+        )
+
+    def _timed_call(self, func: Callable[[], T]) -> T:
+        if "first_call" in self.timings:
+            return func()
+        start = perf_counter()
+        result = func()
+        self._record("first_call", perf_counter() - start)
+        return result
+
+    @contextmanager
+    def _fetch(self, addr: str) -> Generator[PdfInput, None, None]:
+        # remote documents are streamed to a temp file that lives as long as
+        # the conversion; local files and downloads are then mapped the same way
+        if self.opt.source == "local":
+            with PdfInput(Path(addr)) as src:
+                yield src
+            return
+        with metrics.span("fetch", provider=self.provider):
+            download = self.downloader.fetch(addr)
+        with download, PdfInput(download.path) as src:
+            yield src
+
+    def _name(self, addr: str) -> str:
+        if self.opt.source == "local":
+            return Path(addr).stem
+        return Path(url_file_name(addr)).stem
+
+    def _failed_parse(self, addr: str, error: str) -> ParseOutput:
+        return ParseOutput.failed(name=self._name(addr), error=error)
+
+    def _failed_save(self, addr: str, error: str) -> CommonParseOutput:
+        return CommonParseOutput(
+            output_format=self.opt.output_format,
+            output_path=self.opt.save_dir / self._name(addr),
+            ok=False,
+            error=error,
+        )
+
+    # backends convert one pdf file and say whether the result is complete
+    # enough to be cached
+    def _produce_sp(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        raise NotImplementedError(f"{self.provider} does not support run_sp")
+
+    def _produce_common(self, src: PdfInput) -> tuple[CommonParseOutput, bool]:
+        raise NotImplementedError(f"{self.provider} does not support run")
+
+    def parse_pages(self, src: PdfInput, page_range: tuple[int, int]) -> ParseOutput:
+        # converts only `page_range` (1-based, inclusive), elements keep their
+        # page numbers in the whole document; used to escalate single pages
+        raise NotImplementedError(f"{self.provider} cannot parse page ranges")
+
+    def split_pages(
+        self, src: PdfInput, page_range: tuple[int, int]
+    ) -> list[ParseOutput]:
+        # one output per page of `page_range` holding only that page's elements
+        # and rendering; backends that can split a single conversion override it
+        first, last = page_range
+        return [self.parse_pages(src, (pno, pno)) for pno in range(first, last + 1)]
+
+    def _produce_incremental(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        # pages are cached one by one under a digest of their content, so a
+        # revised document only converts the pages that actually changed
+        assert self.cache is not None
+        first, last = self.opt.page_range or (1, src.page_count)
+        if first > src.page_count:
+            raise ValueError(f"{src.stem} has only {src.page_count} pages")
+        fp = fingerprint(self.opt, self.provider, "page")
+        keys = {
+            pno: f"page-{src.page_digests[pno - 1]}-{fp}"
+            for pno in range(first, min(last, src.page_count) + 1)
+        }
+        parts: dict[int, ParseOutput] = dict()
+        for pno, key in keys.items():
+            if isinstance(hit := self.cache.load(key), ParseOutput):
+                parts[pno] = hit.moved_to(pno)
+        missing = [pno for pno in keys if pno not in parts]
+        logger.info(f"{src.stem}: reusing {len(parts)}/{len(keys)} pages")
+        metrics.inc(
+            "docparser_pages_total", len(parts), provider=self.provider, status="reused"
+        )
+        metrics.inc(
+            "docparser_pages_total",
+            len(missing),
+            provider=self.provider,
+            status="parsed",
+        )
+        # consecutive changed pages are converted together
+        for _, run in groupby(enumerate(missing), key=lambda item: item[1] - item[0]):
+            span = [pno for _, pno in run]
+            with metrics.span("convert", provider=self.provider):
+                fresh = self.split_pages(src, (span[0], span[-1]))
+            for pno, part in zip(span, fresh):
+                self.cache.store(keys[pno], part)
+                parts[pno] = part
+        out = ParseOutput.splice(
+            src.stem, [parts[pno] for pno in keys], self.opt.output_formats
+        )
+        if self.opt.save_dir:
+            out.save_path = SavePath.default(root=self.opt.save_dir)
+        return (out, True)
+
+    def _write(self, out: ParseOutput, name: str) -> CommonParseOutput:
+        # every requested format as output.{md,json,html} next to the figures
+        save_dir = self.opt.save_dir / name
+        out.save_path = SavePath.default(root=save_dir)
+        paths: dict[OutputFormat, Path] = dict()
+        for fmt in self.opt.output_formats:
+            match fmt:
+                case "html":
+                    paths[fmt] = save_dir / "output.html"
+                    _ = paths[fmt].write_text(out.html or "")
+                case "json":
+                    paths[fmt] = save_dir / "output.json"
+                    _ = paths[fmt].write_text(json.dumps(out.json))
+                case _:
+                    paths[fmt] = save_dir / "output.md"
+                    _ = paths[fmt].write_text(out.markdown or "")
+        _ = out.save_figure(ImageSink.from_opt(self.opt))
+        out.release()
+        return CommonParseOutput.written(paths)
+
+    def _parts(self, src: PdfInput) -> Generator[ParseOutput, None, None]:
+        # the document in page order, one shard or page window at a time
+        if ranges := shards(self.opt, src.page_count):
+            yield from sharded_parts(self, src, ranges)
+            return
+        first, last = self.opt.page_range or (1, src.page_count)
+        if first > src.page_count:
+            raise ValueError(f"{src.stem} has only {src.page_count} pages")
+        last = min(last, src.page_count)
+        window = self.opt.page_window or _STREAM_PAGES
+        for start in range(first, last + 1, window):
+            yield self.parse_pages(src, (start, min(start + window - 1, last)))
+
+    def _produce_stream(self, src: PdfInput) -> CommonParseOutput:
+        with StreamWriter(self.opt, self.opt.save_dir / src.stem, src.stem) as writer:
+            for part in self._parts(src):
+                writer.append(part)
+                part.release()
+        return writer.written()
+
+    def _produce_sp_timed(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        with metrics.span("convert", provider=self.provider):
+            # long documents go to the workers shard by shard
+            if ranges := shards(self.opt, src.page_count):
+                out = parse_sharded(self, src, ranges)
+                if self.opt.save_dir:
+                    out.save_path = SavePath.default(root=self.opt.save_dir)
+                return (out, True)
+            return self._produce_sp(src)
+
+    def _produce_common_timed(self, src: PdfInput) -> tuple[CommonParseOutput, bool]:
+        with metrics.span("convert", provider=self.provider):
+            if self.opt.stream:
+                return (self._produce_stream(src), True)
+            if ranges := shards(self.opt, src.page_count):
+                return (self._write(parse_sharded(self, src, ranges), src.stem), True)
+            return self._produce_common(src)
+
+    def parse_file(self, src: PdfInput) -> ParseOutput:
+        if self.cache is None:
+            return self._produce_sp_timed(src)[0]
+        key = cache_key(src.sha256, self.opt, self.provider, "sp")
+        if isinstance(hit := self.cache.load(key), ParseOutput):
+            # the same bytes may arrive under another name, report this one
+            hit.name = src.stem
+            hit.save_path = (
+                SavePath.default(root=self.opt.save_dir) if self.opt.save_dir else None
+            )
+            return hit
+        output, complete = (
+            self._produce_incremental(src)
+            if self.opt.incremental
+            else self._produce_sp_timed(src)
+        )
+        if complete:
+            self.cache.store(key, output)
+        return output
+
+    def save_file(self, src: PdfInput) -> CommonParseOutput:
+        if self.cache is None:
+            return self._produce_common_timed(src)[0]
+        key = cache_key(src.sha256, self.opt, self.provider, "common")
+        dest = self.opt.save_dir / src.stem
+        if isinstance(hit := self.cache.load(key, restore=dest), CommonParseOutput):
+            return CommonParseOutput(
+                output_format=hit.output_format,
+                output_path=dest / hit.output_path.name,
+                output_paths={
+                    fmt: dest / path.name for fmt, path in hit.output_paths.items()
+                },
+            )
+        output, complete = self._produce_common_timed(src)
+        if complete:
+            self.cache.store(key, output, files=output.output_path.parent)
+        return output
+
+    def parse_one(self, addr: str) -> ParseOutput:
+        try:
+            with self._fetch(addr) as src:
+                output = self.parse_file(src)
+            metrics.inc(
+                "docparser_documents_total", provider=self.provider, status="ok"
+            )
+            return output
+        except Exception as e:
+            logger.error(e)
+            metrics.inc(
+                "docparser_documents_total", provider=self.provider, status="failed"
+            )
+            return self._failed_parse(addr, str(e))
+
+    def save_one(self, addr: str) -> CommonParseOutput:
+        try:
+            with self._fetch(addr) as src:
+                output = self.save_file(src)
+            metrics.inc(
+                "docparser_documents_total", provider=self.provider, status="ok"
+            )
+            return output
+        except Exception as e:
+            logger.error(e)
+            metrics.inc(
+                "docparser_documents_total", provider=self.provider, status="failed"
+            )
+            return self._failed_save(addr, str(e))
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import sys
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any, TextIO, final
+
+from loguru import logger
+from typeric.result import Ok, Result
+
+from docparser.base_parser import BaseParser
+from docparser.cache import fingerprint
+from docparser.parser import load_parser
+from docparser.pool import run_pool
+from docparser.types import CommonParseOutput, ParseOpt
+
+JOURNAL = ".docparser-journal.jsonl"
+
+
+def _is_url(addr: str) -> bool:
+    return addr.startswith(("http://", "https://"))
+
+
+def read_manifest(items: Iterable[str]) -> list[str]:
+    # each item is a pdf or url, a glob, a .jsonl of {"address": ...} objects
+    # (or bare strings), or a text file with one address per line
+    found: list[str] = list()
+    for item in items:
+        path = Path(item)
+        if _is_url(item) or path.suffix.lower() == ".pdf" and not glob.has_magic(item):
+            found.append(item)
+        elif path.suffix == ".jsonl":
+            for line in path.read_text().splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    found.append(entry if isinstance(entry, str) else entry["address"])
+        elif path.is_file():
+            found.extend(
+                line.strip()
+                for line in path.read_text().splitlines()
+                if line.strip() and not line.lstrip().startswith("#")
+            )
+        elif matches := sorted(glob.glob(item, recursive=True)):
+            found.extend(matches)
+        else:
+            raise ValueError(f"{item} is neither a document, a manifest nor a glob")
+    # keep the first occurrence, a resumed run must see the same order
+    return list(dict.fromkeys(found))
+
+
+@final
+class Journal:
+    # one json line per finished document, appended and synced as soon as the
+    # document is done so an interrupted run loses nothing it completed
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.done: dict[str, dict[str, Any]] = dict()
+        if path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # the line being written when the run was killed
+                    continue
+                if entry.get("ok"):
+                    self.done[entry["address"]] = entry
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: TextIO = open(path, "a")
+
+    def completed(self, addr: str, run: str) -> bool:
+        # a document only counts as done for the same provider and options
+        entry = self.done.get(addr)
+        return entry is not None and entry.get("run") == run
+
+    def record(
+        self, addr: str, run: str, out: CommonParseOutput, seconds: float
+    ) -> None:
+        entry = {
+            "address": addr,
+            "run": run,
+            "ok": out.ok,
+            "output_path": str(out.output_path),
+            "output_paths": {fmt: str(path) for fmt, path in out.output_paths.items()},
+            "error": out.error,
+            "seconds": round(seconds, 3),
+        }
+        _ = self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return (
+        f"{hours}h{minutes:02d}m{seconds:02d}s"
+        if hours
+        else f"{minutes}m{seconds:02d}s"
+    )
+
+
+@dataclass
+class Progress:
+    total: int
+    skipped: int = 0
+    done: int = 0
+    failures: list[tuple[str, str]] = field(default_factory=list)
+    start: float = field(default_factory=perf_counter)
+    out: TextIO = field(default_factory=lambda: sys.stderr)
+
+    def update(self, addr: str, out: CommonParseOutput) -> None:
+        self.done += 1
+        if not out.ok:
+            self.failures.append((addr, out.error or "unknown error"))
+        elapsed = perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        left = self.total - self.skipped - self.done
+        eta = _duration(left / rate) if rate else "?"
+        status = "ok" if out.ok else "FAILED"
+        print(
+            f"[{self.done + self.skipped}/{self.total}] {rate:.2f} docs/s "
+            f"eta {eta} {status} {addr}",
+            file=self.out,
+        )
+
+    def report(self) -> str:
+        elapsed = perf_counter() - self.start
+        lines = [
+            f"{self.done - len(self.failures)} converted, {len(self.failures)} failed, "
+            f"{self.skipped} already done, in {_duration(elapsed)}"
+        ]
+        lines.extend(f"  {addr}: {error}" for addr, error in self.failures)
+        return "\n".join(lines)
+
+
+_worker: BaseParser | None = None
+
+
+def _init_worker(provider: str, opt: ParseOpt) -> None:
+    # once per worker: load the models before the first document arrives.
+    # Addresses are not validated up front, a bad one fails on its own
+    global _worker
+    _worker = load_parser(provider)(opt, validate=False).warm()
+
+
+def _worker_save(addr: str) -> tuple[CommonParseOutput, float]:
+    assert _worker is not None
+    start = perf_counter()
+    out = _worker.save_one(addr)
+    return (out, perf_counter() - start)
+
+
+def _results(
+    provider: str, opt: ParseOpt, todo: list[str]
+) -> Generator[tuple[str, Result[tuple[CommonParseOutput, float], str]], None, None]:
+    # with shard_pages the workers split one document at a time instead
+    if opt.workers <= 1 or opt.shard_pages:
+        _init_worker(provider, opt)
+        return ((addr, Ok(_worker_save(addr))) for addr in todo)
+    # the journal is keyed by address, so finish order does not matter
+    return run_pool(
+        _worker_save,
+        todo,
+        workers=opt.workers,
+        ordered=False,
+        initializer=_init_worker,
+        initargs=(provider, opt),
+    )
+
+
+def run_batch(
+    addresses: list[str],
+    provider: str,
+    options: dict[str, Any],
+    journal: Path | None = None,
+) -> Progress:
+    options = {"output_format": "markdown", "save_dir": "output", **options}
+    journal = Journal(journal or Path(options["save_dir"]) / JOURNAL)
+    progress = Progress(total=len(addresses))
+    try:
+        # ParseOpt takes one source, a mixed manifest runs as two batches
+        for source in ("local", "url"):
+            batch = [a for a in addresses if _is_url(a) == (source == "url")]
+            if not batch:
+                continue
+            opt = ParseOpt(source, batch, "pdf", **options)
+            run = fingerprint(opt, provider, "common")
+            todo = [a for a in batch if not journal.completed(a, run)]
+            progress.skipped += len(batch) - len(todo)
+            if not todo:
+                continue
+            logger.info(f"{len(todo)} {source} documents to convert with {provider}")
+            for addr, res in _results(provider, opt, todo):
+                if res.is_err():
+                    # the worker process itself went away
+                    out = CommonParseOutput(
+                        output_format=opt.output_format,
+                        output_path=opt.save_dir,
+                        ok=False,
+                        error=res.unwrap_err(),
+                    )
+                    seconds = 0.0
+                else:
+                    out, seconds = res.unwrap()
+                journal.record(addr, run, out, seconds)
+                progress.update(addr, out)
+    finally:
+        journal.close()
+    return progress
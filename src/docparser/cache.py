@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import ClassVar, final
+
+from loguru import logger
+
+from docparser.types import ParseOpt
+
+# bump whenever the pickled ParseOutput/CommonParseOutput layout changes
+_SCHEMA = 4
+_PICKLE = "output.pkl"
+_FILES = "files"
+_INDEX = "index.sqlite"
+
+try:
+    _VERSION = version("docparser")
+except PackageNotFoundError:
+    _VERSION = "0"
+
+
+def fingerprint(opt: ParseOpt, provider: str, mode: str) -> str:
+    fields = {
+        "schema": _SCHEMA,
+        "version": _VERSION,
+        "provider": provider,
+        "mode": mode,
+        "output_format": list(opt.output_formats),
+        "do_ocr": opt.do_ocr,
+        "ocr_mode": opt.ocr_mode,
+        "use_llm": opt.use_llm,
+        "capbility": sorted(opt.capbility or []),
+        # page entries are shared by every range that covers the page
+        "page_range": opt.page_range if mode != "page" else None,
+        "incremental": opt.incremental,
+        "shard_pages": opt.shard_pages,
+        "stream": opt.stream,
+        "escalate": opt.escalate,
+        "images": [
+            opt.image_format,
+            opt.image_quality,
+            opt.image_dpi,
+            str(opt.image_store) if opt.image_store else None,
+            opt.image_hash,
+        ],
+    }
+    blob = json.dumps(fields, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def file_sha256(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def cache_key(digest: str, opt: ParseOpt, provider: str, mode: str) -> str:
+    return f"{digest}-{fingerprint(opt, provider, mode)}"
+
+
+def _tree_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    def to_prometheus(self, prefix: str = "docparser_cache") -> str:
+        lines = [
+            f"{prefix}_hits_total {self.hits}",
+            f"{prefix}_misses_total {self.misses}",
+            f"{prefix}_evictions_total {self.evictions}",
+            f"{prefix}_entries {self.entries}",
+            f"{prefix}_bytes {self.bytes}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+@final
+class ParseCache:
+    # the LRU index and the counters live in a sqlite file next to the entries,
+    # so every process using the same root (e.g. pool workers) shares them
+    _shared: ClassVar[dict[Path, ParseCache]] = {}
+    _shared_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        with self._db() as db:
+            _ = db.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, size INTEGER NOT NULL, used REAL NOT NULL)"
+            )
+            _ = db.execute(
+                "CREATE TABLE IF NOT EXISTS counters "
+                "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    @classmethod
+    def open(cls, root: str | Path, max_bytes: int) -> ParseCache:
+        root = Path(root).resolve()
+        with cls._shared_lock:
+            cache = cls._shared.get(root)
+            if cache is None:
+                cache = cls._shared[root] = cls(root, max_bytes)
+            elif cache.max_bytes != max_bytes:
+                logger.info(f"cache {root}: max_bytes {cache.max_bytes} -> {max_bytes}")
+                cache.max_bytes = max_bytes
+                with cache._db() as db:
+                    _ = db.execute("BEGIN IMMEDIATE")
+                    cache._evict(db)
+            return cache
+
+    @contextmanager
+    def _db(self) -> Generator[sqlite3.Connection, None, None]:
+        db = sqlite3.connect(self.root / _INDEX, timeout=60)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _count(db: sqlite3.Connection, name: str) -> None:
+        _ = db.execute(
+            "INSERT INTO counters VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._db() as db:
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return CacheStats(
+            hits=counters.get("hits", 0),
+            misses=counters.get("misses", 0),
+            evictions=counters.get("evictions", 0),
+            entries=entries,
+            bytes=size,
+        )
+
+    def load(self, key: str, restore: Path | None = None) -> object | None:
+        # saved files are copied into `restore` before this counts as a hit
+        entry = self.root / key
+        try:
+            with open(entry / _PICKLE, "rb") as f:
+                value = pickle.load(f)
+            if restore is not None:
+                shutil.copytree(entry / _FILES, restore, dirs_exist_ok=True)
+        except Exception as e:
+            if not isinstance(e, FileNotFoundError):
+                # unreadable or written by an incompatible version, drop it
+                logger.warning(f"discarding cache entry {key}: {e}")
+                self._remove(key)
+            with self._db() as db:
+                self._count(db, "misses")
+            return None
+        with self._db() as db:
+            self._count(db, "hits")
+            updated = db.execute(
+                "UPDATE entries SET used = ? WHERE key = ?", (time.time(), key)
+            )
+            if updated.rowcount == 0:
+                _ = db.execute(
+                    "INSERT OR IGNORE INTO entries VALUES (?, ?, ?)",
+                    (key, _tree_size(entry), time.time()),
+                )
+        return value
+
+    def store(self, key: str, value: object, files: Path | None = None) -> None:
+        entry = self.root / key
+        tmp = self.root / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            tmp.mkdir(parents=True, exist_ok=True)
+            with open(tmp / _PICKLE, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if files is not None:
+                shutil.copytree(files, tmp / _FILES)
+            size = _tree_size(tmp)
+            if size > self.max_bytes:
+                logger.warning(
+                    f"skip caching {key}: {size} bytes exceeds the cache size"
+                )
+                return
+            with self._db() as db:
+                # take the write lock first so concurrent writers evict in turn
+                _ = db.execute("BEGIN IMMEDIATE")
+                if entry.exists():
+                    return
+                tmp.rename(entry)
+                _ = db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    (key, size, time.time()),
+                )
+                self._evict(db)
+        except (OSError, sqlite3.Error, pickle.PicklingError) as e:
+            logger.error(f"failed to cache {key}: {e}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _remove(self, key: str) -> None:
+        shutil.rmtree(self.root / key, ignore_errors=True)
+        with self._db() as db:
+            _ = db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        rows = db.execute("SELECT key, size FROM entries ORDER BY used").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.root / key, ignore_errors=True)
+            _ = db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(db, "evictions")
+            total -= size
@@ -0,0 +1,184 @@
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, get_args
+
+from docparser.images import ImageFormat, ImageHash
+from docparser.types import DefaultCapbility, OcrMode, OutputFormat, default_providers
+
+# "random" only exists for ParseReq callers
+_PROVIDERS = [p for p in default_providers if p != "random"]
+
+
+def _page_range(value: str) -> tuple[int, int]:
+    first, _, last = value.partition("-")
+    try:
+        return (int(first), int(last or first))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected N or N-M, got {value!r}")
+
+
+def _add_opt_args(ap: argparse.ArgumentParser) -> None:
+    # ParseOpt flags; source and address come from the manifest
+    _ = ap.add_argument(
+        "--output-format",
+        nargs="+",
+        default=["markdown"],
+        choices=get_args(OutputFormat),
+        help="one or more, all rendered from the same conversion",
+    )
+    _ = ap.add_argument("--save-dir", default="output")
+    _ = ap.add_argument(
+        "--capbility", nargs="+", choices=get_args(DefaultCapbility), default=None
+    )
+    _ = ap.add_argument("--no-ocr", dest="do_ocr", action="store_false")
+    _ = ap.add_argument(
+        "--ocr-mode",
+        default="hybrid",
+        choices=get_args(OcrMode),
+        help="hybrid only OCRs pages and images without a usable text layer",
+    )
+    _ = ap.add_argument("--gpu", dest="gpu_enabled", action="store_true")
+    _ = ap.add_argument("--use-llm", action="store_true")
+    _ = ap.add_argument("--workers", type=int, default=1)
+    _ = ap.add_argument("--cache-dir")
+    _ = ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only convert pages not seen before, needs --cache-dir",
+    )
+    _ = ap.add_argument("--page-range", type=_page_range, help="N or N-M, 1-based")
+    _ = ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="append output as pages are converted, json is written as json lines",
+    )
+    _ = ap.add_argument("--page-window", type=int, help="pages per streamed part")
+    _ = ap.add_argument(
+        "--shard-pages",
+        type=int,
+        help="split longer documents into shards of N pages across --workers",
+    )
+    _ = ap.add_argument("--escalate", choices=["docling", "marker"])
+    _ = ap.add_argument(
+        "--route-policy",
+        default="cheapest",
+        choices=["cheapest", "least-loaded", "round-robin"],
+    )
+    _ = ap.add_argument("--image-format", default="png", choices=get_args(ImageFormat))
+    _ = ap.add_argument("--image-quality", type=int, default=85)
+    _ = ap.add_argument("--image-dpi", type=int)
+    _ = ap.add_argument(
+        "--image-store", help="write each distinct image once to this shared directory"
+    )
+    _ = ap.add_argument("--image-hash", default="exact", choices=get_args(ImageHash))
+
+
+def _opt_kwargs(args: argparse.Namespace) -> dict[str, Any]:
+    keys = (
+        "output_format",
+        "save_dir",
+        "capbility",
+        "do_ocr",
+        "ocr_mode",
+        "gpu_enabled",
+        "use_llm",
+        "workers",
+        "cache_dir",
+        "incremental",
+        "page_range",
+        "shard_pages",
+        "stream",
+        "page_window",
+        "escalate",
+        "route_policy",
+        "image_format",
+        "image_quality",
+        "image_dpi",
+        "image_store",
+        "image_hash",
+    )
+    return {key: getattr(args, key) for key in keys}
+
+
+def _batch(args: argparse.Namespace) -> None:
+    from docparser.batch import read_manifest, run_batch
+
+    addresses = read_manifest(args.manifest)
+    try:
+        progress = run_batch(
+            addresses,
+            args.provider,
+            _opt_kwargs(args),
+            Path(args.journal) if args.journal else None,
+        )
+    except KeyboardInterrupt:
+        print("interrupted, run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    print(progress.report(), file=sys.stderr)
+    if progress.failures:
+        sys.exit(1)
+
+
+def _serve(args: argparse.Namespace) -> None:
+    from docparser.serve import Daemon, serve
+
+    daemon = Daemon(
+        provider=args.provider,
+        save_dir=args.save_dir,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        max_profiles=args.max_profiles,
+        timeout=args.timeout,
+    )
+    for provider in args.preload:
+        daemon.preload(provider)
+    serve(daemon, args.host, args.port, args.socket)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="docparser")
+    commands = ap.add_subparsers(dest="command", required=True)
+
+    sp = commands.add_parser(
+        "serve", help="keep models loaded and convert jobs posted over http"
+    )
+    _ = sp.add_argument("--host", default="127.0.0.1")
+    _ = sp.add_argument("--port", type=int, default=8765)
+    _ = sp.add_argument("--socket", help="listen on this unix socket instead")
+    _ = sp.add_argument("--provider", default="auto", choices=_PROVIDERS)
+    _ = sp.add_argument("--save-dir", default="output")
+    _ = sp.add_argument("--workers", type=int, default=1)
+    _ = sp.add_argument(
+        "--queue-size", type=int, default=16, help="jobs beyond this get a 503"
+    )
+    _ = sp.add_argument(
+        "--max-profiles", type=int, default=4, help="warm option profiles to keep"
+    )
+    _ = sp.add_argument("--timeout", type=float, default=600.0)
+    _ = sp.add_argument(
+        "--preload",
+        nargs="*",
+        default=[],
+        choices=_PROVIDERS,
+        help="load these providers' models before accepting jobs",
+    )
+    sp.set_defaults(func=_serve)
+
+    bp = commands.add_parser(
+        "batch", help="convert a manifest of documents, resuming where it stopped"
+    )
+    _ = bp.add_argument(
+        "manifest",
+        nargs="+",
+        help="pdfs, urls, globs, text files with one address per line or .jsonl",
+    )
+    _ = bp.add_argument("--provider", default="auto", choices=_PROVIDERS)
+    _ = bp.add_argument(
+        "--journal", help="checkpoint file, defaults to a journal in SAVE_DIR"
+    )
+    _add_opt_args(bp)
+    bp.set_defaults(func=_batch)
+
+    args = ap.parse_args(argv)
+    args.func(args)
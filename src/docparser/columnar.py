@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, final
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+    from pyarrow import Table
+
+    from docparser.types import Metadata, ParseOutput
+
+
+def _strings(values: Iterable[str]) -> tuple[NDArray[np.int64], NDArray[np.uint8]]:
+    # arrow's large_string layout: utf-8 bytes back to back plus n + 1 offsets
+    encoded = [v.encode() for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _pages(metadata: list[Metadata]) -> NDArray[np.int32]:
+    return np.fromiter((m.page_no for m in metadata), np.int32, len(metadata))
+
+
+def _bboxes(metadata: list[Metadata]) -> NDArray[np.float32]:
+    # (n, 4) rows of left, top, right, bottom
+    return np.array([m.bbox for m in metadata], dtype=np.float32).reshape(-1, 4)
+
+
+@final
+@dataclass(frozen=True, slots=True)
+class Columns:
+    # text i is text_data[text_offsets[i]:text_offsets[i + 1]], utf-8 encoded
+    text_page: NDArray[np.int32]
+    text_offsets: NDArray[np.int64]
+    text_data: NDArray[np.uint8]
+    table_page: NDArray[np.int32]
+    table_bbox: NDArray[np.float32]
+    # markdown or html of each table, whichever the backend produced
+    table_offsets: NDArray[np.int64]
+    table_data: NDArray[np.uint8]
+    figure_page: NDArray[np.int32]
+    figure_bbox: NDArray[np.float32]
+
+    @staticmethod
+    def from_output(out: ParseOutput) -> Columns:
+        text_offsets, text_data = _strings(el.content for el in out.text)
+        tables = [el.metadata for el in out.table]
+        table_offsets, table_data = _strings(
+            el.html or el.markdown or "" for el in out.table
+        )
+        figures = [el.metadata for el in out.figure]
+        return Columns(
+            text_page=np.fromiter(
+                (el.page_no for el in out.text), np.int32, len(out.text)
+            ),
+            text_offsets=text_offsets,
+            text_data=text_data,
+            table_page=_pages(tables),
+            table_bbox=_bboxes(tables),
+            table_offsets=table_offsets,
+            table_data=table_data,
+            figure_page=_pages(figures),
+            figure_bbox=_bboxes(figures),
+        )
+
+    def text(self, i: int) -> str:
+        start, end = self.text_offsets[i], self.text_offsets[i + 1]
+        return self.text_data[start:end].tobytes().decode()
+
+    def table(self, i: int) -> str:
+        start, end = self.table_offsets[i], self.table_offsets[i + 1]
+        return self.table_data[start:end].tobytes().decode()
+
+    def texts_on(self, page_no: int) -> list[str]:
+        return [self.text(int(i)) for i in np.flatnonzero(self.text_page == page_no)]
+
+    def to_arrow(self) -> dict[str, Table]:
+        # the arrow arrays wrap the numpy buffers, nothing is copied
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("arrow export needs pyarrow: pip install pyarrow") from e
+
+        def strings(
+            offsets: NDArray[np.int64], data: NDArray[np.uint8]
+        ) -> pa.LargeStringArray:
+            return pa.LargeStringArray.from_buffers(
+                len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data)
+            )
+
+        def bboxes(bbox: NDArray[np.float32]) -> Any:
+            return pa.FixedSizeListArray.from_arrays(pa.array(bbox.reshape(-1)), 4)
+
+        return {
+            "text": pa.table(
+                {
+                    "page_no": pa.array(self.text_page),
+                    "content": strings(self.text_offsets, self.text_data),
+                }
+            ),
+            "table": pa.table(
+                {
+                    "page_no": pa.array(self.table_page),
+                    "bbox": bboxes(self.table_bbox),
+                    "content": strings(self.table_offsets, self.table_data),
+                }
+            ),
+            "figure": pa.table(
+                {
+                    "page_no": pa.array(self.figure_page),
+                    "bbox": bboxes(self.figure_bbox),
+                }
+            ),
+        }
+
+    def write_parquet(self, root: Path) -> list[Path]:
+        import pyarrow.parquet as pq
+
+        root.mkdir(parents=True, exist_ok=True)
+        paths: list[Path] = list()
+        for kind, table in self.to_arrow().items():
+            paths.append(root / f"{kind}.parquet")
+            pq.write_table(table, paths[-1])
+        return paths
@@ -1,49 +1,248 @@
-from collections.abc import Generator
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Callable, Generator, Iterable, Mapping
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cache, cached_property, partial
 from pathlib import Path
-from typing import final, override
-from loguru import logger
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Protocol, TypeVar, final, override
 
-from docling.datamodel.base_models import ConversionStatus, InputFormat
-from docling.datamodel.document import ConversionResult
-from docling_core.types.doc.document import PictureItem
-from docling_core.types.doc.base import ImageRefMode
-from docling.datamodel.pipeline_options import (
-    EasyOcrOptions,
-    PdfPipelineOptions,
-)
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling_core.types.doc.document import (
-    DocItem,
-    TextItem,
-)
-from PIL.Image import Image
+from loguru import logger
 
+from docparser import metrics
 from docparser.base_parser import BaseParser
+from docparser.images import Interner
 from docparser.types import (
     CommonParseOutput,
     ImageElement,
     Metadata,
+    OutputFormat,
     ParseOpt,
     ParseOutput,
     SavePath,
     TableElement,
     TextElement,
 )
-from docparser.utils import get_time_sync
+from docparser.pool import run_pool
+from docparser.registry import Lease
+from docparser.source import PdfInput
+from docparser.utils import get_time_sync, run_concurrently
+
+if TYPE_CHECKING:
+    from docling.datamodel.base_models import Page
+    from docling.datamodel.document import ConversionResult
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import DocumentConverter
+    from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
+    from docling_core.transforms.serializer.base import SerializationResult
+    from docling_core.transforms.serializer.common import CommonParams, DocSerializer
+    from docling_core.types.doc.base import BoundingBox
+    from docling_core.types.doc.document import (
+        DocItem,
+        DoclingDocument,
+        NodeItem,
+        PictureItem,
+        TableItem,
+    )
+    from PIL.Image import Image
+
+R = TypeVar("R")
+
+
+class _Recorder(Protocol):
+    params: CommonParams
+
+    @property
+    def visited(self) -> list[NodeItem]: ...
+
+    def serialize(self) -> SerializationResult: ...
+
+    def rendered(self, item: TableItem) -> str: ...
+
+
+@cache
+def _recording(base: type[DocSerializer]) -> Callable[..., _Recorder]:
+    from docling_core.types.doc.document import DocItem, TableItem
+    from pydantic import PrivateAttr
+
+    class Recording(base):
+        # items in the order the serializer reached them and every table's
+        # own rendering, both by self_ref
+        _items: dict[str, NodeItem] = PrivateAttr(default_factory=dict)
+        _tables: dict[str, str] = PrivateAttr(default_factory=dict)
+
+        @property
+        def visited(self) -> list[NodeItem]:
+            return list(self._items.values())
+
+        @override
+        def serialize(
+            self, *, item: NodeItem | None = None, **kwargs: Any
+        ) -> SerializationResult:
+            if isinstance(item, DocItem):
+                _ = self._items.setdefault(item.self_ref, item)
+            part = super().serialize(item=item, **kwargs)
+            if isinstance(item, TableItem) and part.text:
+                self._tables[item.self_ref] = part.text
+            return part
+
+        def rendered(self, item: TableItem) -> str:
+            # tables the last traversal skipped (other pages, json output)
+            if item.self_ref not in self._tables:
+                _ = self.serialize(item=item)
+            return self._tables.get(item.self_ref, "")
+
+    return Recording
+
+
+_SUFFIX: dict[OutputFormat, str] = {"markdown": ".md", "json": ".json", "html": ".html"}
+
+
+def _serializers(doc: DoclingDocument) -> dict[OutputFormat, _Recorder]:
+    # cheap to build, one only walks the document once asked to serialize
+    return {fmt: _serializer(doc, fmt) for fmt in ("markdown", "html")}
+
+
+def _serializer(doc: DoclingDocument, fmt: str) -> _Recorder:
+    from docling_core.types.doc.base import ImageRefMode
+
+    # the same parameters export_to_markdown/html use by default
+    if fmt == "html":
+        from docling_core.transforms.serializer.html import (
+            HTMLDocSerializer,
+            HTMLParams,
+        )
+
+        return _recording(HTMLDocSerializer)(
+            doc=doc, params=HTMLParams(image_mode=ImageRefMode.REFERENCED)
+        )
+    from docling_core.transforms.serializer.markdown import (
+        MarkdownDocSerializer,
+        MarkdownParams,
+    )
+
+    return _recording(MarkdownDocSerializer)(
+        doc=doc, params=MarkdownParams(image_mode=ImageRefMode.REFERENCED)
+    )
+
+
+def _has_image(item: PictureItem, doc: DoclingDocument) -> bool:
+    # what get_image checks before cropping, without the crop
+    if not item.prov:
+        return False
+    if item.image is not None:
+        return True
+    page = doc.pages.get(item.prov[0].page_no)
+    return page is not None and page.size is not None and page.image is not None
+
+
+def _crop(item: PictureItem, doc: DoclingDocument, interner: Interner) -> Image:
+    if (image := item.get_image(doc)) is None:
+        raise RuntimeError(f"{item.self_ref} has no image")
+    return interner.intern(image)
+
+
+# page number -> whether OCR ran on it, filled by the OCR model while a
+# conversion runs on this thread
+_ocr_pages: ContextVar[dict[int, bool] | None] = ContextVar("_ocr_pages", default=None)
+
+
+@dataclass(frozen=True)
+class TextLayer:
+    # a page whose text layer has at least this many characters is read from
+    # it, only bitmaps no text is drawn over still go through OCR
+    min_chars: int = 32
+
+    def ocr_rects(self, page: Page, rects: list[BoundingBox]) -> list[BoundingBox]:
+        assert page.size is not None
+        cells = [cell for cell in page.cells if not cell.from_ocr and cell.text.strip()]
+        if sum(len(cell.text.strip()) for cell in cells) < self.min_chars:
+            return rects
+        height = page.size.height
+        boxes = [
+            cell.rect.to_bounding_box().to_top_left_origin(height) for cell in cells
+        ]
+        return [
+            rect
+            for rect in rects
+            if not any(rect.intersection_area_with(box) > 0 for box in boxes)
+        ]
+
+
+@cache
+def _ocr_pipeline(text_layer: TextLayer | None) -> type[StandardPdfPipeline]:
+    from docling.models.base_ocr_model import BaseOcrModel
+    from docling.pipeline.standard_pdf_pipeline import StandardPdfPipeline
+
+    def ocr_rects(
+        find: Callable[[Page], list[BoundingBox]], page: Page
+    ) -> list[BoundingBox]:
+        # docling's own choice: the bitmaps, or the whole page once they
+        # cover most of it
+        rects = find(page)
+        if text_layer is not None and rects:
+            rects = text_layer.ocr_rects(page, rects)
+        if (report := _ocr_pages.get()) is not None:
+            report[page.page_no + 1] = bool(rects)
+        return rects
+
+    class OcrPipeline(StandardPdfPipeline):
+        def __init__(self, pipeline_options: PdfPipelineOptions) -> None:
+            super().__init__(pipeline_options)
+            # every OCR engine asks get_ocr_rects which regions to read
+            for model in self.build_pipe:
+                if isinstance(model, BaseOcrModel):
+                    model.get_ocr_rects = partial(ocr_rects, model.get_ocr_rects)
+
+    return OcrPipeline
 
 
 @final
 class Parser(BaseParser):
-    def __init__(self, opt: ParseOpt) -> None:
-        super().__init__(opt)
-        self._convert = DocumentConverter(
-            allowed_formats=[InputFormat.PDF],
-            format_options={
-                InputFormat.PDF: PdfFormatOption(
-                    pipeline_options=self._opt_process(opt)
-                )
-            },
-        )
+    provider = "docling"
+    # pages with a usable text layer skip OCR when `opt.ocr_mode` is "hybrid"
+    text_layer = TextLayer()
+
+    @cached_property
+    def _converter(self) -> Lease[DocumentConverter]:
+        # docling (and torch behind it) is only imported on the first real
+        # conversion, cache hits and validation never pay for it. Parsers
+        # with the same pipeline options share one converter and its models
+        start = perf_counter()
+        pipe_opt = self._opt_process(self.opt)
+        text_layer = self.text_layer if self.opt.ocr_mode == "hybrid" else None
+
+        def build() -> DocumentConverter:
+            from docling.datamodel.base_models import InputFormat
+            from docling.datamodel.settings import settings
+            from docling.document_converter import DocumentConverter, PdfFormatOption
+
+            if metrics.enabled():
+                # docling then times layout, ocr, table_structure, ... per page
+                settings.debug.profile_pipeline_timings = True
+            return DocumentConverter(
+                allowed_formats=[InputFormat.PDF],
+                format_options={
+                    InputFormat.PDF: PdfFormatOption(
+                        pipeline_cls=_ocr_pipeline(text_layer),
+                        pipeline_options=pipe_opt,
+                    )
+                },
+            )
+
+        lease = self._shared(f"{text_layer}:{pipe_opt.model_dump_json()}", build)
+        self._record("import", perf_counter() - start)
+        return lease
+
+    @override
+    def _warm(self) -> None:
+        from docling.datamodel.base_models import InputFormat
+
+        with self._converter.lock:
+            self._converter.value.initialize_pipeline(InputFormat.PDF)
 
     @staticmethod
     def _to_metadata(element: DocItem) -> Metadata:
@@ -52,162 +251,334 @@ class Parser(BaseParser):
         return Metadata(page_no=page_no, bbox=bbox)
 
     def _opt_process(self, opt: ParseOpt) -> PdfPipelineOptions:
+        from docling.datamodel.pipeline_options import (
+            EasyOcrOptions,
+            PdfPipelineOptions,
+        )
+
+        # a stage that was not asked for is never loaded nor run: no table
+        # model without "table", no page rasters without "page", no figure
+        # crops without "image"
         pipe_opt = PdfPipelineOptions()
+        pipe_opt.do_ocr = opt.do_ocr
         if opt.do_ocr:
-            pipe_opt.do_ocr = True
             pipe_opt.ocr_options = EasyOcrOptions()
             pipe_opt.ocr_options.use_gpu = False
-            pipe_opt.do_formula_enrichment = True
-        pipe_opt.do_table_structure = True
-        pipe_opt.generate_page_images = True
-        pipe_opt.generate_picture_images = True
+            pipe_opt.do_formula_enrichment = "text" in opt.capbility
+        pipe_opt.do_table_structure = "table" in opt.capbility
+        pipe_opt.generate_page_images = "page" in opt.capbility
+        pipe_opt.generate_picture_images = "image" in opt.capbility
         pipe_opt.table_structure_options.do_cell_matching = False
+        if opt.workers > 1:
+            # share the cores between workers instead of oversubscribing them
+            pipe_opt.accelerator_options.num_threads = max(
+                1, (os.cpu_count() or 1) // opt.workers
+            )
         return pipe_opt
 
-    def _run(self) -> Generator[ConversionResult, None, None]:
-        source: list[str] | list[Path] = self.opt.address
-        if self.opt.source == "local":
-            source = [Path(addr) for addr in self.opt.address]
-        yield from self._convert.convert_all(source=source, raises_on_error=True)
-
-    def _extract_body(
-        self, conv_res: ConversionResult
-    ) -> tuple[list[TextElement], list[Image], list[ImageElement]]:
-        pages: list[Image] = list()
-        for _, page in conv_res.document.pages.items():
-            if page.image and (img := page.image.pil_image):
-                pages.append(img)
-        figures: list[ImageElement] = list()
-        texts: list[TextElement] = list()
-        for element, _ in conv_res.document.iterate_items():
-            if isinstance(element, PictureItem):
-                image = element.get_image(conv_res.document)
-                if image is None:
-                    continue
-                figures.append(
-                    ImageElement(metadata=self._to_metadata(element), image=image)
-                )
-            if isinstance(element, TextItem):
-                texts.append(
-                    TextElement(page_no=element.prov[0].page_no, content=element.text)
+    def _convert_one(
+        self,
+        source: Path,
+        page_range: tuple[int, int] | None = None,
+    ) -> tuple[ConversionResult, dict[int, bool]]:
+        from docling.datamodel.base_models import ConversionStatus
+        from docling.datamodel.settings import DEFAULT_PAGE_RANGE
+
+        page_range = page_range or self.opt.page_range or DEFAULT_PAGE_RANGE
+        ocr: dict[int, bool] = dict()
+        token = _ocr_pages.set(ocr)
+        try:
+            with self._converter.lock:
+                conv_res = self._timed_call(
+                    lambda: self._converter.value.convert(
+                        source, raises_on_error=False, page_range=page_range
+                    )
                 )
+        finally:
+            _ocr_pages.reset(token)
+        self._record_ocr(source.name, ocr)
+        for stage, item in conv_res.timings.items():
+            for seconds in item.times:
+                metrics.observe_stage(stage, seconds, provider=self.provider)
+        if conv_res.status == ConversionStatus.FAILURE:
+            raise RuntimeError(f"failed to parse {source}: {conv_res.errors}")
+        if conv_res.status != ConversionStatus.SUCCESS:
+            logger.warning(f"partially parsed {source}: {conv_res.errors}")
+        return (conv_res, ocr)
 
-        return (texts, pages, figures)
+    @staticmethod
+    def _complete(conv_res: ConversionResult) -> bool:
+        from docling.datamodel.base_models import ConversionStatus
 
-    def _extract_table_md(self, conv_res: ConversionResult) -> list[TableElement]:
-        tables: list[TableElement] = list()
-        for tb in conv_res.document.tables:
-            table = tb.export_to_markdown(conv_res.document)
-            tables.append(TableElement(metadata=self._to_metadata(tb), markdown=table))
-        return tables
+        return conv_res.status == ConversionStatus.SUCCESS
 
-    def _extract_table_html(self, conv_res: ConversionResult) -> list[TableElement]:
-        tables: list[TableElement] = list()
-        for tb in conv_res.document.tables:
-            table = tb.export_to_html(conv_res.document)
-            page_no, bbox = (tb.prov[0].page_no, tb.prov[0].bbox)
-            bbox = (bbox.l, bbox.t, bbox.r, bbox.b)
-            tables.append(
-                TableElement(metadata=Metadata(page_no=page_no, bbox=bbox), html=table)
+    @override
+    def _produce_sp(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        conv_res, ocr = self._convert_one(src.path)
+        return (self._transform(conv_res, ocr), self._complete(conv_res))
+
+    @override
+    def _produce_common(self, src: PdfInput) -> tuple[CommonParseOutput, bool]:
+        conv_res, _ = self._convert_one(src.path)
+        return (self._save(conv_res), self._complete(conv_res))
+
+    @override
+    def parse_pages(self, src: PdfInput, page_range: tuple[int, int]) -> ParseOutput:
+        output = self._transform(*self._convert_one(src.path, page_range=page_range))
+        output.page_range = page_range
+        return output
+
+    @override
+    def split_pages(
+        self, src: PdfInput, page_range: tuple[int, int]
+    ) -> list[ParseOutput]:
+        if "json" in self.opt.output_formats:
+            # export_to_dict has no per-page filter, convert page by page
+            return super().split_pages(src, page_range)
+        conv_res, ocr = self._convert_one(src.path, page_range=page_range)
+        doc = conv_res.document
+        pages = range(page_range[0], page_range[1] + 1)
+        # one serializer per format re-parameterized per page, export_to_*(
+        # page_no=) would build a new one and rescan the document for captions
+        # every time
+        sers = {fmt: _serializer(doc, fmt) for fmt in self.opt.output_formats}
+
+        def render(fmt: OutputFormat) -> dict[int, str]:
+            ser, params = sers[fmt], sers[fmt].params
+            with metrics.span("export", provider=self.provider, format=fmt):
+                texts: dict[int, str] = dict()
+                for pno in pages:
+                    ser.params = params.model_copy(update={"pages": {pno}})
+                    texts[pno] = ser.serialize().text
+            ser.params = params
+            return texts
+
+        rendered = run_concurrently({fmt: partial(render, fmt) for fmt in sers})
+        texts, tables, figures = self._elements(
+            doc, (item for item, _ in doc.iterate_items()), sers
+        )
+        images = self._page_images(doc)
+        parts: list[ParseOutput] = list()
+        for pno in pages:
+            part = ParseOutput(
+                name=src.stem,
+                text=[el for el in texts if el.page_no == pno],
+                table=[el for el in tables if el.metadata.page_no == pno],
+                figure=[el for el in figures if el.metadata.page_no == pno],
+                page=[images[pno]] if pno in images else [],
+                page_range=(pno, pno),
+                ocr={pno: ocr[pno]} if pno in ocr else {},
             )
-        return tables
-
-    def _transform(self, conv_res: ConversionResult) -> ParseOutput:
-        (text, page, figure) = self._extract_body(conv_res)
-        name = conv_res.input.file.stem
-        match self.opt.output_format:
-            case "html":
-                tables = self._extract_table_html(conv_res)
-                html = conv_res.document.export_to_html(
-                    image_mode=ImageRefMode.REFERENCED
-                )
-                return ParseOutput(
-                    name=name,
-                    text=text,
-                    table=tables,
-                    figure=figure,
-                    page=page,
-                    html=html,
-                    save_path=SavePath.default(root=self.opt.save_dir)
-                    if self.opt.save_dir
-                    else None,
-                )
-            case "json":
-                tables = self._extract_table_md(conv_res)
-                json = conv_res.document.export_to_dict()
-                return ParseOutput(
-                    name=name,
-                    text=text,
-                    table=tables,
-                    figure=figure,
-                    page=page,
-                    json=json,
-                    save_path=SavePath.default(root=self.opt.save_dir)
-                    if self.opt.save_dir
-                    else None,
-                )
+            for fmt, by_page in rendered.items():
+                part.set_rendered(fmt, by_page[pno])
+            parts.append(part)
+        return parts
+
+    def stream_one(self, addr: str) -> Generator[ParseOutput, None, None]:
+        # converts `page_window` pages at a time; every chunk's rasters are
+        # released once the consumer asks for the next one, so memory stays
+        # bounded by the window and not by the document length
+        assert self.opt.page_window
+        try:
+            # remote documents are fetched once and re-read for every window
+            with self._fetch(addr) as src:
+                # the page count comes from the mapping, no conversion needed
+                start, last = self.opt.page_range or (1, src.page_count)
+                total = min(last, src.page_count)
+                if start > total:
+                    raise ValueError(f"{src.stem} has only {src.page_count} pages")
+                while start <= total:
+                    end = min(start + self.opt.page_window - 1, total)
+                    conv_res, ocr = self._convert_one(src.path, page_range=(start, end))
+                    chunk = self._transform(conv_res, ocr)
+                    chunk.page_range = (start, end)
+                    del conv_res
+                    yield chunk
+                    chunk.release()
+                    start = end + 1
+        except Exception as e:
+            logger.error(e)
+            yield self._failed_parse(addr, str(e))
+
+    def _elements(
+        self,
+        doc: DoclingDocument,
+        items: Iterable[NodeItem],
+        sers: Mapping[OutputFormat, _Recorder],
+    ) -> tuple[list[TextElement], list[TableElement], list[ImageElement]]:
+        from docling_core.types.doc.document import PictureItem, TableItem, TextItem
 
-            case _:
-                tables = self._extract_table_md(conv_res)
-                markdown = conv_res.document.export_to_markdown(
-                    image_mode=ImageRefMode.REFERENCED
+        caps = self.opt.capbility
+        # markdown serves markdown and json output, html only html output
+        formats = self.opt.output_formats
+        markdown = sers["markdown"] if formats != ("html",) else None
+        html = sers["html"] if "html" in formats else None
+        texts: list[TextElement] = list()
+        tables: list[TableElement] = list()
+        figures: list[ImageElement] = list()
+        # figures repeated across pages share one image once cropped
+        interner = Interner()
+        for item in items:
+            if isinstance(item, TextItem) and "text" in caps:
+                texts.append(
+                    TextElement(page_no=item.prov[0].page_no, content=item.text)
                 )
-                return ParseOutput(
-                    name=name,
-                    text=text,
-                    table=tables,
-                    figure=figure,
-                    page=page,
-                    markdown=markdown,
-                    save_path=SavePath.default(root=self.opt.save_dir)
-                    if self.opt.save_dir
-                    else None,
+            elif isinstance(item, TableItem) and "table" in caps:
+                tables.append(
+                    TableElement(
+                        metadata=self._to_metadata(item),
+                        markdown=markdown.rendered(item) if markdown else None,
+                        html=html.rendered(item) if html else None,
+                    )
                 )
+            elif isinstance(item, PictureItem) and "image" in caps:
+                if _has_image(item, doc):
+                    # cropped when (if ever) someone reads the image
+                    figures.append(
+                        ImageElement(
+                            self._to_metadata(item),
+                            load=partial(_crop, item, doc, interner),
+                        )
+                    )
+        return (texts, tables, figures)
+
+    def _page_images(self, doc: DoclingDocument) -> dict[int, Image]:
+        if "page" not in self.opt.capbility:
+            return {}
+        return {
+            pno: img
+            for pno, page in sorted(doc.pages.items())
+            if page.image and (img := page.image.pil_image)
+        }
+
+    def _transform(
+        self, conv_res: ConversionResult, ocr: dict[int, bool]
+    ) -> ParseOutput:
+        doc = conv_res.document
+        out = ParseOutput(
+            name=conv_res.input.file.stem,
+            text=[],
+            table=[],
+            figure=[],
+            page=list(self._page_images(doc).values()),
+            save_path=SavePath.default(root=self.opt.save_dir)
+            if self.opt.save_dir
+            else None,
+            ocr=ocr,
+        )
+        # the serializers producing the output visit every item once in
+        # reading order; they hand back those items and the table renderings
+        # instead of a second walk plus a full serializer per table
+        sers = _serializers(doc)
+
+        def render(fmt: OutputFormat) -> str | dict[str, object]:
+            with metrics.span("export", provider=self.provider, format=fmt):
+                if fmt == "json":
+                    return doc.export_to_dict()
+                return sers[fmt].serialize().text
+
+        formats = self.opt.output_formats
+        for fmt, value in run_concurrently(
+            {fmt: partial(render, fmt) for fmt in formats}
+        ).items():
+            out.set_rendered(fmt, value)
+        traversed = [sers[fmt] for fmt in formats if fmt != "json"]
+        items: Iterable[NodeItem] = (
+            traversed[0].visited
+            if traversed
+            else (item for item, _ in doc.iterate_items())
+        )
+        out.text, out.table, out.figure = self._elements(doc, items, sers)
+        return out
+
+    def _save(self, conv_res: ConversionResult) -> CommonParseOutput:
+        from docling_core.types.doc.base import ImageRefMode
+
+        doc = conv_res.document
+        save_dir = self.opt.save_dir / conv_res.input.file.stem
+        save_dir.mkdir(parents=True, exist_ok=True)
+        paths: dict[OutputFormat, Path] = {
+            fmt: save_dir / f"output-with-image-ref{_SUFFIX[fmt]}"
+            for fmt in self.opt.output_formats
+        }
+        # what save_as_* does for each call: copy the document with its
+        # pictures written out and referenced. Done once here, every format
+        # then renders from the same copy
+        artifacts, reference = doc._get_output_paths(next(iter(paths.values())))
+        refs = doc._make_copy_with_refmode(
+            artifacts, ImageRefMode.REFERENCED, reference_path=reference
+        )
+
+        def write(fmt: OutputFormat) -> None:
+            with metrics.span("export", provider=self.provider, format=fmt):
+                match fmt:
+                    case "html":
+                        text = refs.export_to_html(image_mode=ImageRefMode.REFERENCED)
+                    case "json":
+                        text = json.dumps(refs.export_to_dict(), indent=2)
+                    case _:
+                        text = refs.export_to_markdown(
+                            image_mode=ImageRefMode.REFERENCED
+                        )
+                _ = paths[fmt].write_text(text, encoding="utf-8")
+
+        _ = run_concurrently({fmt: partial(write, fmt) for fmt in paths})
+        return CommonParseOutput.written(paths)
+
+    def _run_pool(
+        self, func: Callable[[str], R], failed: Callable[[str, str], R]
+    ) -> Generator[R, None, None]:
+        for addr, res in run_pool(
+            func,
+            self.opt.address,
+            workers=self.opt.workers,
+            ordered=self.opt.ordered,
+            initializer=_init_worker,
+            initargs=(self.opt,),
+        ):
+            # worker-side failures are already folded into the output,
+            # an Err here means the worker process itself went away
+            yield failed(addr, res.unwrap_err()) if res.is_err() else res.unwrap()
 
     @get_time_sync
     @override
     def run_sp(self) -> Generator[ParseOutput, None, None]:
-        for conv_res in self._run():
-            if conv_res.status != ConversionStatus.SUCCESS:
-                logger.error(f"failed to parse this file: {conv_res.errors}")
-            yield self._transform(conv_res)
+        if self.opt.page_window:
+            if self.opt.workers > 1 or self.cache is not None:
+                logger.warning("page_window streams serially without cache")
+            return (
+                chunk for addr in self.opt.address for chunk in self.stream_one(addr)
+            )
+        # with shard_pages the workers split one document at a time instead
+        if self.opt.workers > 1 and not self.opt.shard_pages:
+            return self._run_pool(_worker_parse, self._failed_parse)
+        return (self.parse_one(addr) for addr in self.opt.address)
 
     @get_time_sync
     @override
     def run(self) -> Generator[CommonParseOutput, None, None]:
-        for conv_res in self._run():
-            if conv_res.status != ConversionStatus.SUCCESS:
-                logger.error(f"failed to parse this file: {conv_res.errors}")
-            save_dir = self.opt.save_dir / conv_res.input.file.stem
-            save_dir.mkdir(parents=True, exist_ok=True)
-            # figure_count = 0
-            # for element, _ in conv_res.document.iterate_items():
-            #     if isinstance(element, PictureItem):
-            #         figure_count += 1
-            #         with (save_dir / f"figure-{figure_count}.png").open("wb") as f:
-            #             image = element.get_image(conv_res.document)
-            #             if image is None:
-            #                 continue
-            #             image.save(f, "PNG")
-            match self.opt.output_format:
-                case "html":
-                    save_path = save_dir / "output-with-image-ref.html"
-                    conv_res.document.save_as_html(
-                        save_path,
-                        image_mode=ImageRefMode.REFERENCED,
-                    )
-                case "json":
-                    save_path = save_dir / "output-with-image-ref.json"
-                    conv_res.document.save_as_json(
-                        save_path,
-                        image_mode=ImageRefMode.REFERENCED,
-                    )
-                case _:
-                    save_path = save_dir / "output-with-image-ref.md"
-                    conv_res.document.save_as_markdown(
-                        save_path,
-                        image_mode=ImageRefMode.REFERENCED,
-                    )
-            yield CommonParseOutput(
-                output_format=self.opt.output_format, output_path=save_path
-            )
+        if self.opt.workers > 1 and not self.opt.shard_pages:
+            return self._run_pool(_worker_save, self._failed_save)
+        return (self.save_one(addr) for addr in self.opt.address)
+
+
+_worker: Parser | None = None
+
+
+def _init_worker(opt: ParseOpt) -> None:
+    # runs once per worker process: load the models up front so they stay warm
+    # for every document this worker picks up. The parent already validated
+    # the addresses, don't probe them again here.
+    global _worker
+    _worker = Parser(opt, validate=False)
+    _worker.warm()
+
+
+def _worker_parse(addr: str) -> ParseOutput:
+    assert _worker is not None
+    return _worker.parse_one(addr)
+
+
+def _worker_save(addr: str) -> CommonParseOutput:
+    assert _worker is not None
+    return _worker.save_one(addr)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import re
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from time import monotonic, sleep
+from typing import Self, final
+from urllib.parse import quote, unquote, urlparse
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+_RETRY_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _Retryable(Exception):
+    pass
+
+
+def url_file_name(addr: str, content_disposition: str | None = None) -> str:
+    name = ""
+    if content_disposition:
+        found = re.findall('filename="?([^"]+)"?', content_disposition)
+        if found:
+            name = found[0]
+    if not name:
+        name = quote(unquote(urlparse(addr).path.split("/")[-1]))
+    # never let a header or url escape the download directory
+    name = Path(name).name or "download"
+    return name if name.lower().endswith(".pdf") else f"{name}.pdf"
+
+
+@final
+class Reachability:
+    # remembers which urls answered and which hosts could not be reached, so
+    # a batch never probes the same dead host twice within `ttl` seconds
+    def __init__(self, ttl: float = 300.0) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._urls: dict[str, tuple[bool, float]] = dict()
+        self._down_hosts: dict[str, float] = dict()
+
+    def get(self, addr: str) -> bool | None:
+        now = monotonic()
+        with self._lock:
+            since = self._down_hosts.get(urlparse(addr).netloc)
+            if since is not None and now - since < self.ttl:
+                return False
+            ok, at = self._urls.get(addr, (None, 0.0))
+            return ok if ok is not None and now - at < self.ttl else None
+
+    def mark(self, addr: str, ok: bool, host_down: bool = False) -> None:
+        now = monotonic()
+        with self._lock:
+            self._urls[addr] = (ok, now)
+            host = urlparse(addr).netloc
+            if host_down:
+                self._down_hosts[host] = now
+            elif ok:
+                _ = self._down_hosts.pop(host, None)
+
+
+reachability = Reachability()
+
+
+@dataclass
+class Download:
+    name: str
+    path: Path
+    size: int
+
+    def close(self) -> None:
+        shutil.rmtree(self.path.parent, ignore_errors=True)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+@final
+class Downloader:
+    def __init__(
+        self,
+        pool_size: int = 16,
+        timeout: float | tuple[float, float] = (10.0, 60.0),
+        max_bytes: int = 512 << 20,
+        retries: int = 3,
+        backoff: float = 0.5,
+        chunk_size: int = 1 << 16,
+        tmp_dir: str | Path | None = None,
+    ) -> None:
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.tmp_dir = tmp_dir
+        # one keep-alive pool shared by every fetch, no handshake per file
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def fetch(self, addr: str) -> Download:
+        # streams the body straight into a temp file; an interrupted transfer
+        # resumes with an http Range request where the server allows it
+        if reachability.get(addr) is False:
+            raise DownloadError(f"{addr} was unreachable moments ago")
+        tmp = Path(tempfile.mkdtemp(prefix="docparser-", dir=self.tmp_dir))
+        part = tmp / ".part"
+        attempt = 0
+        try:
+            while True:
+                try:
+                    # whatever earlier attempts wrote is kept and resumed from
+                    written = part.stat().st_size if part.exists() else 0
+                    name, written = self._get(addr, part, written)
+                    break
+                except (
+                    _Retryable,
+                    requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                ) as e:
+                    attempt += 1
+                    if attempt > self.retries:
+                        host_down = isinstance(e, requests.ConnectionError)
+                        reachability.mark(addr, False, host_down=host_down)
+                        raise DownloadError(f"giving up on {addr}: {e}") from e
+                    delay = self.backoff * 2 ** (attempt - 1)
+                    logger.warning(f"retry {attempt} for {addr} in {delay:.1f}s: {e}")
+                    sleep(delay)
+            path = part.rename(tmp / name)
+            reachability.mark(addr, True)
+            return Download(name=name, path=path, size=written)
+        except requests.HTTPError:
+            reachability.mark(addr, False)
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def _get(self, addr: str, part: Path, written: int) -> tuple[str, int]:
+        headers = {"Range": f"bytes={written}-"} if written else {}
+        with self.session.get(
+            addr, stream=True, timeout=self.timeout, headers=headers
+        ) as resp:
+            if resp.status_code in _RETRY_STATUS:
+                raise _Retryable(f"http {resp.status_code}")
+            resp.raise_for_status()
+            if written and resp.status_code != 206:
+                logger.info(f"{addr} does not support range requests, restarting")
+                written = 0
+            total = self._expected_size(resp)
+            if total is not None and total > self.max_bytes:
+                raise DownloadError(f"{addr} is {total} bytes, over {self.max_bytes}")
+            with open(part, "r+b" if written else "wb") as f:
+                _ = f.seek(written)
+                _ = f.truncate()
+                for chunk in resp.iter_content(self.chunk_size):
+                    _ = f.write(chunk)
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise DownloadError(f"{addr} exceeds {self.max_bytes} bytes")
+            if total is not None and written < total:
+                # keep what we have, the next attempt asks for the rest
+                raise _Retryable(f"short read {written}/{total}")
+            name = url_file_name(addr, resp.headers.get("Content-Disposition"))
+            return (name, written)
+
+    @staticmethod
+    def _expected_size(resp: requests.Response) -> int | None:
+        if resp.headers.get("Content-Encoding"):
+            # iter_content decodes, the header length is not the file length
+            return None
+        if resp.status_code == 206:
+            total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+            return int(total) if total.isdigit() else None
+        length = resp.headers.get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+
+
+_default: Downloader | None = None
+_default_lock = threading.Lock()
+
+
+def default_downloader() -> Downloader:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Downloader()
+        return _default
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, final
+
+from docparser import metrics
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+    from docparser.types import ParseOpt
+
+ImageFormat = Literal["png", "jpeg", "webp"]
+# "exact" matches identical pixels, "perceptual" also images that only differ
+# by re-encoding or rescaling (same difference hash)
+ImageHash = Literal["exact", "perceptual"]
+
+_SUFFIX: dict[ImageFormat, str] = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    # pillow releases the GIL while compressing, so threads scale here; one
+    # pool serves every sink in the process
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=min(8, os.cpu_count() or 1),
+                thread_name_prefix="docparser-image",
+            )
+        return _pool
+
+
+def _digest(image: Image) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}{image.size}".encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def _dhash(image: Image) -> str:
+    # 64 bit difference hash: is each pixel of a 9x8 grayscale thumbnail
+    # brighter than its right neighbour
+    from PIL import Image as PILImage
+
+    small = image.convert("L").resize((9, 8), PILImage.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = bits << 1 | (left > right)
+    return f"{bits:016x}"
+
+
+@final
+class Interner:
+    # one Image per distinct content within a document, a duplicate crop is
+    # dropped and the first one shared in its place. Never share a table
+    # between documents, releasing one closes the images it handed out
+    def __init__(self) -> None:
+        self._seen: dict[str, Image] = dict()
+
+    def intern(self, image: Image) -> Image:
+        return self._seen.setdefault(_digest(image), image)
+
+
+@dataclass(frozen=True)
+class ImageSink:
+    format: ImageFormat = "png"
+    # jpeg/webp quality, png is always lossless
+    quality: int = 85
+    compress_level: int = 6
+    # downscale to this resolution, images are assumed to be `source_dpi`
+    # unless pillow knows better
+    dpi: int | None = None
+    source_dpi: int = 72
+    # write identical images once, later ones point at the first file
+    dedup: bool = True
+    # content-addressed directory shared by every document and process: each
+    # distinct image is encoded and written there once and every save returns
+    # the path of that blob
+    store: Path | None = None
+    hashing: ImageHash = "exact"
+
+    @staticmethod
+    def from_opt(opt: ParseOpt) -> ImageSink:
+        return ImageSink(
+            format=opt.image_format,
+            quality=opt.image_quality,
+            dpi=opt.image_dpi,
+            store=opt.image_store,
+            hashing=opt.image_hash,
+        )
+
+    @property
+    def suffix(self) -> str:
+        return _SUFFIX[self.format]
+
+    def _prepare(self, image: Image) -> Image:
+        from PIL import Image as PILImage
+
+        if self.dpi is not None:
+            source = image.info.get("dpi", (self.source_dpi,))[0] or self.source_dpi
+            if self.dpi < source:
+                scale = self.dpi / source
+                size = (
+                    max(1, round(image.width * scale)),
+                    max(1, round(image.height * scale)),
+                )
+                image = image.resize(
+                    size, PILImage.Resampling.BILINEAR, reducing_gap=2.0
+                )
+        match self.format:
+            case "jpeg" if image.mode not in ("RGB", "L"):
+                return image.convert("RGB")
+            case "webp" | "png" if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                return image.convert("RGBA")
+            case _:
+                return image
+
+    def _write(self, image: Image, path: Path) -> Path:
+        image = self._prepare(image)
+        match self.format:
+            case "png":
+                image.save(path, "PNG", compress_level=self.compress_level)
+            case "jpeg":
+                image.save(path, "JPEG", quality=self.quality, optimize=True)
+            case "webp":
+                image.save(path, "WEBP", quality=self.quality, method=4)
+        return path
+
+    def _key(self, image: Image) -> str:
+        # the encoding settings are part of the address, a blob is only
+        # shared by sinks that would have written the same bytes
+        content = _dhash(image) if self.hashing == "perceptual" else _digest(image)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.format}{self.quality}{self.compress_level}".encode())
+        h.update(f"{self.dpi}{self.source_dpi}{content}".encode())
+        return h.hexdigest()
+
+    def _put(self, image: Image, path: Path) -> Path:
+        # another document or process may be writing the same blob, the
+        # first complete file wins and nobody sees a partial one
+        if path.exists():
+            metrics.inc("docparser_image_store_hits_total")
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{os.getpid()}-{threading.get_ident()}-{path.name}")
+        os.replace(self._write(image, tmp), path)
+        return path
+
+    def save_all(self, images: Iterable[tuple[Image, Path]]) -> list[Path]:
+        # `images` pairs each image with its destination minus the suffix;
+        # returns where each one ended up, in the same order
+        with metrics.span("image_save", format=self.format):
+            return self._save_all(images)
+
+    def _save_all(self, images: Iterable[tuple[Image, Path]]) -> list[Path]:
+        if self.store is not None:
+            return self._save_stored([image for image, _ in images])
+        pool = _executor()
+        items = [
+            (image, stem.with_name(stem.name + self.suffix)) for image, stem in images
+        ]
+        if self.dedup:
+            digests = list(pool.map(lambda item: _digest(item[0]), items))
+        else:
+            digests = [str(i) for i in range(len(items))]
+        first: dict[str, Path] = dict()
+        futures = [
+            pool.submit(self._write, image, path)
+            for (image, path), digest in zip(items, digests)
+            if first.setdefault(digest, path) == path
+        ]
+        for fut in futures:
+            _ = fut.result()
+        return [first[digest] for digest in digests]
+
+    def _save_stored(self, images: list[Image]) -> list[Path]:
+        assert self.store is not None
+        pool = _executor()
+        paths = [
+            self.store / key[:2] / f"{key}{self.suffix}"
+            for key in pool.map(self._key, images)
+        ]
+        first: dict[Path, Image] = dict()
+        for image, path in zip(images, paths):
+            _ = first.setdefault(path, image)
+        _ = list(pool.map(lambda item: self._put(item[1], item[0]), first.items()))
+        return paths
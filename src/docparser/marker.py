@@ -1,68 +1,317 @@
+from __future__ import annotations
+
 import json
+import os
 from collections.abc import Generator
+from functools import cached_property, partial
 from pathlib import Path
-from typing import cast, final, override
-
-from loguru import logger
-from marker.config.parser import ConfigParser
-from marker.converters.pdf import PdfConverter
-from marker.models import create_model_dict
-from marker.output import convert_if_not_rgb, text_from_rendered
-from pydantic import BaseModel
+from time import perf_counter
+from typing import TYPE_CHECKING, final, override
 
+from docparser import metrics
 from docparser.base_parser import BaseParser
-from docparser.types import CommonParseOutput, ParseOpt, ParseOutput
-from docparser.utils import download_pdf, get_time_sync
+from docparser.images import ImageSink, Interner
+from docparser.registry import Lease, converters
+from docparser.source import PdfInput
+from docparser.types import (
+    CommonParseOutput,
+    ImageElement,
+    Metadata,
+    OutputFormat,
+    ParseOpt,
+    ParseOutput,
+    TextElement,
+)
+from docparser.utils import get_time_sync, run_concurrently
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from marker.config.parser import ConfigParser
+    from marker.converters.pdf import PdfConverter
+    from pydantic import BaseModel
 
 
 @final
 class Parser(BaseParser):
-    def __init__(self, opt: ParseOpt) -> None:
-        super().__init__(opt)
-        config = self._generate_config(opt)
-        self._converter = PdfConverter(
-            config=config.generate_config_dict(),
-            artifact_dict=create_model_dict(),
-            processor_list=config.get_processors(),
-            renderer=config.get_renderer(),
-            llm_service=config.get_llm_service(),
+    provider = "marker"
+
+    @cached_property
+    def _shared_converter(self) -> Lease[PdfConverter]:
+        # marker, torch and create_model_dict() are only loaded on the first
+        # real conversion (or warm()), cache hits never pay for them. Parsers
+        # with the same config share one converter, and every converter with
+        # the same model set shares the models
+        start = perf_counter()
+        from marker.converters.pdf import PdfConverter
+
+        self._record("import", perf_counter() - start)
+        config = self._generate_config(self.opt)
+        table = "table" in self.opt.capbility
+        key = json.dumps(
+            [config.generate_config_dict(), table, metrics.enabled()],
+            sort_keys=True,
+            default=str,
         )
+        models: list[Lease[dict[str, object]]] = list()
+
+        def build() -> PdfConverter:
+            # held for as long as the converter stays in the registry
+            models.append(
+                converters.acquire(
+                    f"marker:models:table={table}", lambda: self._artifacts(self.opt)
+                )
+            )
+            converter = PdfConverter(
+                config=config.generate_config_dict(),
+                artifact_dict=models[0].value,
+                processor_list=self._processors(self.opt),
+                renderer=config.get_renderer(),
+                llm_service=config.get_llm_service(),
+            )
+            if metrics.enabled():
+                _instrument(converter)
+            return converter
+
+        return self._shared(key, build, close=lambda _: models[0].release())
+
+    @property
+    def _converter(self) -> PdfConverter:
+        return self._shared_converter.value
+
+    @override
+    def _warm(self) -> None:
+        _ = self._shared_converter
 
     @staticmethod
     def _generate_config(opt: ParseOpt) -> ConfigParser:
-        config = {"output_format": opt.output_format, "use_llm": opt.use_llm}
+        from marker.config.parser import ConfigParser
+
+        config = {
+            "output_format": opt.output_format,
+            "use_llm": opt.use_llm,
+            "disable_image_extraction": "image" not in opt.capbility,
+            # marker reads each page's text layer and only OCRs the pages
+            # where it is missing or garbled, "full" forces it on every page
+            "disable_ocr": not opt.do_ocr,
+            "force_ocr": opt.do_ocr and opt.ocr_mode == "full",
+        }
         if opt.save_dir:
             config["output_dir"] = str(opt.save_dir)
         return ConfigParser(config)
 
+    @staticmethod
+    def _artifacts(opt: ParseOpt) -> dict[str, object]:
+        from marker.models import create_model_dict
+
+        if "table" in opt.capbility:
+            return create_model_dict()
+        # same models as create_model_dict() minus the table recognizer, which
+        # only the table processors use
+        from surya.detection import DetectionPredictor
+        from surya.layout import LayoutPredictor
+        from surya.ocr_error import OCRErrorPredictor
+        from surya.recognition import RecognitionPredictor
+
+        return {
+            "layout_model": LayoutPredictor(),
+            "recognition_model": RecognitionPredictor(),
+            "detection_model": DetectionPredictor(),
+            "ocr_error_model": OCRErrorPredictor(),
+        }
+
+    @staticmethod
+    def _processors(opt: ParseOpt) -> list[str] | None:
+        from marker.converters.pdf import PdfConverter
+        from marker.processors.llm.llm_table import LLMTableProcessor
+        from marker.processors.llm.llm_table_merge import LLMTableMergeProcessor
+        from marker.processors.table import TableProcessor
+        from marker.util import classes_to_strings
+
+        if "table" in opt.capbility:
+            return None
+        skip = (TableProcessor, LLMTableProcessor, LLMTableMergeProcessor)
+        return classes_to_strings(
+            [p for p in PdfConverter.default_processors if p not in skip]
+        )
+
+    def _page_range(self, src: PdfInput) -> list[int] | None:
+        # marker counts pages from 0 and rejects pages past the end, clamp the
+        # 1-based inclusive range to this document
+        if self.opt.page_range is None:
+            return None
+        first, last = self.opt.page_range
+        if first > src.page_count:
+            raise ValueError(f"{src.stem} has only {src.page_count} pages")
+        return list(range(first - 1, min(last, src.page_count)))
+
+    def _render(
+        self, path: str
+    ) -> tuple[dict[OutputFormat, BaseModel], dict[int, bool]]:
+        # what PdfConverter.__call__ does, with every requested renderer
+        # applied to the one built document, plus which pages were OCRed
+        from marker.renderers.html import HTMLRenderer
+        from marker.renderers.json import JSONRenderer
+        from marker.renderers.markdown import MarkdownRenderer
+
+        renderers: dict[OutputFormat, type] = {
+            "markdown": MarkdownRenderer,
+            "json": JSONRenderer,
+            "html": HTMLRenderer,
+        }
+        converter = self._converter
+        document = converter.build_document(path)
+        ocr = (
+            {
+                page.page_id + 1: page.text_extraction_method == "surya"
+                for page in document.pages
+            }
+            if self.opt.do_ocr
+            else {}
+        )
+        rendered = run_concurrently(
+            {
+                fmt: partial(converter.resolve_dependencies(renderers[fmt]), document)
+                for fmt in self.opt.output_formats
+            }
+        )
+        return (rendered, ocr)
+
+    def _save(
+        self, stem: str, rendered: dict[OutputFormat, BaseModel]
+    ) -> CommonParseOutput:
+        from marker.output import text_from_rendered
+
+        output_dir = self.opt.save_dir / stem
+        output_dir.mkdir(parents=True, exist_ok=True)
+        outputs = {fmt: text_from_rendered(r) for fmt, r in rendered.items()}
+        # markdown and html reference the same images (json none), they are
+        # written once
+        images = {
+            name: img for _, _, found in outputs.values() for name, img in found.items()
+        }
+        saved = ImageSink.from_opt(self.opt).save_all(
+            (img, output_dir / Path(img_name).stem) for img_name, img in images.items()
+        )
+        paths: dict[OutputFormat, Path] = dict()
+        for fmt, (text, ext, _) in outputs.items():
+            # the sink picks the suffix and folds duplicates (or writes to the
+            # shared store), point the references at the files actually written
+            for img_name, path in zip(images, saved):
+                text = text.replace(img_name, os.path.relpath(path, output_dir))
+            paths[fmt] = output_dir / f"output.{ext}"
+            _ = paths[fmt].write_text(text)
+        with open(output_dir / "metadata.json", "w") as f:
+            json.dump(next(iter(rendered.values())).metadata, f)
+        return CommonParseOutput.written(paths)
+
+    @override
+    def _produce_common(self, src: PdfInput) -> tuple[CommonParseOutput, bool]:
+        # the page range lives in the shared converter's config
+        with self._shared_converter.lock:
+            self._converter.config["page_range"] = self._page_range(src)
+            rendered, ocr = self._timed_call(lambda: self._render(str(src.path)))
+        self._record_ocr(src.stem, ocr)
+        return (self._save(src.stem, rendered), True)
+
+    @override
+    def parse_pages(self, src: PdfInput, page_range: tuple[int, int]) -> ParseOutput:
+        # one page per call so every element gets its own page number
+        from marker.output import convert_if_not_rgb, text_from_rendered
+
+        out = ParseOutput(
+            name=src.stem, text=[], table=[], figure=[], page=[], page_range=page_range
+        )
+        rendered: dict[OutputFormat, list[str]] = {
+            fmt: [] for fmt in self.opt.output_formats
+        }
+        interner = Interner()
+        for pno in range(page_range[0], page_range[1] + 1):
+            with self._shared_converter.lock:
+                self._converter.config["page_range"] = [pno - 1]
+                pages, ocr = self._timed_call(lambda: self._render(str(src.path)))
+            outputs = {fmt: text_from_rendered(r) for fmt, r in pages.items()}
+            out.ocr.update(ocr)
+            for fmt, (text, _, _) in outputs.items():
+                rendered[fmt].append(text)
+            text = outputs[self.opt.output_format][0]
+            images = {
+                name: img
+                for _, _, found in outputs.values()
+                for name, img in found.items()
+            }
+            out.text.append(TextElement(page_no=pno, content=text))
+            out.figure.extend(
+                ImageElement(
+                    metadata=Metadata(page_no=pno, bbox=(0.0, 0.0, 0.0, 0.0)),
+                    image=interner.intern(convert_if_not_rgb(img)),
+                )
+                for img in images.values()
+            )
+        for fmt, texts in rendered.items():
+            match fmt:
+                case "html":
+                    out.html = "".join(texts)
+                case "json":
+                    out.json = {"pages": [json.loads(text) for text in texts]}
+                case _:
+                    out.markdown = "\n\n".join(texts)
+        self._record_ocr(src.stem, out.ocr)
+        return out
+
     def _run(self) -> Generator[CommonParseOutput, None, None]:
         for addr in self.opt.address:
-            match self.opt.source:
-                case "local":
-                    file_name = Path(addr).stem
-                    rendered = self._converter(addr)
-                case _:
-                    fetch_result = download_pdf(addr)
-                    if fetch_result.is_err():
-                        logger.error(f"failed to fetch pdf from url: {fetch_result}")
-                    file_name, content = fetch_result.unwrap()
-                    rendered = self._converter(content)
-            text, ext, images = text_from_rendered(rendered)
-            output_dir = Path(self.opt.save_dir / file_name.removesuffix(".pdf"))
-            output_dir.mkdir(parents=True, exist_ok=True)
-            with open(output_dir / "metadata.json", "w") as f:
-                json.dump(rendered.metadata, f)
-            with open(output_dir / f"output.{ext}", "w") as f:
-                f.write(text)
-            for img_name, img in images.items():
-                img = convert_if_not_rgb(img)  # RGBA images can't save as JPG
-                img.save(output_dir / img_name, "PNG")
-            yield CommonParseOutput(
-                output_format=self.opt.output_format,
-                output_path=output_dir / f"output.{ext}",
-            )
+            yield self.save_one(addr)
 
     @get_time_sync
     @override
     def run(self) -> Generator[CommonParseOutput, None, None]:
         return self._run()
+
+
+@final
+class _Traced:
+    # stands in for a marker builder, processor or renderer and times its calls
+    def __init__(self, target: Callable[..., object], stage: str) -> None:
+        self._target = target
+        self._stage = stage
+
+    def __call__(self, *args: object, **kwargs: object) -> object:
+        with metrics.span(self._stage, provider="marker"):
+            return self._target(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._target, name)
+
+
+def _instrument(converter: PdfConverter) -> None:
+    from marker.builders.layout import LayoutBuilder
+    from marker.builders.line import LineBuilder
+    from marker.builders.ocr import OcrBuilder
+    from marker.processors.table import TableProcessor
+    from marker.renderers import BaseRenderer
+
+    stages: list[tuple[type, str]] = [
+        (LayoutBuilder, "layout"),
+        (LineBuilder, "line_merge"),
+        (OcrBuilder, "ocr"),
+        (BaseRenderer, "export"),
+    ]
+    # builders and the renderer are resolved again for every document
+    resolve = converter.resolve_dependencies
+
+    def resolve_traced(cls: type) -> object:
+        instance = resolve(cls)
+        for base, stage in stages:
+            if issubclass(cls, base):
+                return _Traced(instance, stage)
+        return instance
+
+    converter.resolve_dependencies = resolve_traced
+    # processors were already built with the converter
+    converter.processor_list = [
+        _Traced(p, "table_structure")
+        if isinstance(p, TableProcessor)
+        else _Traced(p, f"process.{type(p).__name__}")
+        for p in converter.processor_list
+    ]
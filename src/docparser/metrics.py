@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Mapping
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field
+from typing import final
+
+# seconds, from a single page parse up to a slow model load
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+STAGE_SECONDS = "docparser_stage_seconds"
+
+Labels = tuple[tuple[str, str], ...]
+
+_enabled = os.environ.get("DOCPARSER_METRICS", "") not in ("", "0")
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    # turn on before the parsers are built, backends decide at construction
+    # whether to hook their pipelines
+    global _enabled
+    _enabled = on
+
+
+def _labels(labels: Mapping[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = [*labels, extra] if extra else list(labels)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+@dataclass
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    sum: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # linear interpolation inside the bucket, like prometheus'
+        # histogram_quantile(); the open last bucket reports its lower bound
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return 0.0
+
+
+@final
+class Registry:
+    def __init__(self, max_spans: int = 4096) -> None:
+        self._lock = threading.Lock()
+        self.counters: dict[tuple[str, Labels], float] = dict()
+        self.gauges: dict[tuple[str, Labels], float] = dict()
+        self.histograms: dict[tuple[str, Labels], Histogram] = dict()
+        # finished spans, oldest dropped first
+        self.spans: deque[dict[str, object]] = deque(maxlen=max_spans)
+
+    def inc(self, name: str, value: float = 1.0, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.histograms.setdefault(key, Histogram()).observe(value)
+
+    def record_span(
+        self, name: str, start_ns: int, end_ns: int, attributes: dict[str, object]
+    ) -> None:
+        # field names follow the OpenTelemetry span data model so the list can
+        # be handed to an exporter as is
+        with self._lock:
+            self.spans.append(
+                {
+                    "name": name,
+                    "start_time_unix_nano": start_ns,
+                    "end_time_unix_nano": end_ns,
+                    "attributes": attributes,
+                }
+            )
+
+    def export_spans(self) -> list[dict[str, object]]:
+        with self._lock:
+            spans = list(self.spans)
+            self.spans.clear()
+        return spans
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.spans.clear()
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(
+                (key, Histogram(list(h.counts), h.sum, h.count))
+                for key, h in self.histograms.items()
+            )
+        lines: list[str] = list()
+        typed: set[str] = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_fmt(labels)} {value:g}")
+        for (name, labels), value in gauges:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_fmt(labels)} {value:g}")
+        for (name, labels), hist in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for le, n in zip([*map(str, BUCKETS), "+Inf"], hist.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_fmt(labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_fmt(labels)} {hist.sum:.6f}")
+            lines.append(f"{name}_count{_fmt(labels)} {hist.count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+registry = Registry()
+
+
+@final
+class Span:
+    __slots__ = ("name", "attributes", "_start", "_start_ns")
+
+    def __init__(self, name: str, attributes: dict[str, object]) -> None:
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self._start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: object) -> None:
+        seconds = time.perf_counter() - self._start
+        registry.observe(STAGE_SECONDS, seconds, stage=self.name, **self.attributes)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+            registry.inc("docparser_stage_errors_total", stage=self.name)
+        registry.record_span(
+            self.name, self._start_ns, time.time_ns(), dict(self.attributes)
+        )
+
+
+_NOOP = nullcontext()
+
+
+def span(name: str, **attributes: object) -> AbstractContextManager[object]:
+    # a shared no-op context when metrics are off, nothing is timed or stored
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def inc(name: str, value: float = 1.0, **labels: object) -> None:
+    if _enabled:
+        registry.inc(name, value, **labels)
+
+
+def observe_stage(stage: str, seconds: float, **labels: object) -> None:
+    if _enabled:
+        registry.observe(STAGE_SECONDS, seconds, stage=stage, **labels)
@@ -0,0 +1,36 @@
+import importlib
+from time import perf_counter
+
+from loguru import logger
+
+from docparser.base_parser import BaseParser
+from docparser.types import ParseReq
+
+# provider modules are imported on first use, a request for one backend never
+# imports the others
+providers: dict[str, str] = {
+    "docling": "docparser.docling",
+    "marker": "docparser.marker",
+    "pymupdf": "docparser.pymupdf",
+    "auto": "docparser.router",
+}
+import_timings: dict[str, float] = dict()
+
+
+def load_parser(provider: str) -> type[BaseParser]:
+    if provider not in providers:
+        raise ValueError(f"unknown provider: {provider}")
+    start = perf_counter()
+    module = importlib.import_module(providers[provider])
+    parser = getattr(module, "Parser", None)
+    if parser is None:
+        raise NotImplementedError(f"provider {provider} is not available")
+    if provider not in import_timings:
+        import_timings[provider] = perf_counter() - start
+        logger.info(f"import {provider} took {import_timings[provider]:.3f}s")
+    return parser
+
+
+def build(req: ParseReq, warm: bool = False) -> BaseParser:
+    parser = load_parser(req.provider)(req.option)
+    return parser.warm() if warm else parser
@@ -0,0 +1,59 @@
+import multiprocessing as mp
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, TypeVar
+
+from loguru import logger
+from typeric.result import Err, Ok, Result
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def run_pool(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    workers: int,
+    ordered: bool = True,
+    initializer: Callable[..., None] | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_inflight: int | None = None,
+) -> Generator[tuple[T, Result[R, str]], None, None]:
+    # torch and the OCR backends are not fork-safe, always start fresh interpreters
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs,
+    )
+    # results carry full page rasters, so only keep a couple per worker in flight
+    limit = max(1, max_inflight or workers * 2)
+    pending = iter(items)
+    futures: dict[Future[R], T] = {}
+
+    def submit(n: int) -> None:
+        for item in islice(pending, n):
+            futures[pool.submit(func, item)] = item
+
+    def collect(fut: Future[R]) -> tuple[T, Result[R, str]]:
+        item = futures.pop(fut)
+        try:
+            return (item, Ok(fut.result()))
+        except Exception as e:
+            logger.error(f"worker failed on {item}: {e}")
+            return (item, Err(str(e)))
+
+    try:
+        submit(limit)
+        while futures:
+            if ordered:
+                done = [next(iter(futures))]
+            else:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in done:
+                result = collect(fut)
+                submit(1)
+                yield result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
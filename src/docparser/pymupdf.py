@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import html
+from collections.abc import Generator
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import groupby
+from time import perf_counter
+from typing import TYPE_CHECKING, final, override
+
+from loguru import logger
+
+from docparser import metrics
+from docparser.base_parser import BaseParser
+from docparser.images import Interner
+from docparser.source import PdfInput
+from docparser.types import (
+    CommonParseOutput,
+    ImageElement,
+    Metadata,
+    OutputFormat,
+    ParseOutput,
+    SavePath,
+    TableElement,
+    TextElement,
+)
+from docparser.utils import get_time_sync, html_body
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+    from pymupdf import Document, Page, Pixmap
+    from PIL.Image import Image
+
+# same scale docling renders page images at
+_DPI = 72
+
+
+@dataclass(frozen=True)
+class Escalation:
+    # a page with fewer characters than this whose images cover the page is
+    # treated as a scan and needs OCR
+    min_chars: int = 32
+    scan_coverage: float = 0.6
+    # tables covering this much of the page are better left to a table model
+    table_coverage: float = 0.3
+
+    def reason(self, page: Page, table_area: float, ocr: bool) -> str | None:
+        area = abs(page.rect) or 1.0
+        if ocr and len(page.get_text().strip()) < self.min_chars:
+            covered = sum(
+                abs(page.rect & info["bbox"]) for info in page.get_image_info()
+            )
+            if covered / area >= self.scan_coverage:
+                return "scanned"
+        if table_area / area >= self.table_coverage:
+            return "tables"
+        return None
+
+
+def _pymupdf4llm() -> ModuleType:
+    import pymupdf4llm
+
+    # newer releases default to an onnx layout model when pymupdf.layout is
+    # installed, the fast path must stay model free
+    if getattr(pymupdf4llm, "_use_layout", False):
+        pymupdf4llm.use_layout(False)
+    return pymupdf4llm
+
+
+def _ruled(page: Page) -> bool:
+    # "lines_strict" only finds tables drawn with vector lines, a page without
+    # any drawing cannot have one and skips the costly detection
+    return bool(page.get_cdrawings())
+
+
+def _pil(pix: Pixmap) -> Image:
+    from PIL import Image
+
+    mode = "RGBA" if pix.alpha else "RGB"
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+def _table_html(rows: list[list[str | None]]) -> str:
+    body = "".join(
+        "<tr>"
+        + "".join(f"<td>{html.escape(cell or '')}</td>" for cell in row)
+        + "</tr>"
+        for row in rows
+    )
+    return f"<table>{body}</table>"
+
+
+@final
+class Parser(BaseParser):
+    provider = "pymupdf"
+    # pages matching these rules go to `opt.escalate` when it is set
+    escalation = Escalation()
+
+    @cached_property
+    def _escalate(self) -> BaseParser:
+        from docparser.parser import load_parser
+
+        assert self.opt.escalate
+        return load_parser(self.opt.escalate)(self.opt, validate=False)
+
+    @override
+    def _warm(self) -> None:
+        start = perf_counter()
+        _ = _pymupdf4llm()
+        self._record("import", perf_counter() - start)
+        if self.opt.escalate:
+            _ = self._escalate.warm()
+
+    @override
+    def close(self) -> None:
+        # only when the escalation backend was ever built
+        if "_escalate" in self.__dict__:
+            self._escalate.close()
+        super().close()
+
+    def _pages(self, doc: Document, page_range: tuple[int, int] | None) -> list[int]:
+        first, last = page_range or (1, doc.page_count)
+        if first > doc.page_count:
+            raise ValueError(f"{doc.name} has only {doc.page_count} pages")
+        return list(range(first, min(last, doc.page_count) + 1))
+
+    def _tables(self, page: Page) -> list[TableElement]:
+        tables: list[TableElement] = list()
+        if not _ruled(page):
+            return tables
+        with metrics.span("table_structure", provider=self.provider):
+            found = page.find_tables(strategy="lines_strict").tables
+        # markdown serves markdown and json output, html only html output
+        formats = self.opt.output_formats
+        for tab in found:
+            tables.append(
+                TableElement(
+                    metadata=Metadata(page_no=page.number + 1, bbox=tuple(tab.bbox)),
+                    markdown=tab.to_markdown() if formats != ("html",) else None,
+                    html=_table_html(tab.extract()) if "html" in formats else None,
+                )
+            )
+        return tables
+
+    def _figures(self, page: Page, interner: Interner) -> list[ImageElement]:
+        figures: list[ImageElement] = list()
+        for info in page.get_image_info():
+            bbox = page.rect & info["bbox"]
+            # icons and rules are not figures, same limit pymupdf4llm uses
+            if bbox.width < page.rect.width * 0.05 or bbox.height < (
+                page.rect.height * 0.05
+            ):
+                continue
+            # logos and letterheads repeat on every page, keep one copy
+            image = interner.intern(_pil(page.get_pixmap(clip=bbox, dpi=_DPI)))
+            figures.append(
+                ImageElement(
+                    metadata=Metadata(page_no=page.number + 1, bbox=tuple(bbox)),
+                    image=image,
+                )
+            )
+        return figures
+
+    def _render(
+        self, doc: Document, pages: list[int]
+    ) -> dict[OutputFormat, dict[int, str | dict[str, object]]]:
+        # every format is rendered in turn, a pymupdf document is not safe to
+        # share between threads
+        formats = self.opt.output_formats
+        rendered: dict[OutputFormat, dict[int, str | dict[str, object]]] = dict()
+        if "html" in formats:
+            rendered["html"] = {pno: doc[pno - 1].get_text("xhtml") for pno in pages}
+        if formats == ("html",):
+            return rendered
+        md = _pymupdf4llm()
+        ruled = [
+            pno
+            for pno in pages
+            if "table" in self.opt.capbility and _ruled(doc[pno - 1])
+        ]
+        plain = [pno for pno in pages if pno not in set(ruled)]
+        # one header analysis for both groups keeps the heading levels
+        # consistent across the document
+        hdr_info = md.IdentifyHeaders(doc, pages=[pno - 1 for pno in pages])
+        texts: dict[int, str] = dict()
+        for group, strategy in ((ruled, "lines_strict"), (plain, None)):
+            if group:
+                chunks = md.to_markdown(
+                    doc,
+                    pages=[pno - 1 for pno in group],
+                    hdr_info=hdr_info,
+                    page_chunks=True,
+                    table_strategy=strategy,
+                    show_progress=False,
+                )
+                texts.update(zip(group, (chunk["text"] for chunk in chunks)))
+        if "markdown" in formats:
+            rendered["markdown"] = {pno: texts[pno] for pno in pages}
+        if "json" in formats:
+            rendered["json"] = {
+                pno: {"page_no": pno, "markdown": texts[pno]} for pno in pages
+            }
+        return rendered
+
+    def _parse(
+        self, src: PdfInput, page_range: tuple[int, int] | None = None
+    ) -> ParseOutput:
+        caps = self.opt.capbility
+        with src.document() as doc:
+            pages = self._pages(doc, page_range or self.opt.page_range)
+            fast: list[int] = list()
+            escalated: dict[int, str] = dict()
+            out = ParseOutput(name=src.stem, text=[], table=[], figure=[], page=[])
+            images: dict[int, Image] = dict()
+            interner = Interner()
+            for pno in pages:
+                page = doc[pno - 1]
+                tables = self._tables(page) if "table" in caps else []
+                if self.opt.escalate:
+                    area = sum(abs(page.rect & el.metadata.bbox) for el in tables)
+                    reason = self.escalation.reason(page, area, self.opt.do_ocr)
+                    if reason:
+                        escalated[pno] = reason
+                        continue
+                fast.append(pno)
+                # the fast path reads the text layer, OCR is left to escalation
+                if self.opt.do_ocr:
+                    out.ocr[pno] = False
+                out.table.extend(tables)
+                if "text" in caps:
+                    out.text.extend(
+                        TextElement(page_no=pno, content=block[4].strip())
+                        for block in page.get_text("blocks", sort=True)
+                        if block[6] == 0 and block[4].strip()
+                    )
+                if "image" in caps:
+                    out.figure.extend(self._figures(page, interner))
+                if "page" in caps:
+                    images[pno] = _pil(page.get_pixmap(dpi=_DPI))
+            with metrics.span("export", provider=self.provider):
+                fragments = (
+                    self._render(doc, fast)
+                    if fast
+                    else {fmt: {} for fmt in self.opt.output_formats}
+                )
+
+        if escalated:
+            logger.info(
+                f"{src.stem}: escalating {len(escalated)}/{len(pages)} pages "
+                f"to {self.opt.escalate}: {escalated}"
+            )
+        # consecutive escalated pages are converted as one range
+        for _, run in groupby(
+            enumerate(sorted(escalated)), key=lambda item: item[1] - item[0]
+        ):
+            span = [pno for _, pno in run]
+            with metrics.span("escalate", provider=self.opt.escalate):
+                sub = self._escalate.parse_pages(src, (span[0], span[-1]))
+            if not sub.ok:
+                raise RuntimeError(f"escalation failed on pages {span}: {sub.error}")
+            out.text.extend(sub.text)
+            out.table.extend(sub.table)
+            out.figure.extend(sub.figure)
+            out.ocr.update(sub.ocr)
+            images.update(zip(span, sub.page))
+            for fmt, frags in fragments.items():
+                match fmt:
+                    case "html":
+                        frags[span[0]] = html_body(sub.html or "")
+                    case "json":
+                        frags[span[0]] = {
+                            "page_range": [span[0], span[-1]],
+                            "provider": self.opt.escalate,
+                            "document": sub.json,
+                        }
+                    case _:
+                        frags[span[0]] = sub.markdown or ""
+
+        if escalated:
+            out.text.sort(key=lambda el: el.page_no)
+            out.table.sort(key=lambda el: el.metadata.page_no)
+            out.figure.sort(key=lambda el: el.metadata.page_no)
+            out.ocr = dict(sorted(out.ocr.items()))
+        out.page = [images[pno] for pno in sorted(images)]
+        for fmt, frags in fragments.items():
+            rendered = [frags[pno] for pno in sorted(frags)]
+            match fmt:
+                case "html":
+                    body = "".join(map(str, rendered))
+                    out.html = f"<html><body>{body}</body></html>"
+                case "json":
+                    out.json = {"name": src.stem, "pages": rendered}
+                case _:
+                    out.markdown = "\n\n".join(map(str, rendered))
+        if self.opt.save_dir:
+            out.save_path = SavePath.default(root=self.opt.save_dir)
+        return out
+
+    @override
+    def parse_pages(self, src: PdfInput, page_range: tuple[int, int]) -> ParseOutput:
+        out = self._timed_call(lambda: self._parse(src, page_range))
+        out.page_range = page_range
+        return out
+
+    @override
+    def _produce_sp(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        return (self._timed_call(lambda: self._parse(src)), True)
+
+    @override
+    def _produce_common(self, src: PdfInput) -> tuple[CommonParseOutput, bool]:
+        return (self._write(self._timed_call(lambda: self._parse(src)), src.stem), True)
+
+    @get_time_sync
+    @override
+    def run_sp(self) -> Generator[ParseOutput, None, None]:
+        return (self.parse_one(addr) for addr in self.opt.address)
+
+    @get_time_sync
+    @override
+    def run(self) -> Generator[CommonParseOutput, None, None]:
+        return (self.save_one(addr) for addr in self.opt.address)
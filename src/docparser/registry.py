@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Generic, TypeVar, final
+
+from loguru import logger
+
+from docparser import metrics
+
+T = TypeVar("T")
+
+
+def _rss() -> int:
+    # resident bytes of this process; a profile is charged what its build adds
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # the peak rather than the current size, it still grows by a build
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+@dataclass
+class _Entry:
+    value: Any = None
+    close: Callable[[Any], None] | None = None
+    refs: int = 0
+    nbytes: int = 0
+    # one build per key, concurrent acquirers wait for it
+    building: threading.Lock = field(default_factory=threading.Lock)
+    # the converters are not thread safe, whoever converts holds this
+    lock: threading.RLock = field(default_factory=threading.RLock)
+
+
+@final
+class Lease(Generic[T]):
+    # a parser's hold on a shared value, given back by release() or when the
+    # lease is garbage collected
+    def __init__(self, registry: Registry, key: str, entry: _Entry) -> None:
+        self.key = key
+        self.value: T = entry.value
+        self.lock = entry.lock
+        self._release = weakref.finalize(self, registry._release, key, entry)
+
+    def release(self) -> None:
+        # idempotent
+        _ = self._release()
+
+
+@final
+class Registry:
+    # converters and model artifacts shared by every parser of the process,
+    # keyed by the pipeline options they were built with. Entries are built
+    # on first use and counted while parsers hold them; idle ones are evicted
+    # least recently used first once there are more than `max_idle` of them
+    # or all entries together take more than `max_bytes`
+    def __init__(self, max_idle: int = 4, max_bytes: int | None = None) -> None:
+        self.max_idle = max_idle
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def profiles(self) -> list[str]:
+        with self._lock:
+            return [
+                key for key, entry in self._entries.items() if entry.value is not None
+            ]
+
+    def acquire(
+        self,
+        key: str,
+        build: Callable[[], T],
+        close: Callable[[T], None] | None = None,
+    ) -> Lease[T]:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                entry = self._entries[key] = _Entry()
+            entry.refs += 1
+            self._entries.move_to_end(key)
+        try:
+            if entry.value is None:
+                with entry.building:
+                    if entry.value is None:
+                        self._build(key, entry, build, close)
+        except BaseException:
+            self._release(key, entry)
+            raise
+        self._evict()
+        return Lease(self, key, entry)
+
+    def clear(self) -> None:
+        # drops every idle entry, held ones stay
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if not entry.refs]
+        self._evict(idle)
+
+    def _build(
+        self,
+        key: str,
+        entry: _Entry,
+        build: Callable[[], T],
+        close: Callable[[T], None] | None,
+    ) -> None:
+        start, before = perf_counter(), _rss()
+        entry.value = build()
+        entry.close = close
+        entry.nbytes = max(0, _rss() - before)
+        logger.info(
+            f"loaded {key} in {perf_counter() - start:.3f}s (+{entry.nbytes >> 20} MiB)"
+        )
+
+    def _release(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            entry.refs -= 1
+            # a failed build leaves nothing worth keeping
+            if not entry.refs and entry.value is None:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        self._evict()
+
+    def _evict(self, keys: list[str] | None = None) -> None:
+        evicted: list[tuple[str, _Entry]] = list()
+        with self._lock:
+            idle = [
+                key
+                for key, entry in self._entries.items()
+                if not entry.refs and entry.value is not None
+            ]
+            total = sum(entry.nbytes for entry in self._entries.values())
+            for key in idle:
+                over = len(idle) - len(evicted) > self.max_idle or (
+                    self.max_bytes is not None and total > self.max_bytes
+                )
+                if not over and (keys is None or key not in keys):
+                    continue
+                entry = self._entries.pop(key)
+                total -= entry.nbytes
+                evicted.append((key, entry))
+            if metrics.enabled():
+                metrics.registry.set("docparser_warm_profiles", len(self._entries))
+                metrics.registry.set("docparser_warm_bytes", total)
+        for key, entry in evicted:
+            logger.info(f"evict idle {key} ({entry.nbytes >> 20} MiB)")
+            if entry.close is not None:
+                entry.close(entry.value)
+            entry.value = None
+
+
+# the one registry every backend attaches to
+converters = Registry()
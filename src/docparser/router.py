@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import importlib.util
+import threading
+from collections.abc import Generator, Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import count
+from time import perf_counter
+from typing import Literal, Protocol, final, override
+
+from loguru import logger
+
+from docparser.base_parser import BaseParser
+from docparser.parser import load_parser
+from docparser.source import PdfInput
+from docparser.types import CommonParseOutput, ParseOpt, ParseOutput
+from docparser.utils import get_time_sync
+
+Mode = Literal["sp", "common"]
+
+# seconds per page before a provider has been observed on this machine
+_PRIOR_SPP = {"pymupdf": 0.02, "docling": 1.0, "marker": 1.5}
+# package each backend needs, a provider that is not installed is never picked
+_REQUIRES = {"pymupdf": "pymupdf4llm", "docling": "docling", "marker": "marker"}
+# the pages looked at when sniffing, spread over the whole document
+_SAMPLE = 8
+
+
+@dataclass(frozen=True)
+class Signals:
+    pages: int
+    size: int
+    # share of sampled pages with a usable text layer
+    text_layer: float
+    # mean share of a sampled page covered by images
+    image_density: float
+
+    @staticmethod
+    def sniff(src: PdfInput, min_chars: int = 32) -> Signals:
+        with src.document() as doc:
+            pages = doc.page_count
+            step = max(1, pages // _SAMPLE)
+            sample = [doc[pno] for pno in range(0, pages, step)][:_SAMPLE]
+            with_text, density = 0, 0.0
+            for page in sample:
+                with_text += len(page.get_text().strip()) >= min_chars
+                covered = sum(
+                    abs(page.rect & info["bbox"]) for info in page.get_image_info()
+                )
+                density += min(1.0, covered / (abs(page.rect) or 1.0))
+        n = len(sample) or 1
+        return Signals(
+            pages=pages,
+            size=src.size,
+            text_layer=with_text / n,
+            image_density=density / n,
+        )
+
+
+@dataclass
+class ProviderStats:
+    inflight: int = 0
+    done: int = 0
+    failed: int = 0
+    pages: int = 0
+    seconds: float = 0.0
+    # exponentially weighted seconds per page, recent documents count more
+    spp: float | None = None
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+
+@final
+class LiveStats:
+    def __init__(self, alpha: float = 0.2) -> None:
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._stats: dict[str, ProviderStats] = dict()
+
+    def get(self, provider: str) -> ProviderStats:
+        with self._lock:
+            stats = self._stats.setdefault(provider, ProviderStats())
+            return ProviderStats(**vars(stats))
+
+    def spp(self, provider: str) -> float:
+        return self.get(provider).spp or _PRIOR_SPP.get(provider, 1.0)
+
+    @contextmanager
+    def track(self, provider: str, pages: int) -> Generator[None, None, None]:
+        with self._lock:
+            self._stats.setdefault(provider, ProviderStats()).inflight += 1
+        start = perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = perf_counter() - start
+            with self._lock:
+                stats = self._stats[provider]
+                stats.inflight -= 1
+                if not ok:
+                    stats.failed += 1
+                else:
+                    stats.done += 1
+                    stats.pages += pages
+                    stats.seconds += seconds
+                    spp = seconds / max(1, pages)
+                    stats.spp = (
+                        spp
+                        if stats.spp is None
+                        else self.alpha * spp + (1 - self.alpha) * stats.spp
+                    )
+
+
+live_stats = LiveStats()
+
+
+@dataclass(frozen=True)
+class Decision:
+    provider: str
+    reason: str
+    signals: Signals
+    candidates: tuple[str, ...]
+
+
+class Policy(Protocol):
+    def choose(
+        self, signals: Signals, candidates: list[str], stats: LiveStats
+    ) -> tuple[str, str]: ...
+
+
+def _cost(provider: str, signals: Signals, stats: LiveStats) -> float:
+    return stats.spp(provider) * max(1, signals.pages)
+
+
+@final
+class Cheapest:
+    # candidates already meet the quality bar, pick the lowest expected cost
+    def choose(
+        self, signals: Signals, candidates: list[str], stats: LiveStats
+    ) -> tuple[str, str]:
+        provider = min(candidates, key=lambda p: _cost(p, signals, stats))
+        return (provider, f"cheapest, ~{_cost(provider, signals, stats):.2f}s")
+
+
+@final
+class LeastLoaded:
+    def choose(
+        self, signals: Signals, candidates: list[str], stats: LiveStats
+    ) -> tuple[str, str]:
+        provider = min(
+            candidates,
+            key=lambda p: (stats.get(p).inflight, _cost(p, signals, stats)),
+        )
+        return (provider, f"least loaded, {stats.get(provider).inflight} in flight")
+
+
+@final
+class RoundRobin:
+    def __init__(self) -> None:
+        self._turn = count()
+        self._lock = threading.Lock()
+
+    def choose(
+        self, signals: Signals, candidates: list[str], stats: LiveStats
+    ) -> tuple[str, str]:
+        with self._lock:
+            turn = next(self._turn)
+        return (candidates[turn % len(candidates)], "round robin")
+
+
+policies: dict[str, type[Policy]] = {
+    "cheapest": Cheapest,
+    "least-loaded": LeastLoaded,
+    "round-robin": RoundRobin,
+}
+
+
+def _installed(providers: Iterable[str]) -> list[str]:
+    return [p for p in providers if importlib.util.find_spec(_REQUIRES[p]) is not None]
+
+
+@final
+class Router:
+    def __init__(
+        self,
+        policy: Policy | None = None,
+        providers: list[str] | None = None,
+        stats: LiveStats = live_stats,
+        min_text_layer: float = 0.9,
+        max_image_density: float = 0.5,
+    ) -> None:
+        self.policy: Policy = policy or Cheapest()
+        self.providers = providers or _installed(_REQUIRES)
+        self.stats = stats
+        # below this text layer or above this image density the fast path is
+        # not good enough and a layout model is needed
+        self.min_text_layer = min_text_layer
+        self.max_image_density = max_image_density
+
+    def candidates(self, signals: Signals, opt: ParseOpt, mode: Mode) -> list[str]:
+        found = list(self.providers)
+        if mode == "sp":
+            # marker only writes files
+            found = [p for p in found if p != "marker"]
+        if opt.use_llm:
+            found = [p for p in found if p == "marker"]
+        needs_layout = (
+            opt.do_ocr and signals.text_layer < self.min_text_layer
+        ) or signals.image_density > self.max_image_density
+        if needs_layout and not opt.escalate:
+            found = [p for p in found if p != "pymupdf"] or found
+        return found
+
+    def route(self, src: PdfInput, opt: ParseOpt, mode: Mode) -> Decision:
+        signals = Signals.sniff(src)
+        candidates = self.candidates(signals, opt, mode)
+        if not candidates:
+            raise RuntimeError(f"no provider can {mode}-parse {src.stem}")
+        provider, reason = self.policy.choose(signals, candidates, self.stats)
+        decision = Decision(provider, reason, signals, tuple(candidates))
+        logger.info(
+            f"route {src.stem} -> {provider} ({reason}); pages={signals.pages} "
+            f"size={signals.size} text_layer={signals.text_layer:.2f} "
+            f"image_density={signals.image_density:.2f} candidates={candidates}"
+        )
+        return decision
+
+
+@final
+class Parser(BaseParser):
+    provider = "auto"
+
+    def __init__(
+        self, opt: ParseOpt, validate: bool = True, router: Router | None = None
+    ) -> None:
+        super().__init__(opt, validate)
+        self.router = router or Router(policies[opt.route_policy]())
+        self._delegates: dict[str, BaseParser] = dict()
+        self._lock = threading.Lock()
+
+    def _delegate(self, provider: str) -> BaseParser:
+        with self._lock:
+            if provider not in self._delegates:
+                self._delegates[provider] = load_parser(provider)(
+                    self.opt, validate=False
+                )
+            # follow option changes made after the delegate was built
+            delegate = self._delegates[provider]
+            delegate.opt = self.opt
+            return delegate
+
+    @override
+    def close(self) -> None:
+        with self._lock:
+            for delegate in self._delegates.values():
+                delegate.close()
+        super().close()
+
+    # every backend caches under its own provider, so routing stays out of it
+    @override
+    def parse_file(self, src: PdfInput) -> ParseOutput:
+        decision = self.router.route(src, self.opt, "sp")
+        with self.router.stats.track(decision.provider, decision.signals.pages):
+            return self._delegate(decision.provider).parse_file(src)
+
+    @override
+    def save_file(self, src: PdfInput) -> CommonParseOutput:
+        decision = self.router.route(src, self.opt, "common")
+        with self.router.stats.track(decision.provider, decision.signals.pages):
+            return self._delegate(decision.provider).save_file(src)
+
+    @get_time_sync
+    @override
+    def run_sp(self) -> Generator[ParseOutput, None, None]:
+        return (self.parse_one(addr) for addr in self.opt.address)
+
+    @get_time_sync
+    @override
+    def run(self) -> Generator[CommonParseOutput, None, None]:
+        return (self.save_one(addr) for addr in self.opt.address)
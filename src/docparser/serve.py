@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import BaseServer, ThreadingMixIn, UnixStreamServer
+from time import perf_counter
+from typing import Any, Literal, final, override
+
+from loguru import logger
+
+from docparser import metrics
+from docparser.parser import load_parser, providers
+from docparser.registry import converters
+from docparser.types import CommonParseOutput, ParseOpt, ParseOutput
+
+Mode = Literal["sp", "common"]
+
+# ParseOpt arguments a job may not set, they come from the job itself
+_RESERVED = {"source", "address", "input_format"}
+JOB_SECONDS = "docparser_job_seconds"
+QUEUE_WAIT_SECONDS = "docparser_queue_wait_seconds"
+QUEUE_DEPTH = "docparser_queue_depth"
+
+
+@dataclass
+class Job:
+    provider: str
+    address: str
+    mode: Mode
+    opt: ParseOpt
+    future: Future[dict[str, object]] = field(default_factory=Future)
+    queued: float = field(default_factory=perf_counter)
+
+    @staticmethod
+    def from_json(body: dict[str, Any], provider: str, save_dir: str) -> Job:
+        address = body.get("address")
+        if not isinstance(address, str) or not address:
+            raise ValueError("job needs an address")
+        mode = body.get("mode", "sp")
+        if mode not in ("sp", "common"):
+            raise ValueError(f"unknown mode: {mode}")
+        provider = body.get("provider", provider)
+        if provider not in providers:
+            raise ValueError(f"unknown provider: {provider}")
+        source = body.get("source") or (
+            "url" if address.startswith(("http://", "https://")) else "local"
+        )
+        options: dict[str, Any] = {
+            "output_format": "markdown",
+            "save_dir": save_dir,
+            **body.get("options", {}),
+        }
+        if reserved := _RESERVED & options.keys():
+            raise ValueError(f"options may not set {sorted(reserved)}")
+        if isinstance(options.get("page_range"), list):
+            options["page_range"] = tuple(options["page_range"])
+        try:
+            opt = ParseOpt(source, [address], "pdf", **options)
+        except TypeError as e:
+            raise ValueError(str(e)) from e
+        return Job(provider, address, mode, opt)
+
+
+def _sp_result(out: ParseOutput) -> dict[str, object]:
+    result: dict[str, object] = {
+        "name": out.name,
+        "ok": out.ok,
+        "error": out.error,
+        "markdown": out.markdown,
+        "json": out.json,
+        "html": out.html,
+        "text": [{"page_no": el.page_no, "content": el.content} for el in out.text],
+        "tables": len(out.table),
+        "figures": len(out.figure),
+        "pages": len(out.page),
+        "ocr_pages": sum(out.ocr.values()),
+        "ocr_skipped": len(out.ocr) - sum(out.ocr.values()),
+    }
+    out.release()
+    return result
+
+
+def _common_result(out: CommonParseOutput) -> dict[str, object]:
+    return {
+        "ok": out.ok,
+        "error": out.error,
+        "output_format": out.output_format,
+        "output_path": str(out.output_path),
+        "output_paths": {fmt: str(path) for fmt, path in out.output_paths.items()},
+    }
+
+
+@final
+class Daemon:
+    def __init__(
+        self,
+        provider: str = "auto",
+        save_dir: str = "output",
+        workers: int = 1,
+        queue_size: int = 16,
+        max_profiles: int = 4,
+        timeout: float = 600.0,
+    ) -> None:
+        # backends hook their pipelines at construction when metrics are on
+        metrics.enable()
+        self.provider = provider
+        self.save_dir = save_dir
+        self.timeout = timeout
+        # every job gets its own parser; the models behind it stay loaded in
+        # the process-wide registry, which keeps this many idle profiles
+        converters.max_idle = max(1, max_profiles)
+        self.jobs: queue.Queue[Job | None] = queue.Queue(max(1, queue_size))
+        self._workers = [
+            threading.Thread(target=self._work, name=f"docparser-serve-{i}")
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def profiles(self) -> list[str]:
+        return converters.profiles()
+
+    def submit(self, job: Job) -> Future[dict[str, object]]:
+        # raises queue.Full when the backlog is at capacity
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            metrics.inc("docparser_jobs_rejected_total", provider=job.provider)
+            raise
+        metrics.registry.set(QUEUE_DEPTH, self.jobs.qsize())
+        return job.future
+
+    def preload(self, provider: str) -> None:
+        job = Job.from_json({"address": "-", "provider": provider}, "", self.save_dir)
+        load_parser(job.provider)(job.opt, validate=False).warm().close()
+
+    def close(self) -> None:
+        for _ in self._workers:
+            self.jobs.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _run(self, job: Job) -> dict[str, object]:
+        # attaching to warm models takes milliseconds, converters that are
+        # not thread safe are serialized by the registry's per-model lock
+        parser = load_parser(job.provider)(job.opt, validate=False)
+        try:
+            if job.mode == "sp":
+                return _sp_result(parser.parse_one(job.address))
+            return _common_result(parser.save_one(job.address))
+        finally:
+            parser.close()
+
+    def _work(self) -> None:
+        while (job := self.jobs.get()) is not None:
+            metrics.registry.set(QUEUE_DEPTH, self.jobs.qsize())
+            labels = {"provider": job.provider, "mode": job.mode}
+            metrics.registry.observe(
+                QUEUE_WAIT_SECONDS, perf_counter() - job.queued, **labels
+            )
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                job.future.set_result(self._run(job))
+            except Exception as e:
+                logger.exception(e)
+                job.future.set_exception(e)
+            finally:
+                seconds = perf_counter() - job.queued
+                metrics.registry.observe(JOB_SECONDS, seconds, **labels)
+                logger.info(f"job {job.address} ({job.provider}) took {seconds:.3f}s")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    daemon: Daemon
+
+    def _reply(
+        self,
+        status: HTTPStatus,
+        body: object,
+        content_type: str = "application/json",
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        _ = self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        match self.path:
+            case "/metrics":
+                self._reply(
+                    HTTPStatus.OK,
+                    metrics.registry.to_prometheus(),
+                    "text/plain; version=0.0.4",
+                )
+            case "/healthz":
+                self._reply(
+                    HTTPStatus.OK,
+                    {
+                        "queue_depth": self.daemon.jobs.qsize(),
+                        "queue_size": self.daemon.jobs.maxsize,
+                        "profiles": self.daemon.profiles,
+                    },
+                )
+            case _:
+                self._reply(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/jobs":
+            self._reply(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = Job.from_json(
+                json.loads(self.rfile.read(length) or b"{}"),
+                self.daemon.provider,
+                self.daemon.save_dir,
+            )
+        except ValueError as e:
+            self._reply(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        try:
+            future = self.daemon.submit(job)
+        except queue.Full:
+            self._reply(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"error": "queue is full"},
+                headers={"Retry-After": "1"},
+            )
+            return
+        try:
+            self._reply(HTTPStatus.OK, future.result(self.daemon.timeout))
+        except FutureTimeout:
+            _ = future.cancel()
+            self._reply(HTTPStatus.GATEWAY_TIMEOUT, {"error": "job timed out"})
+        except Exception as e:
+            self._reply(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+
+    @override
+    def log_message(self, format: str, *args: Any) -> None:
+        # unix socket peers have no address to print
+        logger.debug(format % args)
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    daemon: Daemon, host: str = "127.0.0.1", port: int = 8765, socket: str | None = None
+) -> BaseServer:
+    handler = type("Handler", (_Handler,), {"daemon": daemon})
+    if socket is None:
+        return ThreadingHTTPServer((host, port), handler)
+    Path(socket).unlink(missing_ok=True)
+    return _UnixHTTPServer(socket, handler)
+
+
+def serve(
+    daemon: Daemon, host: str = "127.0.0.1", port: int = 8765, socket: str | None = None
+) -> None:
+    server = make_server(daemon, host, port, socket)
+    logger.info(f"docparser serving on {socket or f'http://{host}:{port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        if socket is not None:
+            Path(socket).unlink(missing_ok=True)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+from collections.abc import Generator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from docparser import metrics
+from docparser.pool import run_pool
+from docparser.source import PdfInput
+from docparser.types import ParseOpt, ParseOutput
+
+if TYPE_CHECKING:
+    from docparser.base_parser import BaseParser
+
+
+def shards(opt: ParseOpt, page_count: int) -> list[tuple[int, int]]:
+    # 1-based inclusive page ranges of `shard_pages` pages, none when the
+    # document is short enough to convert in one go. Pool workers convert
+    # whatever they are given themselves, shards never fan out again
+    if not opt.shard_pages or opt.workers <= 1 or mp.parent_process() is not None:
+        return []
+    first, last = opt.page_range or (1, page_count)
+    last = min(last, page_count)
+    if last - first + 1 <= opt.shard_pages:
+        return []
+    return [
+        (start, min(start + opt.shard_pages - 1, last))
+        for start in range(first, last + 1, opt.shard_pages)
+    ]
+
+
+_worker: BaseParser | None = None
+
+
+def _init_worker(provider: str, opt: ParseOpt) -> None:
+    # once per worker: load the models before the first shard arrives
+    from docparser.parser import load_parser
+
+    global _worker
+    _worker = load_parser(provider)(opt, validate=False).warm()
+
+
+def _parse_shard(job: tuple[str, tuple[int, int]]) -> ParseOutput:
+    assert _worker is not None
+    path, page_range = job
+    with PdfInput(Path(path)) as src:
+        return _worker.parse_pages(src, page_range)
+
+
+def sharded_parts(
+    parser: BaseParser, src: PdfInput, ranges: list[tuple[int, int]]
+) -> Generator[ParseOutput, None, None]:
+    # every shard keeps the page numbers it has in the whole document and
+    # comes back in page order, splicing them restores the reading order
+    logger.info(f"{src.stem}: {len(ranges)} shards on {parser.opt.workers} workers")
+    for (_, (first, last)), res in run_pool(
+        _parse_shard,
+        [(str(src.path), page_range) for page_range in ranges],
+        workers=min(parser.opt.workers, len(ranges)),
+        initializer=_init_worker,
+        initargs=(parser.provider, parser.opt),
+    ):
+        if res.is_err():
+            raise RuntimeError(
+                f"shard {first}-{last} of {src.stem} failed: {res.unwrap_err()}"
+            )
+        metrics.inc("docparser_shards_total", provider=parser.provider)
+        yield res.unwrap()
+
+
+def parse_sharded(
+    parser: BaseParser, src: PdfInput, ranges: list[tuple[int, int]]
+) -> ParseOutput:
+    parts = list(sharded_parts(parser, src, ranges))
+    return ParseOutput.splice(src.stem, parts, parser.opt.output_formats)
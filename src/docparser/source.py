@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+from collections.abc import Generator
+from contextlib import closing, contextmanager
+from functools import cached_property
+from pathlib import Path
+from typing import TYPE_CHECKING, Self, final
+
+if TYPE_CHECKING:
+    from pymupdf import Document
+
+
+@final
+class PdfInput:
+    # one read-only mapping of a local file or a spooled download, shared by
+    # hashing, page counting and every in-process reader. The ML backends
+    # still take `path`, their reads are served from the same page cache as
+    # the mapping so nothing is copied into python memory along the way.
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            # the mapping stays valid after the descriptor is closed
+            if (size := f.seek(0, 2)) == 0:
+                raise ValueError(f"{path} is empty")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = size
+        self.view = memoryview(self._map)
+
+    @property
+    def stem(self) -> str:
+        return self.path.stem
+
+    @cached_property
+    def sha256(self) -> str:
+        # hashlib reads straight from the buffer and drops the GIL meanwhile
+        return hashlib.sha256(self.view).hexdigest()
+
+    @cached_property
+    def page_count(self) -> int:
+        with self.document() as doc:
+            return doc.page_count
+
+    @cached_property
+    def page_digests(self) -> list[str]:
+        # what a page looks like without rasterizing it: its geometry, content
+        # streams, the raw bytes of the images it draws and the fonts it uses.
+        # Unchanged pages of a revised pdf keep their digest even when other
+        # pages were inserted, removed or edited.
+        digests: list[str] = list()
+        with self.document() as doc:
+            for page in doc:
+                h = hashlib.sha256()
+                h.update(f"{tuple(page.rect)}/{page.rotation}".encode())
+                h.update(page.read_contents())
+                for image in page.get_images(full=True):
+                    h.update(doc.xref_stream_raw(image[0]) or b"")
+                for font in page.get_fonts(full=True):
+                    # subset prefixes ("ABCDEF+") change with every export
+                    h.update(font[3].split("+")[-1].encode())
+                digests.append(h.hexdigest())
+        return digests
+
+    @contextmanager
+    def document(self) -> Generator[Document, None, None]:
+        import pymupdf
+
+        with closing(pymupdf.open(stream=self.view, filetype="pdf")) as doc:
+            yield doc
+
+    def close(self) -> None:
+        self.view.release()
+        self._map.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
@@ -1,18 +1,30 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from random import choice
-from typing import Literal, Self, final
+from typing import TYPE_CHECKING, Literal, Self, final, get_args
 
 from loguru import logger
-from pandas import DataFrame as PdData
-from PIL.Image import Image
 
-from docparser.utils import is_valid_path, is_valid_url
+from docparser.images import ImageFormat, ImageHash, ImageSink
+from docparser.utils import (
+    html_body,
+    is_valid_path,
+    is_valid_url,
+    is_valid_url_syntax,
+)
 
-default_providers = ["pymupdf", "docling", "marker", "random"]
-DefaultCapbility = Literal["text", "image", "table"]
+if TYPE_CHECKING:
+    from pandas import DataFrame as PdData
+    from PIL.Image import Image
+
+    from docparser.columnar import Columns
+
+default_providers = ["pymupdf", "docling", "marker", "random", "auto"]
+DefaultCapbility = Literal["text", "image", "table", "page"]
+OutputFormat = Literal["markdown", "json", "html"]
+OcrMode = Literal["hybrid", "full"]
 
 
 @final
@@ -22,28 +34,99 @@ class ParseOpt:
         source: Literal["url", "local"],
         address: list[str],
         input_format: Literal["pdf"],
-        output_format: Literal["markdown", "json", "html"],
+        output_format: OutputFormat | Iterable[OutputFormat],
         save_dir: str,
         capbility: list[DefaultCapbility] | None = None,
         do_ocr: bool = True,
+        ocr_mode: OcrMode = "hybrid",
         gpu_enabled: bool = False,
         use_llm: bool = False,
+        workers: int = 1,
+        ordered: bool = True,
+        cache_dir: str | None = None,
+        cache_max_bytes: int = 4 << 30,
+        page_window: int | None = None,
+        url_check: Literal["syntax", "head"] = "syntax",
+        page_range: tuple[int, int] | None = None,
+        escalate: Literal["docling", "marker"] | None = None,
+        route_policy: Literal["cheapest", "least-loaded", "round-robin"] = "cheapest",
+        image_format: ImageFormat = "png",
+        image_quality: int = 85,
+        image_dpi: int | None = None,
+        image_store: str | None = None,
+        image_hash: ImageHash = "exact",
+        incremental: bool = False,
+        shard_pages: int | None = None,
+        stream: bool = False,
     ) -> None:
         self.source = source
         self.address = address
         self.input_format = input_format
-        self.output_format = output_format
+        # one format or several; every requested format is rendered from the
+        # same conversion. `output_format` is the first of them, in the order
+        # markdown, json, html
+        formats = (
+            {output_format} if isinstance(output_format, str) else set(output_format)
+        )
+        if unknown := formats - set(get_args(OutputFormat)):
+            raise ValueError(f"unknown output format {sorted(unknown)}")
+        self.output_formats: tuple[OutputFormat, ...] = tuple(
+            fmt for fmt in get_args(OutputFormat) if fmt in formats
+        )
+        if not self.output_formats:
+            raise ValueError("no output format")
+        self.output_format: OutputFormat = self.output_formats[0]
         self.do_ocr = do_ocr
+        # "hybrid" OCRs only pages, or bitmaps on them, without a usable text
+        # layer; "full" leaves the choice to the backend's own rules
+        self.ocr_mode: OcrMode = ocr_mode
         self.gpu_enabled = gpu_enabled
-        self.capbility = capbility if not capbility else ["text", "image", "table"]
+        # every stage that is not listed here is skipped by the backends
+        self.capbility = capbility if capbility else ["text", "image", "table", "page"]
         self.save_dir = Path(save_dir)
         self.use_llm = use_llm
+        self.workers = max(1, workers)
+        self.ordered = ordered
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_max_bytes = cache_max_bytes
+        self.page_window = page_window
+        # "syntax" leaves reachability to the fetch itself, "head" probes first
+        self.url_check = url_check
+        # first and last page to convert, 1-based and inclusive
+        if page_range is not None and not 1 <= page_range[0] <= page_range[1]:
+            raise ValueError(f"invalid page range {page_range}")
+        self.page_range = page_range
+        # the pymupdf backend hands scanned or table-heavy pages to this one
+        self.escalate = escalate
+        # how the "auto" provider picks a backend for each document
+        self.route_policy = route_policy
+        # how page and figure images are written, see ImageSink
+        self.image_format: ImageFormat = image_format
+        self.image_quality = image_quality
+        self.image_dpi = image_dpi
+        # figures and pages of every document go to this content-addressed
+        # directory, each distinct image once, see ImageSink.store
+        self.image_store = Path(image_store) if image_store else None
+        self.image_hash: ImageHash = image_hash
+        # reuse cached results of pages seen before (needs cache_dir), only
+        # new or changed pages are converted
+        self.incremental = incremental
+        # documents longer than this are split into shards of as many pages,
+        # converted on `workers` processes and merged back into one output
+        if shard_pages is not None and shard_pages < 1:
+            raise ValueError(f"invalid shard size {shard_pages}")
+        self.shard_pages = shard_pages
+        # run() appends every `page_window` pages (or shard) to the output
+        # files as soon as they are converted, json output becomes json lines
+        self.stream = stream
 
     @property
     def ok(self) -> bool:
         match self.source:
-            case "url":
+            case "url" if self.url_check == "head":
                 return is_valid_url(self.address)
+            case "url":
+                return is_valid_url_syntax(self.address)
             case _:
                 return is_valid_path(self.address)
 
@@ -53,23 +136,28 @@ class ParseReq:
     def __init__(
         self,
         option: ParseOpt,
-        provider: Literal["pymupdf", "docling", "marker", "random"] = "random",
+        provider: Literal["pymupdf", "docling", "marker", "random", "auto"] = "auto",
     ):
         self.option = option
-        self.provider = choice(default_providers) if provider == "random" else provider
+        # "random" is kept for old callers, it now spreads documents evenly
+        # instead of picking one backend blindly for the whole request
+        if provider == "random":
+            option.route_policy = "round-robin"
+            provider = "auto"
+        self.provider = provider
 
     @property
     def ok(self):
         return self.option.ok
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Metadata:
     page_no: int
     bbox: tuple[float, float, float, float]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TableElement:
     metadata: Metadata
     markdown: str | None = None
@@ -77,13 +165,58 @@ class TableElement:
     pandas: PdData | None = None
 
 
-@dataclass(frozen=True)
+@final
 class ImageElement:
-    metadata: Metadata
-    image: Image
+    # built with `load` the figure is only cropped on first access, figures
+    # nobody looks at never cost a crop
+    __slots__ = ("metadata", "_image", "_load")
+
+    def __init__(
+        self,
+        metadata: Metadata,
+        image: Image | None = None,
+        *,
+        load: Callable[[], Image] | None = None,
+    ) -> None:
+        if image is None and load is None:
+            raise ValueError("an ImageElement needs an image or a loader")
+        self.metadata = metadata
+        self._image = image
+        self._load = load
+
+    @property
+    def image(self) -> Image:
+        if self._image is None:
+            assert self._load is not None
+            self._image, self._load = self._load(), None
+        return self._image
+
+    @property
+    def loaded(self) -> bool:
+        return self._image is not None
+
+    def moved(self, metadata: Metadata) -> ImageElement:
+        return ImageElement(metadata, self._image, load=self._load)
+
+    def close(self) -> None:
+        if self._image is not None:
+            self._image.close()
+        self._load = None
+
+    def __reduce__(self) -> tuple[type[ImageElement], tuple[Metadata, Image]]:
+        # pickled (e.g. into the cache) with the crop made
+        return (ImageElement, (self.metadata, self.image))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ImageElement):
+            return NotImplemented
+        return self.metadata == other.metadata and self.image == other.image
 
+    def __repr__(self) -> str:
+        return f"ImageElement(metadata={self.metadata!r}, loaded={self.loaded})"
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class TextElement:
     page_no: int
     content: str
@@ -119,37 +252,131 @@ class ParseOutput:
     html: str | None = None
     save_path: SavePath | None = None
     ok: bool = True
+    error: str | None = None
+    page_range: tuple[int, int] | None = None
+    # page number -> whether OCR ran on it, empty when OCR was off
+    ocr: dict[int, bool] = field(default_factory=dict)
 
     @property
     def path(self):
         return self.save_path
 
-    def save_figure(self) -> Self:
+    @staticmethod
+    def failed(name: str, error: str) -> ParseOutput:
+        return ParseOutput(
+            name=name, text=[], table=[], figure=[], page=[], ok=False, error=error
+        )
+
+    def rendered(self, fmt: OutputFormat) -> str | dict[str, object] | None:
+        match fmt:
+            case "html":
+                return self.html
+            case "json":
+                return self.json
+            case _:
+                return self.markdown
+
+    def set_rendered(self, fmt: OutputFormat, value: str | dict[str, object]) -> None:
+        match fmt:
+            case "json":
+                assert isinstance(value, dict)
+                self.json = value
+            case _:
+                assert isinstance(value, str)
+                if fmt == "html":
+                    self.html = value
+                else:
+                    self.markdown = value
+
+    @staticmethod
+    def splice(
+        name: str, parts: list[ParseOutput], output_formats: Iterable[OutputFormat]
+    ) -> ParseOutput:
+        # joins single-page outputs, in page order, into one document
+        out = ParseOutput(name=name, text=[], table=[], figure=[], page=[])
+        for part in parts:
+            out.text.extend(part.text)
+            out.table.extend(part.table)
+            out.figure.extend(part.figure)
+            out.page.extend(part.page)
+            out.ocr.update(part.ocr)
+        for fmt in output_formats:
+            match fmt:
+                case "html":
+                    body = "".join(html_body(part.html or "") for part in parts)
+                    out.html = f"<html><body>{body}</body></html>"
+                case "json":
+                    out.json = {"name": name, "pages": [part.json for part in parts]}
+                case _:
+                    out.markdown = "\n\n".join(part.markdown or "" for part in parts)
+        return out
+
+    def moved_to(self, page_no: int) -> ParseOutput:
+        # a single-page output reused at another position of a revised document
+        def meta(m: Metadata) -> Metadata:
+            return replace(m, page_no=page_no)
+
+        return replace(
+            self,
+            text=[replace(el, page_no=page_no) for el in self.text],
+            table=[replace(el, metadata=meta(el.metadata)) for el in self.table],
+            figure=[el.moved(meta(el.metadata)) for el in self.figure],
+            page_range=(page_no, page_no),
+            ocr={page_no: ran for ran in self.ocr.values()},
+        )
+
+    def columns(self) -> Columns:
+        # numpy arrays of page numbers, boxes and utf-8 text, see Columns
+        from docparser.columnar import Columns
+
+        return Columns.from_output(self)
+
+    def release(self) -> None:
+        for pg in self.page:
+            pg.close()
+        for fig in self.figure:
+            fig.close()
+        self.page.clear()
+        self.figure.clear()
+
+    def save_figure(self, sink: ImageSink | None = None) -> Self:
         if not self.save_path:
             logger.error("Save path has not been set!")
             return self
-        for ind, fig in enumerate(self.figure):
-            save_path = self.save_path.root / f"{self.name}-figure-{ind}.png"
-            with open(save_path, "wb") as f:
-                fig.image.save(f, "PNG")
-            self.save_path.figure.append(save_path)
+        root = self.save_path.root
+        self.save_path.figure.extend(
+            (sink or ImageSink()).save_all(
+                (fig.image, root / f"{self.name}-figure-{ind}")
+                for ind, fig in enumerate(self.figure)
+            )
+        )
         return self
 
-    def save_page(
-        self,
-    ) -> Self:
+    def save_page(self, sink: ImageSink | None = None) -> Self:
         if not self.save_path:
             logger.error("Save path has not been set!")
             return self
-        for ind, pg in enumerate(self.page):
-            save_path = self.save_path.root / f"{self.name}-{ind}.png"
-            with open(save_path, "wb") as f:
-                pg.save(f, "PNG")
-            self.save_path.page.append(save_path)
+        root = self.save_path.root
+        self.save_path.page.extend(
+            (sink or ImageSink()).save_all(
+                (pg, root / f"{self.name}-{ind}") for ind, pg in enumerate(self.page)
+            )
+        )
         return self
 
 
 @dataclass
 class CommonParseOutput:
+    # the first requested format and its file, output_paths has all of them
     output_format: str
     output_path: Path
+    ok: bool = True
+    error: str | None = None
+    output_paths: dict[str, Path] = field(default_factory=dict)
+
+    @staticmethod
+    def written(paths: dict[OutputFormat, Path]) -> CommonParseOutput:
+        fmt, path = next(iter(paths.items()))
+        return CommonParseOutput(
+            output_format=fmt, output_path=path, output_paths=dict(paths)
+        )
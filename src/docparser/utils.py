@@ -1,41 +1,60 @@
-from collections.abc import Callable, Awaitable
+from collections.abc import Awaitable, Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from io import BytesIO
 import re
 from time import perf_counter
-from typing import ParamSpec, TypeVar
+from typing import ParamSpec, TypeVar, cast
 from loguru import logger
 from pathlib import Path
 from typeric.result import resulty
-from urllib.parse import urlparse, quote
+from urllib.parse import urlparse
 import requests
 
+from docparser.download import default_downloader, reachability
 
-def is_valid_url(address: list[str]) -> bool:
+
+def is_valid_url_syntax(address: list[str]) -> bool:
+    for addr in address:
+        parsed = urlparse(addr)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return False
+    return True
+
+
+def _head_ok(addr: str) -> bool:
+    if (known := reachability.get(addr)) is not None:
+        return known
     try:
-        for addr in address:
-            response = requests.head(addr)
-            logger.info(f"{response.status_code = }")
-            if response.status_code < 200 or response.status_code >= 400:
-                return False
-        return True
+        response = default_downloader().session.head(addr, timeout=10)
+        logger.info(f"{addr}: {response.status_code = }")
+        ok = 200 <= response.status_code < 400
+        reachability.mark(addr, ok)
+        return ok
+    except requests.ConnectionError as e:
+        logger.error(e)
+        reachability.mark(addr, False, host_down=True)
+        return False
     except Exception as e:
         logger.error(e)
         return False
 
 
+def is_valid_url(address: list[str]) -> bool:
+    # probes every address concurrently over the shared connection pool,
+    # answers are remembered per url and per unreachable host
+    if not address:
+        return True
+    with ThreadPoolExecutor(min(16, len(address))) as pool:
+        return all(pool.map(_head_ok, address))
+
+
 @resulty
 def download_pdf(addr: str) -> tuple[str, BytesIO]:
-    resp = requests.get(addr)
-    resp.raise_for_status()
-    cd = resp.headers.get("Content-Disposition")
-    if cd:
-        fname = re.findall('filename="?([^"]+)"?', cd)
-        if fname:
-            return (fname[0], BytesIO(resp.content))
-    path = urlparse(addr).path
-
-    return (quote(path.split("/")[-1]), BytesIO(resp.content))
+    # kept for callers that want the whole document in memory, the parsers
+    # stream through docparser.download instead
+    with default_downloader().fetch(addr) as download:
+        return (download.name, BytesIO(download.path.read_bytes()))
 
 
 def is_valid_path(address: list[str]) -> bool:
@@ -50,39 +69,65 @@ def is_valid_path(address: list[str]) -> bool:
         return False
 
 
+def html_body(doc: str) -> str:
+    found = re.search(r"<body[^>]*>(.*)</body>", doc, re.DOTALL)
+    return found.group(1) if found else doc
+
+
 P = ParamSpec("P")
 R = TypeVar("R")
+T = TypeVar("T")
+K = TypeVar("K")
+
+
+def run_concurrently(calls: dict[K, Callable[[], R]]) -> dict[K, R]:
+    # renders several formats of one document at once; a single call stays on
+    # the calling thread
+    if len(calls) <= 1:
+        return {key: call() for key, call in calls.items()}
+    with ThreadPoolExecutor(len(calls)) as pool:
+        futures = {key: pool.submit(call) for key, call in calls.items()}
+        return {key: future.result() for key, future in futures.items()}
 
 
 def get_time_async(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
     @wraps(func)
     async def timed_execution(*args: P.args, **kwargs: P.kwargs) -> R:
-        logger.info(f"Starting async func@{func.__name__} with {args= }, {kwargs= }")
+        start_time = perf_counter()
         try:
-            start_time = perf_counter()
-            result = await func(*args, **kwargs)
-            end_time = perf_counter()
-            logger.info(f"{func.__name__} took {end_time - start_time:.3f}s")
-            return result
+            return await func(*args, **kwargs)
         except Exception as e:
-            logger.error(f"{func.__name__} failed with exception: {e}")
+            logger.error(f"{func.__qualname__} failed with exception: {e}")
             raise
+        finally:
+            logger.debug(f"{func.__qualname__} took {perf_counter() - start_time:.3f}s")
 
     return timed_execution
 
 
+def _timed_iter(
+    name: str, gen: Generator[T, None, None], start_time: float
+) -> Generator[T, None, None]:
+    try:
+        yield from gen
+    finally:
+        logger.debug(f"{name} took {perf_counter() - start_time:.3f}s")
+
+
 def get_time_sync(func: Callable[P, R]) -> Callable[P, R]:
+    # run/run_sp hand back lazy generators, the time that matters is the one
+    # spent until the caller has drained (or dropped) them
     @wraps(func)
     def timed_execution(*args: P.args, **kwargs: P.kwargs) -> R:
-        logger.info(f"Starting sync func@{func.__name__} with {args= }, {kwargs= }")
+        start_time = perf_counter()
         try:
-            start_time = perf_counter()
             result = func(*args, **kwargs)
-            end_time = perf_counter()
-            logger.info(f"{func.__name__} took {end_time - start_time:.3f}s")
-            return result
         except Exception as e:
-            logger.error(f"{func.__name__} failed with exception: {e}")
+            logger.error(f"{func.__qualname__} failed with exception: {e}")
             raise
+        if isinstance(result, Generator):
+            return cast(R, _timed_iter(func.__qualname__, result, start_time))
+        logger.debug(f"{func.__qualname__} took {perf_counter() - start_time:.3f}s")
+        return result
 
     return timed_execution
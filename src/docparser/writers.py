@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import IO, Self, final
+
+from docparser.images import ImageSink
+from docparser.types import CommonParseOutput, OutputFormat, ParseOpt, ParseOutput
+from docparser.utils import html_body
+
+_SUFFIX: dict[OutputFormat, str] = {
+    "markdown": ".md",
+    "json": ".jsonl",
+    "html": ".html",
+}
+
+
+@final
+class StreamWriter:
+    # appends the parts of one document to its output files as they are
+    # converted: markdown and html fragments in page order, one json line per
+    # part. Every append is flushed, a reader tailing the files sees each part
+    # as soon as it is done and nothing but the current part is held in memory
+    def __init__(self, opt: ParseOpt, root: Path, name: str) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        self.root = root
+        self.name = name
+        self.paths: dict[OutputFormat, Path] = {
+            fmt: root / f"output{_SUFFIX[fmt]}" for fmt in opt.output_formats
+        }
+        self._sink = ImageSink.from_opt(opt)
+        self._files: dict[OutputFormat, IO[str]] = {
+            fmt: path.open("w", encoding="utf-8") for fmt, path in self.paths.items()
+        }
+        self._parts = 0
+        self._figures = 0
+        if "html" in self._files:
+            _ = self._files["html"].write("<html><body>")
+
+    def append(self, part: ParseOutput) -> None:
+        for fmt, f in self._files.items():
+            match fmt:
+                case "html":
+                    _ = f.write(html_body(part.html or ""))
+                case "json":
+                    line = {"page_range": part.page_range, "document": part.json}
+                    _ = f.write(json.dumps(line) + "\n")
+                case _:
+                    if self._parts:
+                        _ = f.write("\n\n")
+                    _ = f.write(part.markdown or "")
+            f.flush()
+        # figures are numbered across the whole document, as save_figure does
+        _ = self._sink.save_all(
+            (fig.image, self.root / f"{self.name}-figure-{self._figures + ind}")
+            for ind, fig in enumerate(part.figure)
+        )
+        self._parts += 1
+        self._figures += len(part.figure)
+
+    def close(self) -> None:
+        if "html" in self._files and not self._files["html"].closed:
+            _ = self._files["html"].write("</body></html>")
+        for f in self._files.values():
+            f.close()
+
+    def written(self) -> CommonParseOutput:
+        return CommonParseOutput.written(self.paths)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from collections.abc import Generator
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import override
+
+import pytest
+
+from docparser import parser
+from docparser.aio import AsyncParser
+from docparser.base_parser import BaseParser
+from docparser.source import PdfInput
+from docparser.types import ParseOpt, ParseOutput, TextElement
+
+
+class Parser(BaseParser):
+    provider = "echo"
+
+    @override
+    def _produce_sp(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        text = [TextElement(page_no=1, content=str(src.size))]
+        out = ParseOutput(name=src.stem, text=text, table=[], figure=[], page=[])
+        return (out, True)
+
+
+@pytest.fixture
+def server() -> Generator[str, None, None]:
+    handler = partial(SimpleHTTPRequestHandler, directory="tests")
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+async def _collect(async_parser: AsyncParser) -> list[ParseOutput]:
+    async with async_parser:
+        return [out async for out in async_parser.run_sp()]
+
+
+def test_async_parser_fetches_concurrently(server: str, monkeypatch):
+    monkeypatch.setitem(parser.providers, "echo", __name__)
+    opt = ParseOpt(
+        source="url",
+        address=[f"{server}/1.pdf", f"{server}/missing.pdf", f"{server}/1.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        save_dir="output",
+    )
+    outputs = asyncio.run(_collect(AsyncParser(opt, "echo", concurrency=2)))  # pyright: ignore[reportArgumentType]
+    assert [out.ok for out in outputs] == [True, False, True]
+    assert outputs[0].text[0].content == str(len(open("tests/1.pdf", "rb").read()))
+    assert outputs[1].name == "missing"
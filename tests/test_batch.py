@@ -0,0 +1,57 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from docparser import main
+from docparser.batch import JOURNAL, read_manifest, run_batch
+
+
+@pytest.fixture
+def docs(tmp_path: Path) -> Path:
+    for name in ("a", "b"):
+        _ = shutil.copy("tests/1.pdf", tmp_path / f"{name}.pdf")
+    return tmp_path
+
+
+def test_read_manifest(docs: Path):
+    listing = docs / "list.txt"
+    _ = listing.write_text(f"# docs\n{docs / 'b.pdf'}\n\nhttps://x/c.pdf\n")
+    urls = docs / "urls.jsonl"
+    _ = urls.write_text('{"address": "https://x/d.pdf"}\n"https://x/c.pdf"\n')
+    found = read_manifest([str(listing), str(urls), str(docs / "*.pdf")])
+    assert found == [
+        str(docs / "b.pdf"),
+        "https://x/c.pdf",
+        "https://x/d.pdf",
+        str(docs / "a.pdf"),
+    ]
+    with pytest.raises(ValueError):
+        _ = read_manifest([str(docs / "nothing-*.txt")])
+
+
+def test_batch_resumes_from_journal(docs: Path):
+    addresses = [str(docs / "a.pdf"), str(docs / "missing.pdf"), str(docs / "b.pdf")]
+    options = {"save_dir": str(docs / "out"), "page_range": (1, 1)}
+    first = run_batch(addresses, "pymupdf", options)
+    assert (first.done, first.skipped) == (3, 0)
+    assert [addr for addr, _ in first.failures] == [str(docs / "missing.pdf")]
+    assert (docs / "out" / "a" / "output.md").exists()
+
+    # only the failure runs again, other options start over
+    second = run_batch(addresses, "pymupdf", options)
+    assert (second.done, second.skipped) == (1, 2)
+    third = run_batch(addresses, "pymupdf", {**options, "page_range": (1, 2)})
+    assert third.skipped == 0
+
+    lines = (docs / "out" / JOURNAL).read_text().splitlines()
+    assert len(lines) == 7 and json.loads(lines[0])["ok"]
+
+
+def test_cli_exit_code(docs: Path):
+    flags = ["--provider", "pymupdf", "--save-dir", str(docs / "out")]
+    main(["batch", str(docs / "a.pdf"), *flags, "--page-range", "1"])
+    with pytest.raises(SystemExit) as exit:
+        main(["batch", str(docs / "missing.pdf"), *flags])
+    assert exit.value.code == 1
@@ -0,0 +1,104 @@
+import pickle
+from pathlib import Path
+
+from docparser.cache import ParseCache, cache_key, file_sha256
+from docparser.types import CommonParseOutput, ParseOpt
+
+
+def _opt(**kwargs) -> ParseOpt:
+    return ParseOpt(
+        source="local",
+        address=["tests/1.pdf"],
+        input_format="pdf",
+        output_format=kwargs.pop("output_format", "markdown"),
+        save_dir="output",
+        **kwargs,
+    )
+
+
+def test_cache_key_depends_on_options():
+    data = file_sha256(Path("tests/1.pdf"))
+    key = cache_key(data, _opt(), "docling", "sp")
+    assert key == cache_key(data, _opt(), "docling", "sp")
+    assert key != cache_key(data, _opt(do_ocr=False), "docling", "sp")
+    assert key != cache_key(data, _opt(output_format="html"), "docling", "sp")
+    # a set of formats does not depend on the order it was given in
+    both = cache_key(data, _opt(output_format=["html", "markdown"]), "docling", "sp")
+    assert both == cache_key(
+        data, _opt(output_format={"markdown", "html"}), "docling", "sp"
+    )
+    assert both not in (
+        key,
+        cache_key(data, _opt(output_format="html"), "docling", "sp"),
+    )
+    assert key != cache_key(data, _opt(capbility=["text"]), "docling", "sp")
+    assert key != cache_key(data, _opt(page_range=(1, 5)), "docling", "sp")
+    assert key != cache_key(data, _opt(), "marker", "sp")
+    assert key != cache_key("0" * 64, _opt(), "docling", "sp")
+
+
+def test_cache_hit_miss_and_files(tmp_path: Path):
+    cache = ParseCache(tmp_path / "cache", max_bytes=1 << 20)
+    assert cache.load("missing") is None
+    out_dir = tmp_path / "out" / "doc"
+    out_dir.mkdir(parents=True)
+    (out_dir / "output.md").write_text("# hello")
+    cache.store("k", CommonParseOutput("markdown", out_dir / "output.md"), out_dir)
+    hit = cache.load("k", restore=tmp_path / "restored")
+    assert isinstance(hit, CommonParseOutput)
+    assert (tmp_path / "restored" / "output.md").read_text() == "# hello"
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    assert "docparser_cache_hits_total 1" in stats.to_prometheus()
+
+
+def test_cache_missing_files_is_a_miss(tmp_path: Path):
+    cache = ParseCache(tmp_path, max_bytes=1 << 20)
+    cache.store("k", "value")
+    assert cache.load("k", restore=tmp_path / "restored") is None
+    assert (cache.stats.hits, cache.stats.misses) == (0, 1)
+
+
+def test_cache_discards_unloadable_entries(tmp_path: Path):
+    cache = ParseCache(tmp_path, max_bytes=1 << 20)
+    cache.store("k", "value")
+    # a pickle referring to a class that no longer exists
+    blob = pickle.dumps(CommonParseOutput("markdown", Path("x")))
+    (tmp_path / "k" / "output.pkl").write_bytes(
+        blob.replace(b"CommonParseOutput", b"GoneParseOutputXX")
+    )
+    assert cache.load("k") is None
+    assert not (tmp_path / "k").exists()
+    assert cache.stats.entries == 0
+
+
+def test_cache_lru_eviction(tmp_path: Path):
+    cache = ParseCache(tmp_path, max_bytes=2500)
+    cache.store("a", b"a" * 1000)
+    cache.store("b", b"b" * 1000)
+    assert cache.load("a") is not None
+    cache.store("c", b"c" * 1000)
+    assert cache.load("b") is None
+    assert cache.load("a") is not None
+    assert cache.load("c") is not None
+    assert cache.stats.evictions == 1
+
+
+def test_cache_state_is_shared_between_instances(tmp_path: Path):
+    first = ParseCache(tmp_path, max_bytes=2500)
+    second = ParseCache(tmp_path, max_bytes=2500)
+    first.store("a", b"a" * 1000)
+    second.store("b", b"b" * 1000)
+    assert second.load("a") is not None
+    first.store("c", b"c" * 1000)
+    assert first.stats == second.stats
+    assert (first.stats.hits, first.stats.entries, first.stats.evictions) == (1, 2, 1)
+    assert not (tmp_path / "b").exists()
+
+
+def test_cache_reopen_applies_new_bound(tmp_path: Path):
+    cache = ParseCache.open(tmp_path, max_bytes=1 << 20)
+    cache.store("a", b"a" * 1000)
+    cache.store("b", b"b" * 1000)
+    assert ParseCache.open(tmp_path, max_bytes=1500) is cache
+    assert cache.stats.entries == 1
@@ -0,0 +1,61 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from docparser.types import (
+    ImageElement,
+    Metadata,
+    ParseOutput,
+    TableElement,
+    TextElement,
+)
+
+
+def _output() -> ParseOutput:
+    return ParseOutput(
+        name="doc",
+        text=[
+            TextElement(page_no=1, content="héllo"),
+            TextElement(page_no=2, content=""),
+            TextElement(page_no=2, content="wörld"),
+        ],
+        table=[TableElement(Metadata(2, (1.0, 2.0, 3.0, 4.0)), markdown="|a|")],
+        figure=[
+            ImageElement(Metadata(3, (0.0, 0.0, 5.0, 5.0)), Image.new("L", (1, 1)))
+        ],
+        page=[],
+    )
+
+
+def test_elements_are_slotted_and_picklable():
+    el = TextElement(page_no=1, content="x")
+    assert not hasattr(el, "__dict__")
+    assert pickle.loads(pickle.dumps(el)) == el
+
+
+def test_columns():
+    cols = _output().columns()
+    assert cols.text_page.tolist() == [1, 2, 2]
+    assert [cols.text(i) for i in range(3)] == ["héllo", "", "wörld"]
+    assert cols.texts_on(2) == ["", "wörld"]
+    assert cols.table_bbox.shape == (1, 4) and cols.table(0) == "|a|"
+    assert cols.figure_page.tolist() == [3]
+    empty = ParseOutput.failed("x", "e").columns()
+    assert empty.text_offsets.tolist() == [0] and empty.table_bbox.shape == (0, 4)
+
+
+def test_arrow_export_shares_buffers(tmp_path: Path):
+    pytest.importorskip("pyarrow")
+    cols = _output().columns()
+    tables = cols.to_arrow()
+    assert tables["text"].column("content").to_pylist() == ["héllo", "", "wörld"]
+    pages = tables["text"].column("page_no").chunk(0).to_numpy()
+    assert np.shares_memory(pages, cols.text_page)
+    assert [p.name for p in cols.write_parquet(tmp_path)] == [
+        "text.parquet",
+        "table.parquet",
+        "figure.parquet",
+    ]
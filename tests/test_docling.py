@@ -124,6 +124,48 @@ def test_parse_local_json():
         break
 
 
+def test_parse_local_stream_pages():
+    opt = ParseOpt(
+        source="local",
+        address=["tests/1.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        do_ocr=False,
+        save_dir="output",
+        page_window=1,
+    )
+    parser = docling.Parser(opt)
+    expected = 1
+    for chunk in parser.run_sp():
+        assert chunk.ok and chunk.page_range == (expected, expected)
+        assert all(text.page_no == expected for text in chunk.text)
+        assert len(chunk.page) <= 1
+        expected += 1
+    assert expected > 1
+
+
+def test_parse_local_text_only_page_range():
+    opt = ParseOpt(
+        source="local",
+        address=["tests/1.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        do_ocr=False,
+        save_dir="output",
+        capbility=["text"],
+        page_range=(2, 3),
+    )
+    parser = docling.Parser(opt)
+    pipe_opt = parser._opt_process(opt)
+    assert not pipe_opt.do_table_structure
+    assert not pipe_opt.generate_page_images
+    assert not pipe_opt.generate_picture_images
+    for result in parser.run_sp():
+        assert result.ok and result.text
+        assert {text.page_no for text in result.text} <= {2, 3}
+        assert not result.page and not result.figure and not result.table
+
+
 if __name__ == "__main__":
     test_parse_local_markdown_with_docling()
     # test_parse_local_markdown_with_marker()
@@ -0,0 +1,110 @@
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from docparser.download import DownloadError, Downloader, url_file_name
+
+PDF = Path("tests/1.pdf").read_bytes()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    calls: dict[str, int] = {}
+    ranges: list[str] = []
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        calls = self.calls[self.path] = self.calls.get(self.path, 0) + 1
+        match self.path:
+            case "/flaky.pdf" if calls == 1:
+                # announce the whole file, send half of it, drop the connection
+                self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(len(PDF)))
+                self.end_headers()
+                self.wfile.write(PDF[: len(PDF) // 2])
+                self.close_connection = True
+            case "/busy.pdf" if calls == 1:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            case "/named":
+                self._send(PDF, {"Content-Disposition": 'attachment; filename="r.pdf"'})
+            case "/missing.pdf":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            case _:
+                self._send(PDF)
+
+    def _send(self, body: bytes, headers: dict[str, str] | None = None) -> None:
+        status, start = 200, 0
+        if rng := self.headers.get("Range"):
+            self.ranges.append(rng)
+            start = int(rng.removeprefix("bytes=").split("-")[0])
+            status = 206
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if status == 206:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+            )
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+
+@pytest.fixture
+def server() -> Generator[str, None, None]:
+    _Handler.calls = {}
+    _Handler.ranges = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_fetch_streams_to_temp_file(server: str):
+    with Downloader().fetch(f"{server}/doc.pdf") as download:
+        assert download.name == "doc.pdf"
+        assert download.path.read_bytes() == PDF
+        assert download.size == len(PDF)
+    assert not download.path.exists()
+
+
+def test_fetch_uses_content_disposition(server: str):
+    with Downloader().fetch(f"{server}/named") as download:
+        assert download.name == "r.pdf"
+
+
+def test_fetch_resumes_with_range(server: str):
+    with Downloader(backoff=0).fetch(f"{server}/flaky.pdf") as download:
+        assert download.path.read_bytes() == PDF
+    assert _Handler.calls["/flaky.pdf"] == 2
+    # everything up to the last full chunk before the drop is kept
+    (resumed,) = _Handler.ranges
+    assert 0 < int(resumed.removeprefix("bytes=").rstrip("-")) <= len(PDF) // 2
+
+
+def test_fetch_retries_busy_server(server: str):
+    with Downloader(backoff=0).fetch(f"{server}/busy.pdf") as download:
+        assert download.size == len(PDF)
+
+
+def test_fetch_rejects_oversized_and_missing(server: str):
+    downloader = Downloader(max_bytes=len(PDF) - 1, backoff=0)
+    with pytest.raises(DownloadError):
+        downloader.fetch(f"{server}/doc.pdf")
+    with pytest.raises(Exception):
+        Downloader().fetch(f"{server}/missing.pdf")
+
+
+def test_url_file_name():
+    assert url_file_name("https://arxiv.org/pdf/2501.17887") == "2501.17887.pdf"
+    assert url_file_name("https://x/a.pdf", 'inline; filename="../b.pdf"') == "b.pdf"
@@ -0,0 +1,118 @@
+import pickle
+from pathlib import Path
+
+from PIL import Image
+
+from docparser.images import ImageSink, Interner
+from docparser.types import ImageElement, Metadata, ParseOutput, SavePath
+
+
+def _image(color: int, size: tuple[int, int] = (144, 72), mode: str = "RGB"):
+    return Image.new(mode, size, (color,) * len(mode))
+
+
+def test_save_all_dedups_identical_images(tmp_path: Path):
+    images = [(_image(10), tmp_path / "a"), (_image(20), tmp_path / "b")]
+    images.append((_image(10), tmp_path / "c"))
+    saved = ImageSink(format="webp").save_all(images)
+    assert saved == [tmp_path / "a.webp", tmp_path / "b.webp", tmp_path / "a.webp"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.webp", "b.webp"]
+
+
+def test_save_all_downscales_and_converts(tmp_path: Path):
+    [path] = ImageSink(format="jpeg", dpi=36, dedup=False).save_all(
+        [(_image(10, mode="RGBA"), tmp_path / "page")]
+    )
+    assert path == tmp_path / "page.jpg"
+    with Image.open(path) as img:
+        assert img.format == "JPEG" and img.size == (72, 36)
+
+
+def test_parse_output_keeps_png_names(tmp_path: Path):
+    meta = Metadata(page_no=1, bbox=(0, 0, 1, 1))
+    out = ParseOutput(
+        name="doc",
+        text=[],
+        table=[],
+        figure=[ImageElement(metadata=meta, image=_image(1))],
+        page=[_image(2), _image(3)],
+        save_path=SavePath.default(root=tmp_path),
+    )
+    _ = out.save_page().save_figure()
+    assert out.save_path is not None
+    assert out.save_path.page == [tmp_path / "doc-0.png", tmp_path / "doc-1.png"]
+    assert out.save_path.figure == [tmp_path / "doc-figure-0.png"]
+    assert all(p.exists() for p in out.save_path.page + out.save_path.figure)
+
+
+def test_figure_is_cropped_on_first_access_only():
+    meta = Metadata(page_no=1, bbox=(0, 0, 1, 1))
+    calls: list[int] = []
+
+    def load() -> Image.Image:
+        calls.append(1)
+        return _image(5)
+
+    fig = ImageElement(meta, load=load)
+    moved = fig.moved(Metadata(page_no=3, bbox=meta.bbox))
+    fig.close()
+    assert calls == [] and not moved.loaded
+    assert moved.image.size == (144, 72) and moved.image is moved.image
+    assert calls == [1]
+    # pickling (the cache, worker processes) carries the crop, not the loader
+    restored = pickle.loads(pickle.dumps(ImageElement(meta, load=load)))
+    assert restored.loaded and restored == ImageElement(meta, _image(5))
+
+
+def _gradient(size: tuple[int, int]) -> Image.Image:
+    return Image.linear_gradient("L").resize(size).convert("RGB")
+
+
+def test_store_writes_each_image_once(tmp_path: Path):
+    sink = ImageSink(store=tmp_path / "store")
+    first = sink.save_all([(_image(10), tmp_path / "a"), (_image(20), tmp_path / "b")])
+    second = sink.save_all([(_image(10), tmp_path / "other" / "c")])
+    assert second == first[:1] and first[0] != first[1]
+    assert all(p.parent.parent == tmp_path / "store" for p in first)
+    assert sorted(p.name for p in (tmp_path / "store").rglob("*.png")) == sorted(
+        p.name for p in first
+    )
+    # other encoding settings never share a blob
+    [jpeg] = ImageSink(format="jpeg", store=tmp_path / "store").save_all(
+        [(_image(10), tmp_path / "a")]
+    )
+    assert jpeg.suffix == ".jpg" and jpeg.stem != first[0].stem
+
+
+def test_perceptual_store_matches_rescaled_copy(tmp_path: Path):
+    images = [
+        (_gradient((256, 256)), tmp_path / "a"),
+        (_gradient((128, 128)), tmp_path / "b"),
+    ]
+    exact = ImageSink(store=tmp_path / "exact").save_all(images)
+    perceptual = ImageSink(store=tmp_path / "p", hashing="perceptual").save_all(images)
+    assert exact[0] != exact[1] and perceptual[0] == perceptual[1]
+
+
+def test_interner_shares_identical_images():
+    interner = Interner()
+    a, b, c = _image(10), _image(10), _image(20)
+    assert interner.intern(a) is a and interner.intern(b) is a
+    assert interner.intern(c) is c
+
+
+def test_parse_output_points_at_store(tmp_path: Path):
+    meta = Metadata(page_no=1, bbox=(0, 0, 1, 1))
+    out = ParseOutput(
+        name="doc",
+        text=[],
+        table=[],
+        figure=[ImageElement(metadata=meta, image=_image(1))] * 2,
+        page=[],
+        save_path=SavePath.default(root=tmp_path / "out"),
+    )
+    _ = out.save_figure(ImageSink(store=tmp_path / "store"))
+    assert out.save_path is not None
+    [blob, again] = out.save_path.figure
+    assert blob == again and blob.is_relative_to(tmp_path / "store")
+    assert not (tmp_path / "out").exists() or not any((tmp_path / "out").iterdir())
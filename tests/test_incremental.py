@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pymupdf
+import pytest
+
+from docparser import pymupdf as fast
+from docparser.source import PdfInput
+from docparser.types import ParseOpt
+
+
+def _version(path: Path, edit: int | None = None) -> Path:
+    doc = pymupdf.open("tests/1.pdf")
+    doc.select([0, 1, 2, 3])
+    if edit is not None:
+        _ = doc[edit - 1].insert_text((72, 72), "revised")
+    doc.save(path)
+    return path
+
+
+def _opt(path: Path, tmp_path: Path, **kwargs) -> ParseOpt:
+    return ParseOpt(
+        source="local",
+        address=[str(path)],
+        input_format="pdf",
+        output_format="markdown",
+        save_dir=str(tmp_path / "out"),
+        capbility=["text"],
+        cache_dir=str(tmp_path / "cache"),
+        incremental=True,
+        **kwargs,
+    )
+
+
+def test_page_digests_follow_content(tmp_path: Path):
+    with PdfInput(_version(tmp_path / "v1.pdf")) as v1:
+        with PdfInput(_version(tmp_path / "v2.pdf", edit=2)) as v2:
+            same = [a == b for a, b in zip(v1.page_digests, v2.page_digests)]
+    assert same == [True, False, True, True]
+
+
+def test_only_changed_pages_are_parsed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    parsed: list[tuple[int, int]] = list()
+    parse_pages = fast.Parser.parse_pages
+
+    def counting(self: fast.Parser, src: PdfInput, page_range: tuple[int, int]):
+        parsed.append(page_range)
+        return parse_pages(self, src, page_range)
+
+    monkeypatch.setattr(fast.Parser, "parse_pages", counting)
+    v1 = _version(tmp_path / "v1.pdf")
+    [first] = list(fast.Parser(_opt(v1, tmp_path)).run_sp())
+    assert parsed == [(1, 1), (2, 2), (3, 3), (4, 4)]
+
+    parsed.clear()
+    v2 = _version(tmp_path / "v2.pdf", edit=2)
+    [second] = list(fast.Parser(_opt(v2, tmp_path)).run_sp())
+    assert parsed == [(2, 2)]
+    assert second.ok and "revised" in (second.markdown or "")
+    assert {el.page_no for el in second.text} == {1, 2, 3, 4}
+    unchanged = [el for el in second.text if el.page_no != 2]
+    assert unchanged == [el for el in first.text if el.page_no != 2]
+
+    # pages moved by an inserted page are reused under their new numbers
+    parsed.clear()
+    doc = pymupdf.open(v1)
+    _ = doc.new_page(0).insert_text((72, 72), "cover")
+    doc.save(tmp_path / "v3.pdf")
+    [moved] = list(fast.Parser(_opt(tmp_path / "v3.pdf", tmp_path)).run_sp())
+    assert parsed == [(1, 1)]
+    assert [el.page_no - 1 for el in moved.text if el.page_no > 1] == [
+        el.page_no for el in first.text
+    ]
+
+    # a page range only looks at the pages it covers
+    parsed.clear()
+    [third] = list(fast.Parser(_opt(v2, tmp_path, page_range=(3, 4))).run_sp())
+    assert parsed == [] and {el.page_no for el in third.text} == {3, 4}
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+import pytest
+
+from docparser.parser import load_parser
+
+
+@pytest.mark.parametrize("provider", ["docling", "marker"])
+def test_import_provider_is_lazy(provider: str):
+    heavy = ("docling", "marker", "torch", "pandas")
+    code = (
+        f"import sys, docparser.types, docparser.parser, docparser.{provider}\n"
+        f"print(','.join(m for m in sys.modules if m.startswith({heavy!r})))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == ""
+
+
+def test_load_parser_rejects_unknown_provider():
+    with pytest.raises(ValueError):
+        load_parser("nope")
@@ -0,0 +1,88 @@
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+from docparser import metrics, pymupdf
+from docparser.metrics import Histogram, registry
+from docparser.types import ParseOpt
+from docparser.utils import get_time_sync
+
+
+@pytest.fixture
+def enabled() -> Generator[None, None, None]:
+    registry.reset()
+    metrics.enable()
+    yield
+    metrics.enable(False)
+    registry.reset()
+
+
+def test_disabled_records_nothing():
+    registry.reset()
+    with metrics.span("fetch", provider="x"):
+        metrics.inc("docparser_documents_total")
+    assert registry.to_prometheus() == ""
+    assert registry.export_spans() == []
+
+
+def test_span_histogram_and_prometheus(enabled: None):
+    with metrics.span("export", provider="pymupdf", format="markdown"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("export", provider="pymupdf", format="markdown"):
+            raise ValueError
+    text = registry.to_prometheus()
+    assert "# TYPE docparser_stage_seconds histogram" in text
+    labels = 'format="markdown",provider="pymupdf",stage="export"'
+    assert f'docparser_stage_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"docparser_stage_seconds_count{{{labels}}} 2" in text
+    assert 'docparser_stage_errors_total{stage="export"} 1' in text
+    spans = registry.export_spans()
+    assert [s["name"] for s in spans] == ["export", "export"]
+    assert spans[1]["attributes"]["error"] == "ValueError"
+
+
+def test_histogram_quantile():
+    hist = Histogram()
+    for value in (0.2, 0.2, 0.2, 3.0):
+        hist.observe(value)
+    assert 0.1 < hist.quantile(0.5) <= 0.25
+    assert 2.5 < hist.quantile(1.0) <= 5.0
+
+
+def test_pymupdf_stages(enabled: None, tmp_path: Path):
+    opt = ParseOpt(
+        source="local",
+        address=["tests/1.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        save_dir=str(tmp_path),
+        page_range=(5, 5),
+    )
+    [out] = list(pymupdf.Parser(opt).run_sp())
+    assert out.ok
+    stages = {dict(key)["stage"] for _, key in registry.histograms}
+    assert {"convert", "table_structure", "export", "first_call"} <= stages
+    assert 'docparser_documents_total{provider="pymupdf",status="ok"} 1' in (
+        registry.to_prometheus()
+    )
+
+
+def test_get_time_sync_times_the_whole_generator():
+    messages: list[str] = list()
+    sink = logger.add(messages.append, level="DEBUG", format="{level} {message}")
+
+    @get_time_sync
+    def run(n: int) -> Generator[int, None, None]:
+        return (i for i in range(n))
+
+    try:
+        gen = run(3)
+        assert messages == []
+        assert list(gen) == [0, 1, 2]
+    finally:
+        logger.remove(sink)
+    [message] = messages
+    assert message.startswith("DEBUG ") and "run" in message and "args" not in message
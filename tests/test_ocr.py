@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import pytest
+
+from docparser.docling import TextLayer
+from docparser.types import ParseOutput
+
+
+def _box(*coords: float) -> object:
+    base = pytest.importorskip("docling_core.types.doc.base")
+    return base.BoundingBox.from_tuple(coords, origin=base.CoordOrigin.TOPLEFT)
+
+
+def _page(*cells: tuple[str, object]) -> object:
+    return SimpleNamespace(
+        size=SimpleNamespace(width=600, height=800),
+        cells=[
+            SimpleNamespace(
+                text=text,
+                from_ocr=False,
+                rect=SimpleNamespace(to_bounding_box=lambda box=box: box),
+            )
+            for text, box in cells
+        ],
+    )
+
+
+def test_text_layer_skips_covered_bitmaps():
+    figure, logo = _box(50, 400, 550, 700), _box(10, 10, 60, 60)
+    full = _box(0, 0, 600, 800)
+    rule = TextLayer(min_chars=16)
+    # no text layer to speak of: docling's regions stand
+    assert rule.ocr_rects(_page(("p. 3", _box(290, 780, 310, 790))), [full]) == [full]
+    # a born digital page keeps only the bitmaps without text over them
+    page = _page(
+        ("a paragraph of real text", _box(50, 100, 550, 120)),
+        ("a caption drawn on the figure", _box(60, 650, 500, 670)),
+    )
+    assert rule.ocr_rects(page, [figure, logo]) == [logo]
+    # a scan with an invisible text layer is read from that layer
+    assert rule.ocr_rects(page, [full]) == []
+
+
+def test_ocr_report_follows_the_pages():
+    parts = [
+        ParseOutput(
+            name="a", text=[], table=[], figure=[], page=[], ocr={pno: pno == 2}
+        )
+        for pno in (1, 2)
+    ]
+    assert ParseOutput.splice("a", parts, ["markdown"]).ocr == {1: False, 2: True}
+    assert parts[1].moved_to(5).ocr == {5: True}
@@ -0,0 +1,66 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from docparser.pool import run_pool
+from docparser.types import ParseOpt
+
+
+def _square(x: int) -> int:
+    if x == 3:
+        raise ValueError("boom")
+    return x * x
+
+
+def test_run_pool_ordered():
+    results = list(run_pool(_square, [1, 2, 3, 4], workers=2))
+    assert [item for item, _ in results] == [1, 2, 3, 4]
+    assert [res.unwrap() for _, res in results if res.is_ok()] == [1, 4, 16]
+    assert results[2][1].is_err()
+
+
+def test_run_pool_completion_order():
+    results = dict(run_pool(_square, [1, 2, 4], workers=2, ordered=False))
+    assert {item: res.unwrap() for item, res in results.items()} == {1: 1, 2: 4, 4: 16}
+
+
+def _pool_opt(tmp_path: Path, workers: int) -> ParseOpt:
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 not really a pdf")
+    return ParseOpt(
+        source="local",
+        address=["tests/1.pdf", str(broken)],
+        input_format="pdf",
+        output_format="markdown",
+        do_ocr=False,
+        save_dir=str(tmp_path / "output"),
+        workers=workers,
+    )
+
+
+def test_docling_pool_reports_failures_per_document(tmp_path: Path):
+    pytest.importorskip("docling")
+    from docparser import docling
+
+    opt = _pool_opt(tmp_path, workers=2)
+    parser = docling.Parser(opt)
+    assert parser._opt_process(opt).accelerator_options.num_threads == max(
+        1, (os.cpu_count() or 1) // 2
+    )
+    outputs = list(parser.run_sp())
+    assert [out.name for out in outputs] == ["1", "broken"]
+    assert outputs[0].ok and outputs[0].markdown
+    assert not outputs[1].ok and outputs[1].error
+
+    saved = list(parser.run())
+    assert saved[0].ok and saved[0].output_path.exists()
+    assert not saved[1].ok and saved[1].output_path.name == "broken"
+
+
+def test_docling_serial_reports_failures_per_document(tmp_path: Path):
+    pytest.importorskip("docling")
+    from docparser import docling
+
+    outputs = list(docling.Parser(_pool_opt(tmp_path, workers=1)).run_sp())
+    assert [out.ok for out in outputs] == [True, False]
@@ -0,0 +1,114 @@
+from pathlib import Path
+from typing import override
+
+import pymupdf
+import pytest
+
+from docparser import parser, pymupdf as fast
+from docparser.base_parser import BaseParser
+from docparser.source import PdfInput
+from docparser.types import ParseOpt, ParseOutput, TextElement
+
+
+class Parser(BaseParser):
+    provider = "ocr"
+
+    @override
+    def parse_pages(self, src: PdfInput, page_range: tuple[int, int]) -> ParseOutput:
+        first, last = page_range
+        text = [TextElement(page_no=n, content="ocr") for n in range(first, last + 1)]
+        return ParseOutput(
+            name=src.stem,
+            text=text,
+            table=[],
+            figure=[],
+            page=[],
+            markdown=f"ocr {first}-{last}",
+            ocr={n: True for n in range(first, last + 1)},
+        )
+
+
+def _opt(address: list[str], save_dir: Path, **kwargs) -> ParseOpt:
+    return ParseOpt(
+        source="local",
+        address=address,
+        input_format="pdf",
+        output_format=kwargs.pop("output_format", "markdown"),
+        save_dir=str(save_dir),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def scanned(tmp_path: Path) -> Path:
+    # pages 1 and 4 carry text, 2 and 3 are a full-page image and nothing else
+    pix = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 64, 64), False)
+    pix.clear_with(200)
+    doc = pymupdf.open()
+    for pno in range(1, 5):
+        page = doc.new_page()
+        if pno in (1, 4):
+            _ = page.insert_text((72, 72), f"born digital page {pno} " * 4)
+        else:
+            page.insert_image(page.rect, pixmap=pix)
+    path = tmp_path / "scanned.pdf"
+    doc.save(path)
+    return path
+
+
+def test_parse_local_markdown(tmp_path: Path):
+    opt = _opt(["tests/1.pdf"], tmp_path, capbility=["text"], page_range=(2, 3))
+    [out] = list(fast.Parser(opt).run_sp())
+    assert out.ok and out.markdown and out.text
+    assert {text.page_no for text in out.text} == {2, 3}
+    assert not out.page and not out.figure and not out.table
+
+
+def test_save_html(tmp_path: Path):
+    opt = _opt(["tests/1.pdf"], tmp_path, output_format="html", page_range=(1, 1))
+    [out] = list(fast.Parser(opt).run())
+    assert out.ok and out.output_path == tmp_path / "1" / "output.html"
+    assert out.output_path.read_text().startswith("<html>")
+
+
+def test_renders_every_format_from_one_parse(tmp_path: Path):
+    opt = _opt(
+        ["tests/1.pdf"], tmp_path, output_format={"html", "markdown"}, page_range=(1, 1)
+    )
+    assert opt.output_formats == ("markdown", "html")
+    [out] = list(fast.Parser(opt).run_sp())
+    assert out.ok and out.markdown and out.html and out.json is None
+    assert all(t.markdown and t.html for t in out.table)
+    [saved] = list(fast.Parser(opt).run())
+    assert saved.output_path == tmp_path / "1" / "output.md"
+    assert saved.output_paths == {
+        "markdown": tmp_path / "1" / "output.md",
+        "html": tmp_path / "1" / "output.html",
+    }
+    assert all(path.exists() for path in saved.output_paths.values())
+
+
+def test_escalates_scanned_pages(scanned: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setitem(parser.providers, "ocr", __name__)
+    opt = _opt([str(scanned)], tmp_path, capbility=["text", "page"], escalate="ocr")  # pyright: ignore[reportArgumentType]
+    [out] = list(fast.Parser(opt).run_sp())
+    assert out.ok
+    assert [(t.page_no, t.content) for t in out.text if t.content == "ocr"] == [
+        (2, "ocr"),
+        (3, "ocr"),
+    ]
+    assert [t.page_no for t in out.text] == sorted(t.page_no for t in out.text)
+    assert out.markdown and "ocr 2-3" in out.markdown
+    assert out.markdown.index("page 1") < out.markdown.index("ocr 2-3")
+    assert out.markdown.index("ocr 2-3") < out.markdown.index("page 4")
+    # page images of the escalated pages come from the escalation backend
+    assert len(out.page) == 2
+    assert out.ocr == {1: False, 2: True, 3: True, 4: False}
+
+
+def test_no_escalation_without_ocr(scanned: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setitem(parser.providers, "ocr", __name__)
+    opt = _opt([str(scanned)], tmp_path, do_ocr=False, escalate="ocr")  # pyright: ignore[reportArgumentType]
+    [out] = list(fast.Parser(opt).run_sp())
+    assert out.ok and all(t.content != "ocr" for t in out.text)
+    assert out.ocr == {}
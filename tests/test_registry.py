@@ -0,0 +1,117 @@
+import gc
+import threading
+from pathlib import Path
+from typing import override
+
+import pytest
+
+from docparser import parser
+from docparser.base_parser import BaseParser
+from docparser.registry import Registry, converters
+from docparser.source import PdfInput
+from docparser.types import ParseOpt, ParseOutput
+
+builds: list[str] = list()
+
+
+class Parser(BaseParser):
+    provider = "shared"
+
+    @override
+    def _warm(self) -> None:
+        _ = self._shared("model", lambda: builds.append("model") or object())
+
+    @override
+    def _produce_sp(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        raise NotImplementedError
+
+
+def test_builds_once_across_threads():
+    registry = Registry()
+    gate = threading.Barrier(8)
+    calls: list[int] = list()
+
+    def build() -> object:
+        calls.append(1)
+        return object()
+
+    def attach() -> None:
+        _ = gate.wait(10)
+        leases.append(registry.acquire("k", build))
+
+    leases: list[object] = list()
+    threads = [threading.Thread(target=attach) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and len({id(lease.value) for lease in leases}) == 1
+
+
+def test_evicts_idle_least_recently_used():
+    registry = Registry(max_idle=1)
+    closed: list[str] = list()
+    a = registry.acquire("a", lambda: "a", closed.append)
+    b = registry.acquire("b", lambda: "b", closed.append)
+    c = registry.acquire("c", lambda: "c", closed.append)
+    # held entries are never evicted
+    assert registry.profiles() == ["a", "b", "c"] and not closed
+    a.release()
+    b.release()
+    assert closed == ["a"] and registry.profiles() == ["b", "c"]
+    a.release()
+    assert closed == ["a"]
+    c.release()
+    assert closed == ["a", "b"] and registry.profiles() == ["c"]
+    registry.clear()
+    assert closed == ["a", "b", "c"] and registry.profiles() == []
+
+
+def test_evicts_over_max_bytes(monkeypatch):
+    sizes = iter([0, 100, 100, 250])
+    monkeypatch.setattr("docparser.registry._rss", lambda: next(sizes))
+    registry = Registry(max_idle=8, max_bytes=200)
+    registry.acquire("a", lambda: "a").release()
+    b = registry.acquire("b", lambda: "b")
+    # 100 + 150 bytes, only the idle one can go
+    assert registry.profiles() == ["b"]
+    b.release()
+    assert registry.profiles() == ["b"]
+
+
+def test_failed_build_leaves_nothing():
+    registry = Registry()
+
+    def fail() -> object:
+        raise RuntimeError("no weights")
+
+    with pytest.raises(RuntimeError):
+        _ = registry.acquire("k", fail)
+    assert registry.profiles() == [] and not registry._entries
+    assert registry.acquire("k", lambda: 1).value == 1
+
+
+def test_lease_released_when_collected():
+    registry = Registry(max_idle=0)
+    closed: list[int] = list()
+    lease = registry.acquire("k", lambda: 1, closed.append)
+    del lease
+    _ = gc.collect()
+    assert closed == [1] and registry.profiles() == []
+
+
+def test_new_parser_attaches_to_warm_model(monkeypatch, tmp_path: Path):
+    monkeypatch.setitem(parser.providers, "shared", __name__)
+    builds.clear()
+    opt = ParseOpt("local", ["tests/1.pdf"], "pdf", "markdown", str(tmp_path))
+    first = parser.load_parser("shared")(opt, validate=False).warm()
+    second = parser.load_parser("shared")(opt, validate=False).warm()
+    assert builds == ["model"] and converters.profiles() == ["shared:model"]
+    first.close()
+    second.close()
+    # idle now but still warm for the next parser
+    third = parser.load_parser("shared")(opt, validate=False).warm()
+    assert builds == ["model"]
+    third.close()
+    converters.clear()
+    assert "shared:model" not in converters.profiles()
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+from docparser import router
+from docparser.router import (
+    Cheapest,
+    LeastLoaded,
+    LiveStats,
+    RoundRobin,
+    Router,
+    Signals,
+)
+from docparser.source import PdfInput
+from docparser.types import ParseOpt, ParseReq
+
+DIGITAL = Signals(pages=10, size=1 << 20, text_layer=1.0, image_density=0.1)
+SCANNED = Signals(pages=10, size=1 << 20, text_layer=0.0, image_density=0.9)
+
+
+def _opt(**kwargs) -> ParseOpt:
+    return ParseOpt(
+        source="local",
+        address=["tests/1.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        save_dir="output",
+        **kwargs,
+    )
+
+
+def test_sniff():
+    with PdfInput(Path("tests/1.pdf")) as src:
+        signals = Signals.sniff(src)
+    assert signals.pages == 8
+    assert signals.text_layer == 1.0
+    assert signals.size == Path("tests/1.pdf").stat().st_size
+
+
+def test_candidates_meet_quality():
+    r = Router(providers=["pymupdf", "docling", "marker"])
+    assert r.candidates(DIGITAL, _opt(), "sp") == ["pymupdf", "docling"]
+    assert r.candidates(SCANNED, _opt(), "common") == ["docling", "marker"]
+    assert r.candidates(SCANNED, _opt(escalate="docling"), "sp") == [
+        "pymupdf",
+        "docling",
+    ]
+    assert r.candidates(DIGITAL, _opt(use_llm=True), "common") == ["marker"]
+
+
+def test_cheapest_follows_live_stats():
+    stats = LiveStats(alpha=1.0)
+    assert Cheapest().choose(DIGITAL, ["docling", "pymupdf"], stats)[0] == "pymupdf"
+    with stats.track("pymupdf", pages=1):
+        pass
+    # pymupdf was observed slower than docling's prior
+    stats._stats["pymupdf"].spp = 5.0
+    assert Cheapest().choose(DIGITAL, ["docling", "pymupdf"], stats)[0] == "docling"
+
+
+def test_least_loaded_and_round_robin():
+    stats = LiveStats()
+    with stats.track("pymupdf", pages=1):
+        assert LeastLoaded().choose(DIGITAL, ["pymupdf", "docling"], stats)[0] == (
+            "docling"
+        )
+    rr = RoundRobin()
+    picks = [rr.choose(DIGITAL, ["a", "b"], stats)[0] for _ in range(4)]
+    assert picks == ["a", "b", "a", "b"]
+
+
+def test_random_request_is_routed():
+    req = ParseReq(_opt(), provider="random")
+    assert req.provider == "auto" and req.option.route_policy == "round-robin"
+
+
+def test_auto_parser_records_stats(tmp_path: Path):
+    stats = LiveStats()
+    opt = ParseOpt(
+        source="local",
+        address=["tests/1.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        save_dir=str(tmp_path),
+        capbility=["text"],
+    )
+    auto = router.Parser(opt, router=Router(providers=["pymupdf"], stats=stats))
+    [out] = list(auto.run_sp())
+    assert out.ok and out.text
+    done = stats.get("pymupdf")
+    assert (done.done, done.pages, done.inflight) == (1, 8, 0)
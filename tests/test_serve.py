@@ -0,0 +1,111 @@
+import json
+import threading
+from collections.abc import Generator
+from pathlib import Path
+from typing import override
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from docparser import metrics, parser
+from docparser.base_parser import BaseParser
+from docparser.registry import converters
+from docparser.serve import Daemon, Job, make_server
+from docparser.source import PdfInput
+from docparser.types import ParseOutput, TextElement
+
+release = threading.Event()
+started = threading.Event()
+
+
+class Parser(BaseParser):
+    provider = "blocking"
+
+    @override
+    def _produce_sp(self, src: PdfInput) -> tuple[ParseOutput, bool]:
+        _ = self._shared("model", object)
+        started.set()
+        _ = release.wait(10)
+        text = [TextElement(page_no=1, content=str(src.page_count))]
+        out = ParseOutput(name=src.stem, text=text, table=[], figure=[], page=[])
+        return (out, True)
+
+
+@pytest.fixture
+def daemon(monkeypatch, tmp_path: Path) -> Generator[tuple[Daemon, str], None, None]:
+    monkeypatch.setitem(parser.providers, "blocking", __name__)
+    metrics.registry.reset()
+    release.clear()
+    started.clear()
+    d = Daemon(provider="blocking", save_dir=str(tmp_path), queue_size=1)
+    server = make_server(d, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield d, f"http://127.0.0.1:{server.server_address[1]}"
+    release.set()
+    server.shutdown()
+    d.close()
+    converters.clear()
+    metrics.enable(False)
+
+
+def _post(url: str, body: dict[str, object]) -> dict[str, object]:
+    req = Request(f"{url}/jobs", data=json.dumps(body).encode(), method="POST")
+    with urlopen(req, timeout=10) as resp:
+        return json.load(resp)
+
+
+def test_job_from_json():
+    a = Job.from_json({"address": "a.pdf"}, "pymupdf", "out")
+    b = Job.from_json({"address": "b.pdf"}, "pymupdf", "out")
+    c = Job.from_json(
+        {"address": "a.pdf", "options": {"do_ocr": False}}, "pymupdf", "out"
+    )
+    d = Job.from_json(
+        {"address": "a.pdf", "options": {"page_range": [2, 3]}}, "pymupdf", "out"
+    )
+    assert a.opt.address == ["a.pdf"] and b.opt.address == ["b.pdf"]
+    assert d.opt.page_range == (2, 3)
+    assert a.opt.source == "local" and not c.opt.do_ocr
+    url = Job.from_json({"address": "https://x/a.pdf"}, "pymupdf", "out")
+    assert url.opt.source == "url"
+    for body in (
+        {},
+        {"address": "a.pdf", "provider": "nope"},
+        {"address": "a.pdf", "options": {"bogus": 1}},
+    ):
+        with pytest.raises(ValueError):
+            _ = Job.from_json(body, "pymupdf", "out")
+
+
+def test_serve_queues_and_rejects(daemon: tuple[Daemon, str]):
+    d, url = daemon
+    results: list[dict[str, object]] = list()
+    # one job runs, one waits in the queue, the next is turned away
+    clients = [
+        threading.Thread(
+            target=lambda: results.append(_post(url, {"address": "tests/1.pdf"}))
+        )
+        for _ in range(2)
+    ]
+    clients[0].start()
+    assert started.wait(10)
+    clients[1].start()
+    while d.jobs.qsize() < 1:
+        threading.Event().wait(0.01)
+    with pytest.raises(HTTPError) as err:
+        _ = _post(url, {"address": "tests/1.pdf"})
+    assert err.value.code == 503 and err.value.headers["Retry-After"] == "1"
+    release.set()
+    for client in clients:
+        client.join()
+    assert [r["text"] for r in results] == [[{"page_no": 1, "content": "8"}]] * 2
+    # both jobs attached to the one warm model
+    assert d.profiles == ["blocking:model"]
+
+    with urlopen(f"{url}/metrics", timeout=10) as resp:
+        text = resp.read().decode()
+    assert 'docparser_jobs_rejected_total{provider="blocking"} 1' in text
+    assert 'docparser_job_seconds_count{mode="sp",provider="blocking"} 2' in text
+    assert "# TYPE docparser_queue_depth gauge" in text
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from docparser import pymupdf as fast
+from docparser.shard import shards
+from docparser.types import ParseOpt
+
+
+def _opt(save_dir: Path, **kwargs) -> ParseOpt:
+    return ParseOpt(
+        "local", ["tests/1.pdf"], "pdf", "markdown", str(save_dir), **kwargs
+    )
+
+
+def test_shards_cover_the_page_range(tmp_path: Path):
+    assert shards(_opt(tmp_path, shard_pages=3, workers=2), 8) == [
+        (1, 3),
+        (4, 6),
+        (7, 8),
+    ]
+    assert shards(_opt(tmp_path, shard_pages=2, workers=2, page_range=(3, 9)), 8) == [
+        (3, 4),
+        (5, 6),
+        (7, 8),
+    ]
+    # short documents, or a single worker, are not split
+    assert shards(_opt(tmp_path, shard_pages=8, workers=2), 8) == []
+    assert shards(_opt(tmp_path, shard_pages=2), 8) == []
+
+
+def test_sharded_parse_matches_one_pass(tmp_path: Path):
+    kwargs = {"capbility": ["text"], "page_range": (1, 4)}
+    [whole] = list(fast.Parser(_opt(tmp_path, **kwargs)).run_sp())
+    opt = _opt(tmp_path, shard_pages=2, workers=2, **kwargs)
+    [sharded] = list(fast.Parser(opt).run_sp())
+    assert sharded.ok and sharded.markdown
+    # page numbers and reading order survive the shard boundaries
+    assert [(t.page_no, t.content) for t in sharded.text] == [
+        (t.page_no, t.content) for t in whole.text
+    ]
+    [saved] = list(fast.Parser(opt).run())
+    assert saved.ok and saved.output_path == tmp_path / "1" / "output.md"
+    assert saved.output_path.read_text() == sharded.markdown
@@ -0,0 +1,26 @@
+from pathlib import Path
+
+import pytest
+
+from docparser.cache import file_sha256
+from docparser.source import PdfInput
+
+
+def test_mapping_hashes_and_counts_pages():
+    path = Path("tests/1.pdf")
+    with PdfInput(path) as src:
+        assert src.size == path.stat().st_size
+        assert src.sha256 == file_sha256(path)
+        assert src.page_count == 8
+        with src.document() as doc:
+            assert doc[0].get_text()
+    # the view is released with the mapping
+    with pytest.raises(ValueError):
+        _ = src.view[0]
+
+
+def test_empty_file_is_rejected(tmp_path: Path):
+    empty = tmp_path / "empty.pdf"
+    empty.touch()
+    with pytest.raises(ValueError):
+        _ = PdfInput(empty)
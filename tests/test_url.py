@@ -1,5 +1,8 @@
 import pytest
-from docparser.utils import is_valid_url
+
+from docparser.download import DownloadError, default_downloader, reachability
+from docparser.types import ParseOpt
+from docparser.utils import is_valid_url, is_valid_url_syntax
 
 
 # 测试有效的 URL
@@ -34,3 +37,53 @@ def test_valid_url(url: list[str]):
 )
 def test_invalid_url(url: list[str]):
     assert is_valid_url(url) is False
+
+
+@pytest.mark.parametrize(
+    ("url", "expected"),
+    [
+        (["https://www.example.com", "http://example.com/a.pdf"], True),
+        (["htp://invalid-url"], False),
+        (["www.example.com"], False),
+        (["https://"], False),
+        (["ftp:/example.com"], False),
+    ],
+)
+def test_url_syntax(url: list[str], expected: bool):
+    assert is_valid_url_syntax(url) is expected
+
+
+def test_url_check_defaults_to_syntax(monkeypatch: pytest.MonkeyPatch):
+    def probe(_: list[str]) -> bool:
+        raise AssertionError("no pre-flight request expected")
+
+    monkeypatch.setattr("docparser.types.is_valid_url", probe)
+    opt = ParseOpt(
+        source="url",
+        address=["https://example.com/a.pdf"],
+        input_format="pdf",
+        output_format="markdown",
+        save_dir="output",
+    )
+    assert opt.ok
+
+
+def test_unreachable_host_is_remembered():
+    # nothing listens on port 9 of the loopback address
+    dead = ["http://127.0.0.1:9/a.pdf", "http://127.0.0.1:9/b.pdf"]
+    assert is_valid_url(dead[:1]) is False
+    assert reachability.get(dead[1]) is False
+    with pytest.raises(DownloadError):
+        default_downloader().fetch(dead[1])
+
+
+def test_invalid_page_range():
+    with pytest.raises(ValueError):
+        _ = ParseOpt(
+            source="local",
+            address=["tests/1.pdf"],
+            input_format="pdf",
+            output_format="markdown",
+            save_dir="output",
+            page_range=(3, 2),
+        )
@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+
+from docparser import pymupdf as fast
+from docparser.source import PdfInput
+from docparser.types import ParseOpt, ParseOutput, TextElement
+from docparser.writers import StreamWriter
+
+
+def _opt(save_dir: Path, **kwargs) -> ParseOpt:
+    return ParseOpt(
+        "local",
+        ["tests/1.pdf"],
+        "pdf",
+        kwargs.pop("output_format", "markdown"),
+        str(save_dir),
+        **kwargs,
+    )
+
+
+def _part(first: int, last: int) -> ParseOutput:
+    return ParseOutput(
+        name="doc",
+        text=[TextElement(page_no=first, content="x")],
+        table=[],
+        figure=[],
+        page=[],
+        markdown=f"pages {first}-{last}",
+        json={"first": first},
+        html=f"<html><body><p>{first}</p></body></html>",
+        page_range=(first, last),
+    )
+
+
+def test_every_part_is_readable_once_appended(tmp_path: Path):
+    opt = _opt(tmp_path, output_format={"markdown", "json", "html"})
+    with StreamWriter(opt, tmp_path / "doc", "doc") as writer:
+        writer.append(_part(1, 2))
+        # a tailer sees the first part before the document is done
+        assert writer.paths["markdown"].read_text() == "pages 1-2"
+        assert writer.paths["html"].read_text() == "<html><body><p>1</p>"
+        writer.append(_part(3, 3))
+    assert writer.paths["markdown"].read_text() == "pages 1-2\n\npages 3-3"
+    assert writer.paths["html"].read_text() == (
+        "<html><body><p>1</p><p>3</p></body></html>"
+    )
+    lines = writer.paths["json"].read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"page_range": [1, 2], "document": {"first": 1}},
+        {"page_range": [3, 3], "document": {"first": 3}},
+    ]
+    assert writer.written().output_paths == writer.paths
+
+
+def test_run_streams_page_windows(tmp_path: Path):
+    opt = _opt(
+        tmp_path,
+        output_format={"markdown", "json"},
+        capbility=["text"],
+        page_range=(1, 5),
+        page_window=2,
+        stream=True,
+    )
+    [saved] = list(fast.Parser(opt).run())
+    assert saved.ok and saved.output_paths == {
+        "markdown": tmp_path / "1" / "output.md",
+        "json": tmp_path / "1" / "output.jsonl",
+    }
+    lines = saved.output_paths["json"].read_text().splitlines()
+    assert [json.loads(line)["page_range"] for line in lines] == [
+        [1, 2],
+        [3, 4],
+        [5, 5],
+    ]
+    with PdfInput(Path("tests/1.pdf")) as src:
+        parser = fast.Parser(opt)
+        parts = [parser.parse_pages(src, r) for r in ((1, 2), (3, 4), (5, 5))]
+    assert saved.output_path.read_text() == "\n\n".join(
+        part.markdown or "" for part in parts
+    )